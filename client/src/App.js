@@ -1,6 +1,6 @@
 // App.js - Main application component for the Military Detection System Dashboard
 // Handles backend connection, data fetching, and layout
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import Header from './components/Header';
 import CameraView from './components/CameraView';
 import DetectionPanel from './components/DetectionPanel';
@@ -27,6 +27,9 @@ function App() {
   const [detectionHistory, setDetectionHistory] = useState([]); // Detection history
   const [trajectoryHistory, setTrajectoryHistory] = useState({}); // Trajectory history
   const [currentDetections, setCurrentDetections] = useState([]); // Current detections
+  // Delta sync cursors (X-Sync-Cursor): only the rows committed since are fetched
+  const historyCursor = useRef(null);
+  const currentCursor = useRef(null);
   const [logs, setLogs] = useState([]); // System logs
   const [videos, setVideos] = useState([]); // Available videos
   const [selectedVideo, setSelectedVideo] = useState('war.mp4'); // Selected video par défaut
@@ -73,18 +76,29 @@ function App() {
   }, []);
 
   // --- Detection History Fetch ---
-  const loadDetectionHistory = useCallback(async () => {
+  const loadDetectionHistory = useCallback(async (reload = false) => {
     if (!isConnected) return;
     try {
-      const response = await fetch(`${API_BASE_URL}/detections?limit=1000`);
+      const after = reload ? null : historyCursor.current;
+      const response = await fetch(`${API_BASE_URL}/detections?limit=1000${after !== null ? `&after=${after}` : ''}`);
       if (response.ok) {
         const history = await response.json();
-        setDetectionHistory(history);
-        console.log('Detection history loaded:', history.length, 'records');
+        historyCursor.current = response.headers.get('X-Sync-Cursor');
+        if (after === null) {
+          setDetectionHistory(history);
+          console.log('Detection history loaded:', history.length, 'records');
+        } else if (history.length > 0) {
+          // New detections first, most recent first like the full history (some may have been pushed already)
+          setDetectionHistory(prevHistory => {
+            const loaded = new Set(history.map(detection => detection.historyId));
+            return [...history, ...prevHistory.filter(detection => !loaded.has(detection.historyId))].slice(0, 1000);
+          });
+        }
       }
     } catch (error) {
       console.error('Error loading detection history:', error);
       // Retourner un tableau vide en cas d'erreur pour éviter les erreurs d'affichage
+      historyCursor.current = null;
       setDetectionHistory([]);
     }
   }, [isConnected]);
@@ -93,22 +107,28 @@ function App() {
   const loadTrajectoryHistory = useCallback(async () => {
     if (!isConnected) return;
     try {
-      const response = await fetch(`${API_BASE_URL}/trajectories`);
-      if (response.ok) {
-        const trajectories = await response.json();
-        const trajectoryMap = {};
-        trajectories.forEach(trajectory => {
-          trajectoryMap[trajectory.id] = {
-            id: trajectory.id,
-            label: trajectory.label,
-            startTime: new Date(trajectory.startTime).getTime(),
-            lastSeen: new Date(trajectory.lastSeen).getTime(),
-            points: trajectory.points
-          };
-        });
-        setTrajectoryHistory(trajectoryMap);
-        console.log('Trajectory history loaded:', trajectories.length, 'trajectories');
-      }
+      // Pages of trajectories (most recent first), following the keyset cursor
+      const trajectories = [];
+      let cursor = null;
+      do {
+        const response = await fetch(`${API_BASE_URL}/trajectories${cursor ? `?cursor=${encodeURIComponent(cursor)}` : ''}`);
+        if (!response.ok) break;
+        trajectories.push(...await response.json());
+        cursor = response.headers.get('X-Next-Cursor');
+      } while (cursor);
+
+      const trajectoryMap = {};
+      trajectories.forEach(trajectory => {
+        trajectoryMap[trajectory.id] = {
+          id: trajectory.id,
+          label: trajectory.label,
+          startTime: new Date(trajectory.startTime).getTime(),
+          lastSeen: new Date(trajectory.lastSeen).getTime(),
+          points: trajectory.points
+        };
+      });
+      setTrajectoryHistory(trajectoryMap);
+      console.log('Trajectory history loaded:', trajectories.length, 'trajectories');
     } catch (error) {
       console.error('Error loading trajectory history:', error);
       // Retourner un objet vide en cas d'erreur pour éviter les erreurs d'affichage
@@ -126,7 +146,7 @@ function App() {
       if (response.ok) {
         const result = await response.json();
         console.log('Cleanup completed:', result);
-        await loadDetectionHistory();
+        await loadDetectionHistory(true);
         await loadTrajectoryHistory();
       }
     } catch (error) {
@@ -268,16 +288,33 @@ function App() {
   const loadCurrentDetections = useCallback(async () => {
     if (!isConnected) return;
     try {
-      const response = await fetch(`${API_BASE_URL}/detections/current`);
+      const after = currentCursor.current;
+      const response = await fetch(`${API_BASE_URL}/detections/current${after !== null ? `?after=${after}` : ''}`);
       if (response.ok) {
         const data = await response.json();
+        currentCursor.current = response.headers.get('X-Sync-Cursor');
         // Extract detections array from response
         const detections = data.detections || data || [];
-        setCurrentDetections(detections);
+        if (after === null) {
+          setCurrentDetections(detections);
+        } else {
+          // Merge the latest detection of each object, then expire the ones out of the window
+          const { query_timestamp: queryTimestamp, time_window_seconds: timeWindow } = data.metadata;
+          const oldest = new Date(queryTimestamp).getTime() - timeWindow * 1000;
+          setCurrentDetections(prevDetections => {
+            const byObject = new Map(prevDetections.map(detection => [detection.id, detection]));
+            detections.forEach(detection => byObject.set(detection.id, detection));
+            return [...byObject.values()]
+              .filter(detection => detection.timestamp >= oldest)
+              .sort((a, b) => b.timestamp - a.timestamp)
+              .slice(0, 30);
+          });
+        }
       }
     } catch (error) {
       console.error('Error loading current detections:', error);
       // Définir une liste vide de détections en cas d'erreur
+      currentCursor.current = null;
       setCurrentDetections([]);
     }
   }, [isConnected]);
@@ -342,27 +379,55 @@ function App() {
     }
   }, [isConnected]);
 
-  // --- Effects: Periodic Data Refresh when Running ---
+  // --- Effects: Live Data when Running ---
   useEffect(() => {
     if (isConnected && systemStatus === 'running') {
       loadCurrentDetections();
       loadPerformanceData();
       loadDetectionHistory(); // Also refresh history
-      // Refresh every second
-      // Récupérer les détections plus fréquemment pour une meilleure réactivité
-      const detectionInterval = setInterval(() => {
+
+      // Detections, tracks and metrics are pushed by the server (Server-Sent Events);
+      // EventSource reconnects by itself and resumes from the last event received
+      const events = new EventSource(`${API_BASE_URL}/events`);
+      // Pushed detections are the stored rows (same shape as GET /detections), once written
+      events.addEventListener('detections', event => {
+        const detections = JSON.parse(event.data);
+        const now = Date.now();
+        setCurrentDetections(prevDetections => {
+          const byObject = new Map(prevDetections.map(detection => [detection.id, detection]));
+          detections.forEach(detection => {
+            const timestamp = new Date(`${detection.timestamp}Z`).getTime(); // Naive UTC timestamp
+            byObject.set(detection.id, { ...detection, timestamp, is_recent: now - timestamp <= 2000 });
+          });
+          return [...byObject.values()]
+            .filter(detection => now - detection.timestamp <= 10000) // Same window as /detections/current
+            .sort((a, b) => b.timestamp - a.timestamp)
+            .slice(0, 30);
+        });
+        setDetectionHistory(prevHistory => {
+          const pushed = new Set(detections.map(detection => detection.historyId));
+          const older = prevHistory.filter(detection => !pushed.has(detection.historyId));
+          return [...[...detections].reverse(), ...older].slice(0, 1000);
+        });
+      });
+      events.addEventListener('metrics', event => {
+        const newMetrics = JSON.parse(event.data);
+        newMetrics.timestamp = new Date().toLocaleTimeString();
+        setPerformanceData(newMetrics);
+        setModelMetricsHistory(prevHistory => [...prevHistory, newMetrics].slice(-60));
+      });
+      // Events were missed (client too slow, or server restarted): reload the state
+      events.addEventListener('reset', () => {
+        currentCursor.current = null;
         loadCurrentDetections();
-      }, 200); // 5 fois par seconde
-      
-      // Récupérer les autres données moins fréquemment
-      const metricsInterval = setInterval(() => {
-        loadPerformanceData();
-        loadDetectionHistory();
-        loadSystemMetrics();
-      }, 1000);
+        loadDetectionHistory(true);
+      });
+
+      // System metrics are still polled
+      const metricsInterval = setInterval(loadSystemMetrics, 1000);
       
       return () => {
-        clearInterval(detectionInterval);
+        events.close();
         clearInterval(metricsInterval);
       };
     }
@@ -387,6 +452,7 @@ function App() {
         setIsPlaying(false);
         setSystemStatus('stopped');
         setCurrentDetections([]);
+        currentCursor.current = null;
         return { success: true };
       } catch (error) {
         console.error('Error stopping detection:', error);
@@ -1,33 +1,51 @@
 # app.py - Main Flask application for the military detection server
 # Handles API endpoints, database models, YOLO integration, and streaming
 
-from flask import Flask, request, jsonify, send_from_directory, Response
+from flask import Flask, request, jsonify, send_from_directory, Response, stream_with_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from datetime import datetime, timedelta
+import base64
+import hashlib
 import json
 import os
 import io
-from PIL import Image
 import numpy as np
 import cv2
+import threading
 import time
 from datetime import datetime, timezone
 import uuid
 import io
-from PIL import Image
 import numpy as np
 import psutil
 import random
 import osmnx as ox
-import shapely.geometry
+import atexit
+from config import Config
+from config.stream_config import FRAME_CHANNEL_CONFIG, STREAM_CONFIG
+from routes.stream_routes import stream_bp
+from services.alert_engine import AlertEngine
+from services.decimation import decimate
+from services.detection_writer import DetectionWriter
+from services.event_bus import EventBus
+from services.exporter import EXPORT_FORMATS, DataExporter
+from services.frame_channel import FrameChannelServer
+from services.frame_ingest import FRAME_BATCH_TYPE, RAW_FRAME_TYPES, FrameDecoder
+from services.migrations import apply_migrations
+from services.partitions import PartitionManager
+from services.sqlite_profile import register_sqlite_profile
+from services.stats_aggregator import StatisticsAggregator
+from services.tracking_metrics import TrackingMetricsCalculator
+from services.zone_cache import ZoneCache
+from stream_manager import MultiStreamManager
 
 
 # Configuration pour les logs
 ENABLE_LOGS = True  # Active l'affichage des logs pour le diagnostic
 
-# Cache des polygones OSM
-zone_polygons = {'military': []}
+# Cache des polygones OSM, par couche (absente tant que ses zones ne sont pas chargées)
+zone_polygons = {}
 
 # --- YOLO Detector Initialization ---
 try:
@@ -53,13 +71,17 @@ except Exception as e:
 app = Flask(__name__)
 
 # --- App Configuration ---
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///detection_history.db'
+os.makedirs(os.path.dirname(Config.DATABASE_PATH), exist_ok=True)
+app.config['SQLALCHEMY_DATABASE_URI'] = Config.SQLALCHEMY_DATABASE_URI
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = 'your-secret-key-here'
 
 # --- Extensions Initialization ---
 db = SQLAlchemy(app)
-CORS(app)
+CORS(app, expose_headers=['X-Next-Cursor', 'X-Sync-Cursor'])  # Pagination and delta sync cursors
+# WAL journal, cache and busy timeout on every connection (readers and the writer thread run concurrently)
+with app.app_context():
+    register_sqlite_profile(db.engine, Config.SQLITE_PRAGMAS)
 
 # --- Database Models ---
 class Detection(db.Model):
@@ -74,6 +96,12 @@ class Detection(db.Model):
     timestamp = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     history_id = db.Column(db.String(100), unique=True)
 
+    # Kept in sync with services/migrations.py, which adds them to existing databases
+    __table_args__ = (
+        db.Index('ix_detection_timestamp_label_object_id', 'timestamp', 'label', 'object_id'),
+        db.Index('ix_detection_object_id_timestamp', 'object_id', 'timestamp'),
+    )
+
     def to_dict(self):
         return {
             'id': self.object_id,
@@ -95,6 +123,13 @@ class Trajectory(db.Model):
     last_seen = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     is_active = db.Column(db.Boolean, default=True)
 
+    __table_args__ = (
+        db.Index('ix_trajectory_object_id', 'object_id'),
+        db.Index('ix_trajectory_is_active_last_seen', 'is_active', 'last_seen'),
+        db.Index('ix_trajectory_start_time', 'start_time'),
+        db.Index('ix_trajectory_last_seen', 'last_seen'),
+    )
+
     def to_dict(self):
         return {
             'id': self.object_id,
@@ -113,6 +148,11 @@ class TrajectoryPoint(db.Model):
     distance = db.Column(db.Float)
     timestamp = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
+    __table_args__ = (
+        db.Index('ix_trajectory_point_trajectory_id_timestamp', 'trajectory_id', 'timestamp'),
+        db.Index('ix_trajectory_point_timestamp', 'timestamp'),
+    )
+
     def to_dict(self):
         return {
             'x': self.x,
@@ -122,74 +162,165 @@ class TrajectoryPoint(db.Model):
             'timestamp': self.timestamp.isoformat()
         }
 
+# Detections and trajectory points live in hourly partition tables; the detection and
+# trajectory_point names are UNION ALL views over them (see services/partitions.py)
+with app.app_context():
+    partitions = PartitionManager(db.engine, granularity=Config.PARTITION_GRANULARITY)
+partitions.register(Detection, retention=timedelta(hours=Config.DETECTION_CLEANUP_HOURS))
+partitions.register(TrajectoryPoint, retention=timedelta(days=Config.TRAJECTORY_POINT_CLEANUP_DAYS))
+
 # --- YOLO Detection Callback ---
+# Detections are persisted in batches by a background thread so the
+# inference thread never waits on SQLite commits.
+# Rolling statistics fed by the writer (rebuilt from the database at startup)
+stats_aggregator = StatisticsAggregator()
+
+def on_detections_written(rows):
+    """
+    Committed detection rows (writer batches, POST /api/detections): statistics, alerts
+    (alert_engine), then the live feed, in the shape the REST API reads them back.
+    """
+    stats_aggregator.add_many(rows)
+    alert_engine.evaluate(rows)
+    for row in rows:
+        # Detection.to_dict of the stored row: SQLite returns its timestamp as naive UTC
+        timestamp = row['timestamp'].astimezone(timezone.utc).replace(tzinfo=None)
+        event_bus.publish('detection', Detection(**dict(row, timestamp=timestamp)).to_dict())
+
+detection_writer = DetectionWriter(app, db, Detection, Trajectory, TrajectoryPoint,
+                                   on_flush=on_detections_written, partitions=partitions)
+exporter = DataExporter(db, Detection, Trajectory, TrajectoryPoint, partitions=partitions)
+tracking_metrics = TrackingMetricsCalculator(db, Trajectory, TrajectoryPoint,
+                                             ttl_seconds=Config.STATISTICS_CACHE_TTL_SECONDS)
+atexit.register(detection_writer.stop)
+
+# --- Live events pushed to the dashboard (routes/stream_routes.py) ---
+event_bus = EventBus(history=Config.EVENTS_HISTORY, max_lag=Config.EVENTS_MAX_LAG)
+app.event_bus = event_bus
+app.register_blueprint(stream_bp)
+
+# --- Alerts raised as detections are written (rules in Config.ALERT_RULES) ---
+# Zones: the index loaded around the last rover position given to /api/alerts (or ZONE_PRELOAD_POSITION);
+# until a layer is loaded, the detections depending on it wait (they are not outside every zone)
+alert_engine = AlertEngine(
+    Config.ALERT_RULES,
+    zones=zone_polygons.get,
+    history=Config.ALERT_HISTORY,
+    cooldown_seconds=Config.ALERT_COOLDOWN_SECONDS,
+    on_alert=lambda alert: event_bus.publish('alerts', alert)
+)
+
 def save_yolo_detection(detection_data):
-    """Save a YOLO detection to the database dynamically."""
+    """Queue a YOLO detection for asynchronous, batched database saving (pushed live once written)."""
     try:
-        with app.app_context():
-            # Compute speed and distance if available
-            speed = detection_data.get('speed')
-            distance = detection_data.get('distance')
-            # Create detection
-            detection = Detection(
-                object_id=detection_data['id'],
-                label=detection_data['label'],
-                confidence=detection_data['confidence'],
-                x=detection_data['x'],
-                y=detection_data['y'],
-                speed=speed,
-                distance=distance,
-                history_id=f"yolo_{uuid.uuid4()}_{detection_data.get('frame_number', 0)}"
-            )
-            db.session.add(detection)
-            # Update or create trajectory dynamically
-            trajectory = Trajectory.query.filter_by(object_id=detection_data['id']).first()
-            if trajectory:
-                # Update existing trajectory
-                trajectory.last_seen = datetime.now(timezone.utc)
-                trajectory.is_active = True
-            else:
-                # Create new trajectory
-                trajectory = Trajectory(
-                    object_id=detection_data['id'],
-                    label=detection_data['label']
-                )
-                db.session.add(trajectory)
-                db.session.flush()  # To get trajectory ID
-            # Add trajectory point
-            trajectory_point = TrajectoryPoint(
-                trajectory_id=trajectory.id,
-                x=detection_data['x'],
-                y=detection_data['y'],
-                speed=speed,
-                distance=distance
-            )
-            db.session.add(trajectory_point)
-            db.session.commit()
-            # Debug log (désactivé)
-            if ENABLE_LOGS:
-                print(f"✅ Detection saved: {detection_data['label']} (conf: {detection_data['confidence']:.2f}) at ({detection_data['x']:.1f}, {detection_data['y']:.1f})")
+        detection_writer.submit(detection_data)
     except Exception as e:
         if ENABLE_LOGS:
-            print(f"❌ Error saving detection: {e}")
-        db.session.rollback()
+            print(f"❌ Error queuing detection: {e}")
+
+ZONE_TAGS = {'military': {'landuse': 'military'}}
 
-def load_osm_zones(center_lat, center_lon, dist_m=3000):
-    # Télécharge les polygones de zones militaires autour du rover
-    gdf_mil = ox.geometries_from_point((center_lat, center_lon), tags={'landuse': 'military'}, dist=dist_m)
-    zone_polygons['military'] = list(gdf_mil.geometry.values)
+def fetch_osm_zones(layer, bounds):
+    # Télécharge les polygones d'une tuile depuis OpenStreetMap (appelé par le cache de zones)
+    west, south, east, north = bounds
+    try:
+        gdf = ox.geometries_from_bbox(north, south, east, west, tags=ZONE_TAGS[layer])
+    except Exception as e:
+        if type(e).__name__ in ('EmptyOverpassResponse', 'InsufficientResponseError'):
+            return []  # Aucune zone dans la tuile
+        raise
+    return [(f"{index[0]}/{index[1]}" if isinstance(index, tuple) else str(index), geometry)
+            for index, geometry in zip(gdf.index, gdf.geometry.values)]
+
+zone_cache = ZoneCache(
+    Config.ZONE_CACHE_PATH,
+    zoom=Config.ZONE_TILE_ZOOM,
+    max_tiles=Config.ZONE_CACHE_MAX_TILES,
+    fetch=fetch_osm_zones,
+    max_age_days=Config.ZONE_CACHE_MAX_AGE_DAYS,
+    retry_seconds=Config.ZONE_FETCH_RETRY_SECONDS
+)
+
+def load_osm_zones(center_lat, center_lon, dist_m=Config.ZONE_RADIUS_M):
+    # Zones militaires des tuiles autour du rover: mémoire, puis fichier cache, puis OSM (hors ligne possible)
+    # Index spatial (STRtree, géométries préparées) reconstruit seulement quand le rover change de tuile
+    zone_polygons['military'] = zone_cache.index(center_lat, center_lon, dist_m, layer='military')
 
 def point_in_military_zone(lat, lon):
-    pt = shapely.geometry.Point(lon, lat)
-    for poly in zone_polygons['military']:
-        if poly is not None and poly.is_valid and poly.contains(pt):
-            return True
-    return False
+    index = zone_polygons.get('military')
+    return index is not None and index.contains_point(lat, lon)
+
+# Dernière position connue du rover (ZONE_PRELOAD_POSITION au démarrage), suivie par le chargeur de zones
+rover_position = {'position': Config.ZONE_PRELOAD_POSITION}
+zones_requested = threading.Event()
+
+def request_zones(lat, lon):
+    # Demande le chargement des zones autour du rover, sans attendre (tuiles, éventuellement réseau)
+    if rover_position['position'] != (lat, lon):
+        rover_position['position'] = (lat, lon)
+        zones_requested.set()
+
+def _zone_loader():
+    """
+    Load the zones around the last rover position in the background, on every position
+    change and at least every ZONE_FETCH_RETRY_SECONDS (failed or stale tiles), then
+    evaluate the detections kept pending by the alert engine while no zone was loaded.
+    """
+    while True:
+        zones_requested.wait(timeout=Config.ZONE_FETCH_RETRY_SECONDS)
+        zones_requested.clear()
+        position = rover_position['position']
+        if position is None:
+            continue
+        try:
+            first = 'military' not in zone_polygons
+            load_osm_zones(*position)
+            if first and ENABLE_LOGS:
+                print(f"✅ {len(zone_polygons['military'])} military zones loaded around {position}")
+            alert_engine.evaluate()
+        except Exception as e:
+            if ENABLE_LOGS:
+                print(f"❌ Error loading zones: {e}")
+
+if Config.ZONE_PRELOAD_POSITION is not None:
+    zones_requested.set()
+threading.Thread(target=_zone_loader, name="zone-loader", daemon=True).start()
 
 # --- Set YOLO Callback if Available ---
 if YOLO_AVAILABLE:
     detector.set_detection_callback(save_yolo_detection)
 
+# --- Multi-camera streams sharing one batched inference worker ---
+stream_manager = MultiStreamManager(
+    detector,
+    max_batch=Config.MULTI_STREAM_MAX_BATCH,
+    max_wait_ms=Config.MULTI_STREAM_BATCH_TIMEOUT_MS,
+    enable_logs=ENABLE_LOGS
+) if YOLO_AVAILABLE else None
+
+# --- Frame channel: edge cameras pushing frames on a persistent connection ---
+_channel_inference_lock = threading.Lock()
+
+def _frame_channel_session(stream_id):
+    """Detection function of one frame channel connection, with a tracker of its own."""
+    tracker = stream_manager.create_tracker()
+    scale = FRAME_CHANNEL_CONFIG['decode_scale']
+
+    def detect(frame):
+        with _channel_inference_lock:  # One model call at a time across connections
+            return detector.process_frames([frame], scale=scale, tracker=tracker, stream_id=stream_id)[0]
+    return detect
+
+frame_channel = FrameChannelServer(
+    _frame_channel_session,
+    host=FRAME_CHANNEL_CONFIG['host'],
+    port=FRAME_CHANNEL_CONFIG['port'],
+    workers=FRAME_CHANNEL_CONFIG['decode_workers'],
+    target_fps=STREAM_CONFIG['target_fps'],
+    max_pending=FRAME_CHANNEL_CONFIG['max_pending'],
+    scale=FRAME_CHANNEL_CONFIG['decode_scale']
+) if YOLO_AVAILABLE and FRAME_CHANNEL_CONFIG['enabled'] else None
+
 # --- API Routes (see rest of file for endpoints) ---
 @app.route('/api/detections', methods=['POST'])
 def save_detection():
@@ -200,23 +331,26 @@ def save_detection():
         # Generate a unique history_id if not provided
         history_id = data.get('historyId') or f"api_{uuid.uuid4()}"
 
-        # Save the detection
-        detection = Detection(
-            object_id=data['id'],
-            label=data['label'],
-            confidence=data['confidence'],
-            x=data['x'],
-            y=data['y'],
-            speed=data.get('speed'),
-            distance=data.get('distance'),
-            history_id=history_id
-        )
-        db.session.add(detection)
+        now = datetime.now(timezone.utc)
+        detection_row = {
+            'object_id': data['id'],
+            'label': data['label'],
+            'confidence': data['confidence'],
+            'x': data['x'],
+            'y': data['y'],
+            'speed': data.get('speed'),
+            'distance': data.get('distance'),
+            'timestamp': now,
+            'history_id': history_id
+        }
+        # Partitions first: creating one takes a transaction of its own
+        partitions.ensure('detection', [now])
+        partitions.ensure('trajectory_point', [now])
         
         # Update or create trajectory
         trajectory = Trajectory.query.filter_by(object_id=data['id']).first()
         if trajectory:
-            trajectory.last_seen = datetime.now(timezone.utc)
+            trajectory.last_seen = now
             trajectory.is_active = True
         else:
             trajectory = Trajectory(
@@ -226,17 +360,21 @@ def save_detection():
             db.session.add(trajectory)
             db.session.flush()
         
-        # Add trajectory point
-        trajectory_point = TrajectoryPoint(
-            trajectory_id=trajectory.id,
-            x=data['x'],
-            y=data['y'],
-            speed=data.get('speed'),
-            distance=data.get('distance')
-        )
-        db.session.add(trajectory_point)
+        # Save the detection and the trajectory point in their partitions
+        connection = db.session.connection()
+        partitions.insert(connection, 'detection', [detection_row])
+        partitions.insert(connection, 'trajectory_point', [{
+            'trajectory_id': trajectory.id,
+            'x': data['x'],
+            'y': data['y'],
+            'speed': data.get('speed'),
+            'distance': data.get('distance'),
+            'timestamp': now
+        }])
         
         db.session.commit()
+        on_detections_written([detection_row])
+        detection = Detection(**detection_row)
         
         # Return the complete detection for immediate display
         return jsonify({'message': 'Detection saved successfully', 'detection': detection.to_dict()}), 201
@@ -254,6 +392,7 @@ def get_detections():
         confidence_threshold = float(request.args.get('confidence', 0.0))
         selected_class = request.args.get('class', 'all')
         limit = int(request.args.get('limit', 100))
+        after = request.args.get('after', type=int)  # X-Sync-Cursor of the previous response
         
         # Calculate time limit
         now = datetime.now(timezone.utc)
@@ -264,59 +403,145 @@ def get_detections():
         else:  # 24h by default
             time_limit = now - timedelta(hours=24)
         
-        # Build query
-        query = Detection.query.filter(Detection.timestamp >= time_limit)
+        # Build query (on the partitions overlapping the time range only)
+        watermark = partitions.watermark('detection', db.session.connection())
+        D = partitions.source(Detection, since=time_limit)
+        query = db.session.query(D).filter(D.timestamp >= time_limit)
+        if after is not None:
+            # Delta sync: only the detections committed since the client's cursor
+            query = query.filter(D.id > after, D.id <= watermark)
         
         if confidence_threshold > 0:
-            query = query.filter(Detection.confidence >= confidence_threshold)
+            query = query.filter(D.confidence >= confidence_threshold)
         
         if selected_class != 'all':
-            query = query.filter(Detection.label == selected_class)
+            query = query.filter(D.label == selected_class)
         
         # Get detections
-        detections = query.order_by(Detection.timestamp.desc()).limit(limit).all()
+        cursor = watermark
+        if after is not None:
+            # Oldest committed first, so that a full page ends the cursor at its last row:
+            # the rows past the limit come with the next call
+            detections = query.order_by(D.id).limit(limit).all()
+            if len(detections) == limit:
+                cursor = detections[-1].id
+            detections.reverse()
+        else:
+            detections = query.order_by(D.timestamp.desc()).limit(limit).all()
         
-        return jsonify([detection.to_dict() for detection in detections])
+        response = jsonify([detection.to_dict() for detection in detections])
+        response.headers['X-Sync-Cursor'] = str(cursor)
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+def _encode_cursor(trajectory):
+    """Opaque keyset cursor: (last_seen, id) of the last trajectory of a page."""
+    return base64.urlsafe_b64encode(json.dumps([trajectory.last_seen.isoformat(), trajectory.id]).encode()).decode()
+
+def _decode_cursor(cursor):
+    last_seen, trajectory_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    return datetime.fromisoformat(last_seen), int(trajectory_id)
+
+def _haversine(lat1, lng1, lat2, lng2):
+    from math import radians, sin, cos, sqrt, atan2
+    R = 6371000  # Rayon Terre en mètres
+    dlat = radians(lat2 - lat1)
+    dlng = radians(lng2 - lng1)
+    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlng/2)**2
+    c = 2 * atan2(sqrt(a), sqrt(1-a))
+    return R * c
+
 @app.route('/api/trajectories', methods=['GET'])
 def get_trajectories():
-    """Retrieve trajectories with their points."""
+    """
+    Retrieve trajectories with their points, most recently seen first.
+    Query parameters:
+        limit: Page size (Config.TRAJECTORY_PAGE_SIZE by default)
+        cursor: X-Next-Cursor header of the previous page (absent on the last page)
+        active_only: Only active trajectories
+        since: ISO 8601, trajectories seen since then and their points since then
+        after: X-Sync-Cursor header of a previous response, only the trajectories with
+            new points since then, with their new points only
+        tolerance: Douglas-Peucker simplification of the points, in pixels (0 = off)
+        max_points: Max points returned per trajectory (0 = all)
+    """
     try:
-        trajectories = Trajectory.query.all()
+        limit = min(int(request.args.get('limit', Config.TRAJECTORY_PAGE_SIZE)), Config.MAX_DETECTIONS_PER_REQUEST)
+        active_only = request.args.get('active_only', 'false').lower() in ('1', 'true', 'yes')
+        since = _request_filters(request.args)['since']
+        tolerance = float(request.args.get('tolerance', Config.TRAJECTORY_SIMPLIFY_TOLERANCE))
+        max_points = int(request.args.get('max_points', Config.TRAJECTORY_MAX_POINTS)) or None
+        after = request.args.get('after', type=int)
+        watermark = partitions.watermark('trajectory_point', db.session.connection())
+
+        # Keyset pagination on (last_seen, id), served by the last_seen indexes
+        query = Trajectory.query
+        if active_only:
+            query = query.filter(Trajectory.is_active == True)
+        if since is not None:
+            query = query.filter(Trajectory.last_seen >= since)
+        if after is not None:
+            # Delta sync: the trajectories with points committed since the client's cursor
+            P = partitions.source(TrajectoryPoint, since=since)
+            updated = db.session.query(P.trajectory_id).filter(P.id > after, P.id <= watermark)
+            query = query.filter(Trajectory.id.in_(updated))
+        cursor = request.args.get('cursor')
+        if cursor:
+            cursor_last_seen, cursor_id = _decode_cursor(cursor)
+            query = query.filter(db.tuple_(Trajectory.last_seen, Trajectory.id) < (cursor_last_seen, cursor_id))
+        trajectories = query.order_by(Trajectory.last_seen.desc(), Trajectory.id.desc()).limit(limit + 1).all()
+        has_more = len(trajectories) > limit
+        trajectories = trajectories[:limit]
+
+        # Points of the whole page in one query (on the partitions overlapping `since`)
+        # GPS distances need latitude/longitude columns, which the points do not have (yet)
+        has_gps = hasattr(TrajectoryPoint, 'latitude') and hasattr(TrajectoryPoint, 'longitude')
+        points_by_trajectory = {}
+        if trajectories:
+            P = partitions.source(TrajectoryPoint, since=since)
+            columns = [P.trajectory_id, P.x, P.y, P.speed, P.distance, P.timestamp]
+            if has_gps:
+                columns += [P.latitude, P.longitude]
+            points_query = (
+                db.session.query(*columns)
+                .filter(P.trajectory_id.in_([t.id for t in trajectories]))
+            )
+            if since is not None:
+                points_query = points_query.filter(P.timestamp >= since)
+            if after is not None:
+                points_query = points_query.filter(P.id > after, P.id <= watermark)
+            for point in points_query.order_by(P.trajectory_id, P.timestamp):
+                points_by_trajectory.setdefault(point.trajectory_id, []).append(point)
+
+        # Récupérer la position GPS de la caméra (exemple: depuis la config ou la base)
+        camera_lat, camera_lng = 48.8566, 2.3522  # À remplacer par la vraie position si dispo
         result = []
-        
         for trajectory in trajectories:
             trajectory_data = trajectory.to_dict()
-            
-            # Get trajectory points
-            points = TrajectoryPoint.query.filter_by(trajectory_id=trajectory.id).all()
-            trajectory_data['points'] = [point.to_dict() for point in points]
+            points = points_by_trajectory.get(trajectory.id, [])
+            # Only the decimated points are sent, the metrics use them all
+            kept = decimate([point.x for point in points], [point.y for point in points], tolerance, max_points)
+            trajectory_data['points'] = [{
+                'x': points[i].x,
+                'y': points[i].y,
+                'speed': points[i].speed,
+                'distance': points[i].distance,
+                'timestamp': points[i].timestamp.isoformat()
+            } for i in kept]
             
             # Calculate metrics
             if points:
                 duration = (trajectory.last_seen - trajectory.start_time).total_seconds()
 
                 # --- Calcul de la distance totale caméra-objet (somme des distances GPS) ---
-                # Récupérer la position GPS de la caméra (exemple: depuis la config ou la base)
-                camera_lat, camera_lng = 48.8566, 2.3522  # À remplacer par la vraie position si dispo
-                def haversine(lat1, lng1, lat2, lng2):
-                    from math import radians, sin, cos, sqrt, atan2
-                    R = 6371000  # Rayon Terre en mètres
-                    dlat = radians(lat2 - lat1)
-                    dlng = radians(lng2 - lng1)
-                    a = sin(dlat/2)**2 + cos(radians(lat1)) * cos(radians(lat2)) * sin(dlng/2)**2
-                    c = 2 * atan2(sqrt(a), sqrt(1-a))
-                    return R * c
-
                 total_distance = 0
-                for point in points:
-                    lat = getattr(point, 'latitude', None)
-                    lng = getattr(point, 'longitude', None)
+                for point in (points if has_gps else []):
+                    lat = point.latitude
+                    lng = point.longitude
                     if lat is not None and lng is not None:
-                        total_distance += haversine(camera_lat, camera_lng, lat, lng)
+                        total_distance += _haversine(camera_lat, camera_lng, lat, lng)
 
                 trajectory_data['duration'] = duration
                 trajectory_data['totalDistance'] = total_distance
@@ -325,7 +550,11 @@ def get_trajectories():
             
             result.append(trajectory_data)
         
-        return jsonify(result)
+        response = jsonify(result)
+        if has_more:
+            response.headers['X-Next-Cursor'] = _encode_cursor(trajectories[-1])
+        response.headers['X-Sync-Cursor'] = str(watermark)
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 400
@@ -338,11 +567,22 @@ def get_statistics():
         one_hour_ago = now - timedelta(hours=1)
         six_hours_ago = now - timedelta(hours=6)
         one_day_ago = now - timedelta(hours=24)
-        
-        # Count detections by period
-        hourly_count = Detection.query.filter(Detection.timestamp >= one_hour_ago).count()
-        six_hour_count = Detection.query.filter(Detection.timestamp >= six_hours_ago).count()
-        daily_count = Detection.query.filter(Detection.timestamp >= one_day_ago).count()
+
+        # ETag of what the statistics depend on, all cheap to read: new rows (watermark),
+        # deleted rows and dropped partitions, active trajectories (indexed count), and the
+        # minute, as the period counts slide with time. Unchanged: 304 before any aggregate
+        active_trajectories = Trajectory.query.filter_by(is_active=True).count()
+        partition_stats = partitions.get_stats()['detection']
+        etag = _etag_of([partition_stats['watermark'], partition_stats['partitions'], partition_stats['oldest'],
+                         stats_aggregator.total_detections, active_trajectories, int(now.timestamp()) // 60])
+        not_modified = _not_modified(etag)
+        if not_modified is not None:
+            return not_modified
+        
+        # Count detections by period (summed over the overlapping partitions)
+        hourly_count = partitions.count('detection', one_hour_ago)
+        six_hour_count = partitions.count('detection', six_hours_ago)
+        daily_count = partitions.count('detection', one_day_ago)
         total_count = Detection.query.count()
         
         # Unique objects
@@ -351,10 +591,7 @@ def get_statistics():
         # Average confidence
         avg_confidence = db.session.query(db.func.avg(Detection.confidence)).scalar() or 0
         
-        # Active trajectories
-        active_trajectories = Trajectory.query.filter_by(is_active=True).count()
-        
-        return jsonify({
+        return _conditional_json({
             'hourlyCount': hourly_count,
             'sixHourCount': six_hour_count,
             'dailyCount': daily_count,
@@ -362,24 +599,25 @@ def get_statistics():
             'uniqueObjects': unique_objects,
             'avgConfidence': avg_confidence * 100,
             'activeTrajectories': active_trajectories
-        })
+        }, etag=etag)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 @app.route('/api/cleanup', methods=['POST'])
 def cleanup_old_data():
-    """Clean up old data (more than 24 hours)."""
+    """Clean up old data (older than the partition retention, 24 hours by default)."""
     try:
-        cutoff_date = datetime.now(timezone.utc) - timedelta(hours=24)
+        cutoff_date = datetime.now(timezone.utc) - timedelta(hours=Config.DETECTION_CLEANUP_HOURS)
         
-        # Delete old detections
-        deleted_detections = Detection.query.filter(Detection.timestamp < cutoff_date).delete()
+        # Drop expired detection (and trajectory point) partitions
+        deleted_detections = partitions.drop_expired()['detection']
         
         # Mark inactive trajectories
         inactive_trajectories = Trajectory.query.filter(Trajectory.last_seen < cutoff_date).update({'is_active': False})
         
         db.session.commit()
+        stats_aggregator.discard(deleted_detections)
         
         return jsonify({
             'message': 'Cleanup completed',
@@ -398,16 +636,17 @@ def auto_cleanup():
     try:
         now = datetime.now(timezone.utc)
         
-        # 1. Clean up very old detections (more than 7 days)
-        week_ago = now - timedelta(days=7)
-        old_detections_deleted = Detection.query.filter(Detection.timestamp < week_ago).delete()
+        # 1. Drop expired partitions: detections older than DETECTION_CLEANUP_HOURS and
+        #    trajectory points older than TRAJECTORY_POINT_CLEANUP_DAYS (step 4)
+        dropped = partitions.drop_expired(now)
+        old_detections_deleted = dropped['detection']
         
         # 2. Clean up old low-confidence detections (more than 24 hours)
         day_ago = now - timedelta(hours=24)
-        low_confidence_deleted = Detection.query.filter(
-            Detection.timestamp < day_ago,
-            Detection.confidence < 0.3
-        ).delete()
+        low_confidence_deleted = partitions.delete(
+            db.session.connection(), 'detection', before=day_ago,
+            where=lambda table: table.c.confidence < Config.DETECTION_LOW_CONFIDENCE_THRESHOLD
+        )
         
         # 3. Mark inactive trajectories (no detection for 1 hour)
         hour_ago = now - timedelta(hours=1)
@@ -416,13 +655,11 @@ def auto_cleanup():
             Trajectory.is_active == True
         ).update({'is_active': False})
         
-        # 4. Clean up very old trajectory points (more than 3 days)
-        three_days_ago = now - timedelta(days=3)
-        old_trajectory_points = TrajectoryPoint.query.filter(
-            TrajectoryPoint.timestamp < three_days_ago
-        ).delete()
+        # 4. Very old trajectory points were dropped with their partitions (step 1)
+        old_trajectory_points = dropped['trajectory_point']
         
         db.session.commit()
+        stats_aggregator.discard(old_detections_deleted + low_confidence_deleted)
         
         # 5. Calculate statistics after cleanup
         total_detections = Detection.query.count()
@@ -440,7 +677,8 @@ def auto_cleanup():
             'current_stats': {
                 'total_detections': total_detections,
                 'total_trajectories': total_trajectories,
-                'active_trajectories': active_trajectories
+                'active_trajectories': active_trajectories,
+                'partitions': partitions.get_stats()
             },
             'cleanup_timestamp': now.isoformat()
         })
@@ -449,51 +687,99 @@ def auto_cleanup():
         db.session.rollback()
         return jsonify({'error': str(e)}), 400
 
+def _etag_of(value):
+    return hashlib.sha1(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+def _conditional_json(data, etag_of=None, etag=None):
+    """
+    JSON response with an ETag of its content (or of `etag_of`, for data holding values
+    that change on every call, or `etag` itself), answered with 304 Not Modified when
+    the client has it.
+    """
+    response = jsonify(data)
+    if etag is None:
+        etag = hashlib.sha1(response.get_data()).hexdigest() if etag_of is None else _etag_of(etag_of)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'  # Always revalidated
+    return response.make_conditional(request)
+
+def _not_modified(etag):
+    """304 Not Modified if the client already has `etag` (checked before computing the data), else None."""
+    if etag not in request.if_none_match:
+        return None
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def _request_filters(args):
+    """since/until (ISO 8601, naive = UTC) and class filters of a request."""
+    def parse(name):
+        value = args.get(name)
+        if not value:
+            return None
+        parsed = datetime.fromisoformat(value)
+        return parsed.astimezone(timezone.utc) if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+    selected_class = args.get('class', 'all')
+    return {
+        'since': parse('since'),
+        'until': parse('until'),
+        'label': None if selected_class == 'all' else selected_class
+    }
+
+@app.route('/api/export', methods=['GET'])
+def stream_export():
+    """
+    Streaming export, in bounded memory whatever the history size.
+    Query parameters: format (json, ndjson, csv, parquet, arrow), dataset (detections or
+    points, for the flat formats), since/until (ISO 8601) and class.
+    """
+    try:
+        fmt = request.args.get('format', Config.get_export_config()['format'])
+        dataset = request.args.get('dataset', 'detections')
+        chunks = exporter.stream(dataset, fmt, **_request_filters(request.args))
+    except (ValueError, RuntimeError) as e:
+        return jsonify({'error': str(e)}), 400
+
+    extension = 'json' if fmt == 'json' else f"{dataset}.{fmt}"
+    filename = f"export_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}.{extension}"
+    return Response(
+        stream_with_context(chunks),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+    )
+
 @app.route('/api/export', methods=['POST'])
 def export_data():
-    """Export all data."""
+    """Export all data (JSON history document) to a file of the exports directory."""
     try:
-        data = request.json
+        data = request.json or {}
         export_date = datetime.now(timezone.utc)
         
-        # Retrieve all data
-        detections = Detection.query.all()
-        trajectories = Trajectory.query.all()
-        
-        export_data = {
-            'exportDate': export_date.isoformat(),
-            'detectionHistory': [detection.to_dict() for detection in detections],
-            'trajectoryHistory': {},
-            'currentDetections': data.get('currentDetections', []),
-            'filters': data.get('filters', {})
-        }
-        
-        # Add trajectories with their points
-        for trajectory in trajectories:
-            points = TrajectoryPoint.query.filter_by(trajectory_id=trajectory.id).all()
-            export_data['trajectoryHistory'][trajectory.object_id] = {
-                'id': trajectory.object_id,
-                'label': trajectory.label,
-                'startTime': trajectory.start_time.isoformat(),
-                'lastSeen': trajectory.last_seen.isoformat(),
-                'points': [point.to_dict() for point in points]
-            }
-        
-        # Save to a file
+        # Save to a file, written chunk by chunk as rows are read
         filename = f"export_{export_date.strftime('%Y%m%d_%H%M%S')}.json"
         filepath = os.path.join('exports', filename)
         
         # Create exports directory if it doesn't exist
         os.makedirs('exports', exist_ok=True)
         
-        with open(filepath, 'w') as f:
-            json.dump(export_data, f, indent=2)
+        counts = {}
+        with open(filepath, 'wb') as f:
+            for chunk in exporter.document(
+                export_date=export_date,
+                current_detections=data.get('currentDetections', []),
+                filters=data.get('filters', {}),
+                counts=counts,
+                **_request_filters(data)
+            ):
+                f.write(chunk)
         
         return jsonify({
             'message': 'Export completed',
             'filename': filename,
-            'detectionCount': len(detections),
-            'trajectoryCount': len(trajectories)
+            'detectionCount': counts['detections'],
+            'trajectoryCount': counts['trajectories']
         })
         
     except Exception as e:
@@ -528,15 +814,18 @@ def load_model():
         data = request.json
         model_path = data.get('model_path', 'models/best.onnx')
         confidence = data.get('confidence', 0.5)
+        backend = data.get('backend', detector.backend)
         
         detector.model_path = model_path
         detector.confidence_threshold = confidence
+        detector.backend = backend
         detector.load_model()
         
         return jsonify({
             'message': 'Model loaded successfully',
             'model_path': model_path,
-            'confidence': confidence
+            'confidence': confidence,
+            'backend': backend
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 400
@@ -636,32 +925,52 @@ def start_streaming():
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+frame_decoder = FrameDecoder(max_frames=Config.DETECT_FRAME_MAX_BATCH)
+
 @app.route('/api/yolo/detect_frame', methods=['POST'])
 def detect_frame():
-    """Process a single frame for detection."""
+    """
+    Process frames for detection. The body is either one encoded image (image/jpeg,
+    image/png, application/octet-stream), several length-prefixed encoded images
+    (application/x-frame-batch, answered with one detection list per frame) or a
+    multipart upload with `frame` files. `scale` (1, 2, 4, 8) decodes JPEG frames at a
+    reduced resolution; coordinates are still reported in full-resolution pixels.
+    """
     if not YOLO_AVAILABLE:
         return jsonify({'error': 'YOLO not available'}), 400
 
-    if 'frame' not in request.files:
-        return jsonify({'error': 'No frame provided in the request'}), 400
-
+    batch = request.mimetype == FRAME_BATCH_TYPE
     try:
-        frame_file = request.files['frame']
-        
-        # Read the image file
-        image_bytes = frame_file.read()
-        image = Image.open(io.BytesIO(image_bytes))
-        
-        # Convert to numpy array (OpenCV format)
-        frame_np = np.array(image)
-        
-        # Process the frame using the detector
-        detections = detector.process_frame(frame_np)
+        scale = int(request.args.get('scale', 1))
+        if batch or request.mimetype in RAW_FRAME_TYPES:
+            length = request.content_length
+            if length is None:
+                return jsonify({'error': 'Content-Length required'}), 411
+            if length > Config.MAX_CONTENT_LENGTH:
+                return jsonify({'error': 'Request too large'}), 413
+            body = frame_decoder.read_body(request.stream, length)
+            encoded = frame_decoder.split(body) if batch else [body]
+        elif 'frame' in request.files:
+            encoded = [frame_file.read() for frame_file in request.files.getlist('frame')]
+            batch = len(encoded) > 1
+        else:
+            return jsonify({'error': 'No frame provided in the request'}), 400
+        if not encoded:
+            return jsonify({'error': 'No frame provided in the request'}), 400
+        if len(encoded) > Config.DETECT_FRAME_MAX_BATCH:
+            return jsonify({'error': f"More than {Config.DETECT_FRAME_MAX_BATCH} frames in one request"}), 400
+        # Decoded to BGR, the colour order the model pipeline expects
+        frames = [frame_decoder.decode(data, scale) for data in encoded]
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-        # The detector callback `save_yolo_detection` will be triggered inside `process_frame`
-        # if detections are found. We just return the detections for immediate display.
-        
-        return jsonify({'detections': detections})
+    try:
+        # The detector callback `save_yolo_detection` is triggered for every frame with
+        # detections; they are also returned for immediate display.
+        detections = detector.process_frames(frames, scale=scale)
+        if batch:
+            return jsonify({'frames': [{'detections': frame_detections} for frame_detections in detections]})
+        return jsonify({'detections': detections[0]})
 
     except Exception as e:
         if ENABLE_LOGS:
@@ -758,6 +1067,46 @@ def upload_model():
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
+@app.route('/api/streams', methods=['GET'])
+def list_streams():
+    """List multi-camera streams with their metrics."""
+    if not YOLO_AVAILABLE:
+        return jsonify({'error': 'YOLO not available'}), 400
+    return jsonify(stream_manager.get_metrics())
+
+@app.route('/api/streams', methods=['POST'])
+def add_stream():
+    """Start an additional camera stream (file path or network URL)."""
+    if not YOLO_AVAILABLE:
+        return jsonify({'error': 'YOLO not available'}), 400
+
+    try:
+        data = request.json
+        source = data.get('video_path') or data.get('network_url')
+        if not source:
+            return jsonify({'error': 'Either video_path or network_url is required'}), 400
+
+        stream_id = stream_manager.start_stream(source, data.get('stream_id'))
+        return jsonify({
+            'message': 'Stream started',
+            'stream_id': stream_id,
+            'stream_source': source,
+            'feed_url': f'/video_feed/{stream_id}'
+        }), 201
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 409
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/api/streams/<stream_id>', methods=['DELETE'])
+def remove_stream(stream_id):
+    """Stop a camera stream."""
+    if not YOLO_AVAILABLE:
+        return jsonify({'error': 'YOLO not available'}), 400
+    if not stream_manager.stop_stream(stream_id):
+        return jsonify({'error': 'Stream not found'}), 404
+    return jsonify({'message': 'Stream stopped', 'stream_id': stream_id})
+
 # Route to serve static videos
 @app.route('/videos/<path:filename>')
 def serve_video(filename):
@@ -785,85 +1134,64 @@ def video_feed():
         mimetype='multipart/x-mixed-replace; boundary=frame'
     )
 
+@app.route('/video_feed/<stream_id>')
+def stream_video_feed(stream_id):
+    """MJPEG feed of one multi-camera stream."""
+    stream = stream_manager.get_stream(stream_id) if YOLO_AVAILABLE else None
+    if stream is None or not stream.is_running:
+        img = np.zeros((480, 640, 3), dtype=np.uint8)
+        cv2.putText(img, 'Stream Offline', (200, 240), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+        _, jpeg = cv2.imencode('.jpg', img)
+        return Response(jpeg.tobytes(), mimetype='image/jpeg')
+
+    return Response(
+        stream.generate_frames(),
+        mimetype='multipart/x-mixed-replace; boundary=frame'
+    )
+
 # Create tables on startup
 with app.app_context():
     db.create_all()
-
-@app.route('/api/logs', methods=['GET'])
-def get_logs():
+    # Bring existing databases up to date (indexes, partitioning, ...)
+    apply_migrations(db.engine, context={'partitions': partitions})
+    partitions.load()
+    # Rebuild the rolling statistics from the last 24 hours of detections
+    stats_since = datetime.now(timezone.utc) - timedelta(seconds=stats_aggregator.retention_seconds)
+    D = partitions.source(Detection, since=stats_since)
+    stats_aggregator.rebuild(
+        db.session.query(D.object_id, D.label, D.confidence, D.speed, D.timestamp)
+        .filter(D.timestamp >= stats_since)
+        .order_by(D.timestamp)
+        .yield_per(10000),
+        total_detections=Detection.query.count()
+    )
+# Started once the partitions are known
+detection_writer.start()
+# Not in the reloader's parent process (python app.py in debug mode), which does not serve
+if frame_channel is not None and not (__name__ == '__main__' and not os.environ.get('WERKZEUG_RUN_MAIN')):
     try:
-        with open('server.log', 'r') as f:
-            lines = f.readlines()[-100:]
-        return jsonify({'logs': lines})
-    except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        frame_channel.start()
+        atexit.register(frame_channel.stop)
+    except OSError as e:
+        if ENABLE_LOGS:
+            print(f"❌ Frame channel could not listen on port {FRAME_CHANNEL_CONFIG['port']}: {e}")
 
-@app.route('/api/performance', methods=['GET'])
-def get_performance():
+def _performance_metrics():
     """
-    Returns real-time performance data from the YOLO detector.
+    Performance metrics, as served by /api/performance and pushed live (event 'metrics'):
+    in-memory state plus the cached tracking metrics (one shared computation per TTL,
+    never one query per client).
     """
-    if not YOLO_AVAILABLE or not detector.is_running:
-        return jsonify({
-            "fps": 0,
-            "inferenceTime": 0,
-            "objectCount": 0
-        })
+    running = YOLO_AVAILABLE and (detector.is_running or bool(stream_manager.streams))
+    metrics = detector.get_performance_metrics() if running else {'fps': 0, 'inferenceTime': 0}
 
-    # Get metrics from the detector
-    perf_metrics = detector.get_performance_metrics() if hasattr(detector, 'get_performance_metrics') else {}
-
-    # Get object count from the database (last 2 seconds for a more "current" feel)
-    now = datetime.now(timezone.utc)
-    two_seconds_ago = now - timedelta(seconds=2)
-    object_count = db.session.query(Detection.object_id).filter(Detection.timestamp >= two_seconds_ago).distinct().count()
-
-    # Tracking metrics from DB (fragmentation, persistence, id switches)
-    # Fragmentation: tracks < 10 frames, Persistence: tracks > 60 frames
-    tracks = db.session.query(Trajectory).all()
-    lifetimes = []
-    all_points = []
-    for t in tracks:
-        points = db.session.query(TrajectoryPoint).filter_by(trajectory_id=t.id).order_by(TrajectoryPoint.timestamp).all()
-        lifetimes.append(len(points))
-        all_points.append(points)
-    short_tracks = sum(1 for l in lifetimes if l < 10)
-    long_tracks = sum(1 for l in lifetimes if l > 60)
-    fragmentation_rate = short_tracks / len(lifetimes) if lifetimes else 0
-    persistence_score = long_tracks / len(lifetimes) if lifetimes else 0
-    avg_track_lifetime = float(np.mean(lifetimes)) if lifetimes else 0
-    median_track_lifetime = float(np.median(lifetimes)) if lifetimes else 0
-    total_tracks = len(lifetimes)
-
-
-    # ID switches avancé :
-    # On considère qu'un id switch a lieu si, pour une même trajectoire (même label, positions proches dans le temps),
-    # l'objet change d'ID (on regarde les détections proches dans l'espace et le temps)
-    id_switches_advanced = 0
-    switch_threshold = 50  # pixels (à adapter selon l'échelle)
-    time_threshold = 1.0   # secondes
-    # On parcourt toutes les trajectoires et on cherche des "crossings" d'ID pour un même label
-    for label in set(t.label for t in tracks):
-        trajs = [t for t in tracks if t.label == label]
-        # Pour chaque paire de trajectoires différentes
-        for i in range(len(trajs)):
-            for j in range(i+1, len(trajs)):
-                points_i = db.session.query(TrajectoryPoint).filter_by(trajectory_id=trajs[i].id).order_by(TrajectoryPoint.timestamp).all()
-                points_j = db.session.query(TrajectoryPoint).filter_by(trajectory_id=trajs[j].id).order_by(TrajectoryPoint.timestamp).all()
-                # On cherche des points proches dans le temps et l'espace
-                for pi in points_i:
-                    for pj in points_j:
-                        dt = abs((pi.timestamp - pj.timestamp).total_seconds())
-                        dist = ((pi.x - pj.x)**2 + (pi.y - pj.y)**2)**0.5
-                        if dt < time_threshold and dist < switch_threshold:
-                            id_switches_advanced += 1
-                            break
-                    else:
-                        continue
-                    break
+    # Tracking metrics from DB (fragmentation, persistence, MOTP, id switches), cached between calls
+    tracking = tracking_metrics.get()
+    total_tracks = tracking['totalTracks']
+    id_switches_advanced = tracking['idSwitches']
 
     # Calcul MOTA/MOTP (simplifié)
-    total_detections = db.session.query(Detection).count()
+    total_detections = stats_aggregator.total_detections
     mota = 1.0
     if total_detections > 0:
         mota = 1.0 - (id_switches_advanced / total_detections)
@@ -871,14 +1199,6 @@ def get_performance():
     else:
         mota = 0.0
 
-    # MOTP: on prend la moyenne de la "dispersion" des points dans chaque trajectoire
-    motp_list = []
-    for points in all_points:
-        if len(points) > 1:
-            dists = [((points[i].x - points[i-1].x)**2 + (points[i].y - points[i-1].y)**2)**0.5 for i in range(1, len(points))]
-            motp_list.extend(dists)
-    motp = float(np.mean(motp_list)) if motp_list else 0.0
-
     # Detection Rate, Precision, Recall, F1-Score (approximations)
     # Sans ground truth, on approxime :
     # - Detection Rate = nb objets suivis / nb détections
@@ -891,29 +1211,54 @@ def get_performance():
     f1_score = (2 * precision * recall) / (precision + recall) if (precision + recall) > 0 else 0.0
 
     # Ajout des métriques au dictionnaire
-    perf_metrics['objectCount'] = object_count
-    perf_metrics['fragmentationRate'] = fragmentation_rate
-    perf_metrics['persistenceScore'] = persistence_score
-    perf_metrics['avgTrackLifetime'] = avg_track_lifetime
-    perf_metrics['medianTrackLifetime'] = median_track_lifetime
-    perf_metrics['totalTracks'] = total_tracks
-    perf_metrics['idSwitches'] = id_switches_advanced
-    perf_metrics['MOTA'] = mota
-    perf_metrics['MOTP'] = motp
-    perf_metrics['totalTracks'] = total_tracks
-    perf_metrics['active_trajectories'] = db.session.query(Trajectory).filter_by(is_active=True).count()
+    # Objects seen in the last 2 seconds (for a more "current" feel), from the rolling statistics
+    metrics['objectCount'] = stats_aggregator.window(2)['unique_objects']
+    metrics.update(tracking)
+    metrics['MOTA'] = mota
 
     # Overwrite with tracker value if available
-    if 'idSwitchCount' in perf_metrics:
-        perf_metrics['idSwitches'] = perf_metrics['idSwitchCount']
+    if 'idSwitchCount' in metrics:
+        metrics['idSwitches'] = metrics['idSwitchCount']
+
+    metrics['dbWriter'] = detection_writer.get_stats()
+    metrics['multiStream'] = stream_manager.get_metrics() if YOLO_AVAILABLE else {}
+    metrics['frameChannel'] = frame_channel.get_metrics() if frame_channel is not None else None
+    metrics['zoneCache'] = zone_cache.get_stats()
+    metrics['alerts'] = alert_engine.get_stats()
+    metrics['objectsByClass'] = detector.get_objects_by_class() if YOLO_AVAILABLE else {}
+    metrics['systemStatus'] = 'running' if running else 'stopped'
+    return metrics
+
+def _publish_metrics():
+    """Push the metrics every EVENTS_METRICS_INTERVAL_SECONDS while clients are listening."""
+    while True:
+        time.sleep(Config.EVENTS_METRICS_INTERVAL_SECONDS)
+        if not event_bus.clients:
+            continue
+        try:
+            with app.app_context():
+                event_bus.publish('metrics', _performance_metrics())
+        except Exception as e:
+            if ENABLE_LOGS:
+                print(f"❌ Error publishing metrics: {e}")
 
-    # Use hasattr for safety
-    if hasattr(detector, 'get_objects_by_class'):
-        perf_metrics['objectsByClass'] = getattr(detector, 'get_objects_by_class')()
-    else:
-        perf_metrics['objectsByClass'] = {}
+threading.Thread(target=_publish_metrics, name="metrics-publisher", daemon=True).start()
+
+@app.route('/api/logs', methods=['GET'])
+def get_logs():
+    try:
+        with open('server.log', 'r') as f:
+            lines = f.readlines()[-100:]
+        return jsonify({'logs': lines})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-    return jsonify(perf_metrics)
+@app.route('/api/performance', methods=['GET'])
+def get_performance():
+    """
+    Returns real-time performance data from the YOLO detector (same payload as the live 'metrics' event).
+    """
+    return jsonify(_performance_metrics())
 
 @app.route('/api/system-metrics', methods=['GET'])
 def get_system_metrics():
@@ -953,57 +1298,24 @@ def get_realtime_statistics():
     try:
         now = datetime.now(timezone.utc)
         
-        # Time windows for statistics
+        # Time windows for statistics (in seconds)
         windows = {
-            'last_second': now - timedelta(seconds=1),
-            'last_minute': now - timedelta(minutes=1),
-            'last_5_minutes': now - timedelta(minutes=5),
-            'last_hour': now - timedelta(hours=1),
-            'last_24h': now - timedelta(hours=24)
+            'last_second': 1,
+            'last_minute': 60,
+            'last_5_minutes': 5 * 60,
+            'last_hour': 3600,
+            'last_24h': 24 * 3600
         }
         
-        # Calculate statistics for each window
-        stats = {}
-        for window_name, time_limit in windows.items():
-            detections = Detection.query.filter(Detection.timestamp >= time_limit).all()
-            
-            if detections:
-                # Basic statistics
-                count = len(detections)
-                avg_confidence = sum(d.confidence for d in detections) / count
-                
-                # Unique objects
-                unique_objects = len(set(d.object_id for d in detections))
-                
-                # Detected classes
-                classes = {}
-                for d in detections:
-                    classes[d.label] = classes.get(d.label, 0) + 1
-                
-                # Average speed (if available)
-                speeds = [d.speed for d in detections if d.speed is not None]
-                avg_speed = sum(speeds) / len(speeds) if speeds else 0
-                
-                stats[window_name] = {
-                    'detection_count': count,
-                    'unique_objects': unique_objects,
-                    'avg_confidence': avg_confidence,
-                    'avg_speed': avg_speed,
-                    'classes': classes,
-                    'most_common_class': max(classes.items(), key=lambda x: x[1])[0] if classes else None
-                }
-            else:
-                stats[window_name] = {
-                    'detection_count': 0,
-                    'unique_objects': 0,
-                    'avg_confidence': 0,
-                    'avg_speed': 0,
-                    'classes': {},
-                    'most_common_class': None
-                }
+        # Each window is merged from the pre-aggregated buckets, independently of the table size
+        now_epoch = now.timestamp()
+        stats = {
+            window_name: stats_aggregator.window(seconds, now=now_epoch)
+            for window_name, seconds in windows.items()
+        }
         
         # Global statistics
-        total_detections = Detection.query.count()
+        total_detections = stats_aggregator.total_detections
         total_trajectories = Trajectory.query.count()
         active_trajectories = Trajectory.query.filter_by(is_active=True).count()
         
@@ -1027,7 +1339,9 @@ def get_realtime_statistics():
             }
         }
         
-        return jsonify(response_data)
+        # The query timestamp changes on every call, it is left out of the ETag
+        metadata = {key: value for key, value in response_data['metadata'].items() if key != 'query_timestamp'}
+        return _conditional_json(response_data, etag_of={**response_data, 'metadata': metadata})
         
     except Exception as e:
         return jsonify({'error': str(e)}), 400
@@ -1043,33 +1357,53 @@ def get_current_detections():
         limit = int(request.args.get('limit', 30))  # Augmenter la limite pour plus de détections
         confidence_threshold = float(request.args.get('confidence', 0.0))
         time_window = int(request.args.get('time_window', 10))  # Augmenter la fenêtre de temps
+        after = request.args.get('after', type=int)  # X-Sync-Cursor of the previous response
         
         # Calculate time window
         now = datetime.now(timezone.utc)
         time_limit = now - timedelta(seconds=time_window)
+        watermark = partitions.watermark('detection', db.session.connection())
         
         # For each object_id, take the most recent detection in the time window
+        # (both sides read the partitions overlapping the window only)
+        Latest = partitions.source(Detection, since=time_limit)
         subquery = (
             db.session.query(
-                Detection.object_id,
-                db.func.max(Detection.timestamp).label('max_timestamp')
+                Latest.object_id,
+                db.func.max(Latest.timestamp).label('max_timestamp')
             )
-            .filter(Detection.timestamp >= time_limit)
-            .group_by(Detection.object_id)
-            .subquery()
+            .filter(Latest.timestamp >= time_limit)
         )
+        if after is not None:
+            # Delta sync: the latest of the detections committed since the client's cursor,
+            # merged by object id on the client side
+            subquery = subquery.filter(Latest.id > after, Latest.id <= watermark)
+        subquery = subquery.group_by(Latest.object_id).subquery()
 
+        D = partitions.source(Detection, since=time_limit)
         query = (
-            db.session.query(Detection)
-            .join(subquery, (Detection.object_id == subquery.c.object_id) & (Detection.timestamp == subquery.c.max_timestamp))
+            db.session.query(D)
+            .join(subquery, (D.object_id == subquery.c.object_id) & (D.timestamp == subquery.c.max_timestamp))
+            .filter(D.timestamp >= time_limit)
         )
+        if after is not None:
+            query = query.filter(D.id > after, D.id <= watermark)
         
         # Apply filters
         if confidence_threshold > 0:
-            query = query.filter(Detection.confidence >= confidence_threshold)
+            query = query.filter(D.confidence >= confidence_threshold)
         
         # Limit results
-        detections = query.order_by(Detection.timestamp.desc()).limit(limit).all()
+        cursor = watermark
+        if after is not None:
+            # Oldest committed first: a full page ends the cursor at its last row, the
+            # objects updated past it come with the next call
+            detections = query.order_by(D.id).limit(limit).all()
+            if len(detections) == limit:
+                cursor = detections[-1].id
+            detections.sort(key=lambda d: d.timestamp, reverse=True)
+        else:
+            detections = query.order_by(D.timestamp.desc()).limit(limit).all()
 
         # Adapt timestamp format for frontend (in ms since epoch)
         def detection_to_dict_with_epoch(d):
@@ -1078,6 +1412,8 @@ def get_current_detections():
                 dt = d.timestamp
                 if isinstance(dt, str):
                     dt = datetime.fromisoformat(dt)
+                if dt.tzinfo is None:
+                    dt = dt.replace(tzinfo=timezone.utc)  # SQLite returns naive UTC datetimes
                 dct['timestamp'] = int(dt.timestamp() * 1000)
                 # Add dynamic metadata
                 dct['age_seconds'] = (now - dt).total_seconds()
@@ -1102,82 +1438,34 @@ def get_current_detections():
             }
         }
         
-        return jsonify(response_data)
+        response = jsonify(response_data)
+        response.headers['X-Sync-Cursor'] = str(cursor)
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
 @app.route('/api/alerts', methods=['GET'])
 def api_alerts():
-    rover_lat = float(request.args.get('lat', 48.8566))
-    rover_lon = float(request.args.get('lon', 2.3522))
-    if not zone_polygons['military']:
-        load_osm_zones(rover_lat, rover_lon)
-
-    # Récupérer les détections récentes (ex: 2 dernières minutes)
-    from datetime import datetime, timezone, timedelta
-    now = datetime.now(timezone.utc)
-    time_limit = now - timedelta(minutes=1)
-    # On suppose que Detection a les champs x/y = lon/lat ou latitude/longitude
-    recent_detections = Detection.query.filter(Detection.timestamp >= time_limit).all()
-
-    # Construire une liste d'objets: {class, lat, lon, id, ...}
-    detections = []
-    for d in recent_detections:
-        # On suppose x=lon, y=lat (adapter si besoin)
-        detections.append({
-            'class': d.label,
-            'lat': getattr(d, 'y', None),
-            'lon': getattr(d, 'x', None),
-            'id': d.object_id,
-            'timestamp': d.timestamp.isoformat(),
-            'speed': d.speed,
-            'distance': d.distance
-        })
+    """
+    Alerts raised by the rules as detections are written (Config.ALERT_RULES).
+    Query params: lat, lon (rover position: military zones are loaded around it, in the background),
+    after (cursor: only the alerts raised since, see the X-Sync-Cursor header).
+    Without cursor, the alerts of the last ALERT_WINDOW_SECONDS.
+    """
+    try:
+        rover_lat = float(request.args.get('lat', 48.8566))
+        rover_lon = float(request.args.get('lon', 2.3522))
+        after = request.args.get('after', type=int)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    request_zones(rover_lat, rover_lon)
 
-    alerts = []
-    # Logique IA simple :
-    # - Arme détectée en zone non-militaire => danger
-    # - Arme détectée en zone militaire => sécurisé
-    # - Personne détectée avec vitesse anormale (> 5 m/s) => comportement suspect
-    for det in detections:
-        if det['class'] is None or det['lat'] is None or det['lon'] is None:
-            continue
-        # Arme détectée
-        if 'weapon' in det['class'].lower() or 'gun' in det['class'].lower() or 'rifle' in det['class'].lower():
-            in_mil = point_in_military_zone(det['lat'], det['lon'])
-            if not in_mil:
-                alerts.append({
-                    'type': 'danger',
-                    'message': f"Arme détectée en zone non-militaire (objet {det['id']})",
-                    'lat': det['lat'],
-                    'lon': det['lon'],
-                    'zone': 'civile',
-                    'timestamp': det['timestamp'],
-                    'color': 'red'
-                })
-            else:
-                alerts.append({
-                    'type': 'secure',
-                    'message': f"Arme détectée en zone militaire (objet {det['id']})",
-                    'lat': det['lat'],
-                    'lon': det['lon'],
-                    'zone': 'militaire',
-                    'timestamp': det['timestamp'],
-                    'color': 'green'
-                })
-        # Personne avec vitesse anormale
-        elif 'person' in det['class'].lower() and det.get('speed') is not None and det['speed'] > 5:
-            alerts.append({
-                'type': 'anomaly',
-                'message': f"Personne (objet {det['id']}) avec vitesse anormale : {det['speed']:.1f} m/s",
-                'lat': det['lat'],
-                'lon': det['lon'],
-                'zone': 'inconnue',
-                'timestamp': det['timestamp'],
-                'color': 'orange'
-            })
-    return jsonify({'alerts': alerts})
+    since = None if after is not None else time.time() - Config.ALERT_WINDOW_SECONDS
+    alerts, cursor = alert_engine.read(after=after, since=since)
+    response = jsonify({'alerts': alerts})
+    response.headers['X-Sync-Cursor'] = str(cursor)
+    return response
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
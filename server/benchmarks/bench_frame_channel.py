@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+bench_frame_channel.py - Loopback test of the persistent frame channel.
+Pushes synthetic JPEG frames from a local edge sender (FrameChannelClient) to a
+FrameChannelServer and compares with one HTTP POST per frame (raw JPEG body, as in
+/api/yolo/detect_frame) to a local Werkzeug server. Both sides decode the frames with
+services/frame_ingest.py and run the same stand-in detection (sleep of --detect-ms).
+The channel sender does not wait for the answers: frames are pipelined at --send-fps
+(0 = as fast as possible), and the ones arriving faster than --target-fps (or than the
+server keeps up with) are skipped.
+
+Usage: python benchmarks/bench_frame_channel.py [--frames 300] [--detect-ms 5] [--send-fps 0] [--target-fps 0]
+"""
+
+import argparse
+import http.client
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+
+from flask import Flask, jsonify, request
+from werkzeug.serving import make_server
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_frame_ingest import synthetic_jpeg  # noqa: E402
+from services.frame_channel import RESULT, FrameChannelClient, FrameChannelServer  # noqa: E402
+from services.frame_ingest import FrameDecoder  # noqa: E402
+
+
+def stand_in_detect(detect_ms):
+    def detect(frame):
+        time.sleep(detect_ms / 1000)  # The model would run here
+        return [{'label': 'person', 'x': frame.shape[1] / 2, 'y': frame.shape[0] / 2}]
+    return detect
+
+
+def summary(name, frames, answered, elapsed, latencies, skipped=0):
+    latencies = sorted(latencies)
+    p95 = latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0
+    print(f"{name:<22}{frames / elapsed:>10.1f}{answered / elapsed:>12.1f}{skipped:>9}"
+          f"{statistics.mean(latencies) if latencies else 0:>12.1f}{p95:>10.1f}")
+
+
+def bench_http(jpeg, frames, detect_ms):
+    app = Flask(__name__)
+    decoder = FrameDecoder()
+    detect = stand_in_detect(detect_ms)
+
+    @app.route('/detect_frame', methods=['POST'])
+    def detect_frame():
+        body = decoder.read_body(request.stream, request.content_length)
+        return jsonify({'detections': detect(decoder.decode(body))})
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(frames):
+        sent = time.perf_counter()
+        connection = http.client.HTTPConnection('127.0.0.1', server.server_port)
+        connection.request('POST', '/detect_frame', body=jpeg, headers={'Content-Type': 'image/jpeg'})
+        response = connection.getresponse()
+        response.read()
+        connection.close()
+        latencies.append((time.perf_counter() - sent) * 1000)
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    summary("HTTP POST per frame", frames, frames, elapsed, latencies)
+
+
+def bench_channel(jpeg, frames, detect_ms, send_fps, target_fps):
+    server = FrameChannelServer(lambda stream_id: stand_in_detect(detect_ms), host='127.0.0.1', port=0,
+                                target_fps=target_fps, max_pending=4)
+    server.start()
+    client = FrameChannelClient('127.0.0.1', server.port, stream_id='loopback')
+    latencies = []
+    results = []
+
+    def receive():
+        for _ in range(frames):
+            kind, seq, timestamp, data = client.receive()
+            if kind == RESULT:
+                latencies.append((time.time() - timestamp) * 1000)
+                results.append(seq)
+
+    receiver = threading.Thread(target=receive)
+    receiver.start()
+    start = time.perf_counter()
+    for _ in range(frames):
+        client.send(jpeg)
+        if send_fps:
+            time.sleep(1 / send_fps)
+    receiver.join()
+    elapsed = time.perf_counter() - start
+    client.close()
+    server.stop()
+    assert results == sorted(results), "Results out of sequence order"
+    summary("persistent channel", frames, len(results), elapsed, latencies, frames - len(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--frames', type=int, default=300)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--detect-ms', type=float, default=5.0)
+    parser.add_argument('--send-fps', type=float, default=0, help="Channel sender rate (0 = as fast as possible)")
+    parser.add_argument('--target-fps', type=float, default=0, help="Channel rate limit (0 = none)")
+    args = parser.parse_args()
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # No request log
+    jpeg = synthetic_jpeg(args.width, args.height)
+    print(f"{args.frames} frames of {args.width}x{args.height} ({len(jpeg) / 1024:.0f} KiB), "
+          f"detection {args.detect_ms} ms\n")
+    print(f"{'Transport':<22}{'sent/s':>10}{'answered/s':>12}{'skipped':>9}{'mean (ms)':>12}{'p95 (ms)':>10}")
+    bench_http(jpeg, args.frames, args.detect_ms)
+    bench_channel(jpeg, args.frames, args.detect_ms, args.send_fps, args.target_fps)
+
+
+if __name__ == "__main__":
+    main()
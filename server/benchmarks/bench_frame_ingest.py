@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+bench_frame_ingest.py - Requests/s of the /api/yolo/detect_frame ingest path.
+Compares the former multipart upload decoded with PIL with the raw JPEG body and the
+length-prefixed batch body decoded by services/frame_ingest.py (full and reduced
+resolution), through the Flask test client. The model is left out: both routes hand
+the decoded frames to a no-op, so only the upload and decoding costs are measured.
+
+Usage: python benchmarks/bench_frame_ingest.py [--width 1280] [--height 720] [--requests 200] [--batch 8]
+"""
+
+import argparse
+import io
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+from flask import Flask, jsonify, request
+from PIL import Image
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.frame_ingest import FRAME_BATCH_TYPE, RAW_FRAME_TYPES, FrameDecoder, encode_batch  # noqa: E402
+
+
+def synthetic_jpeg(width, height, quality=85):
+    """A camera-like frame: gradients, shapes and noise."""
+    rng = np.random.default_rng(0)
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    frame = np.stack([np.broadcast_to(x, (height, width)), np.broadcast_to(y, (height, width)),
+                      np.full((height, width), 128, np.float32)], axis=2)
+    frame = frame + rng.normal(0, 12, frame.shape)
+    frame = np.clip(frame, 0, 255).astype(np.uint8)
+    for _ in range(20):
+        x1, y1 = int(rng.integers(0, width - 100)), int(rng.integers(0, height - 100))
+        color = tuple(int(c) for c in rng.integers(0, 255, 3))
+        cv2.rectangle(frame, (x1, y1), (x1 + 80, y1 + 160), color, -1)
+    _, encoded = cv2.imencode('.jpg', frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+    return encoded.tobytes()
+
+
+def create_app():
+    app = Flask(__name__)
+    decoder = FrameDecoder(max_frames=64)
+    decoded = []
+
+    def detect(frames):
+        decoded.append(sum(frame.shape[0] for frame in frames))  # The model would run here
+        return [[] for _ in frames]
+
+    # --- Former route, kept here for comparison only ---
+    @app.route('/legacy', methods=['POST'])
+    def legacy():
+        image = Image.open(io.BytesIO(request.files['frame'].read()))
+        frame_np = np.array(image)  # RGB
+        return jsonify({'detections': detect([frame_np])[0]})
+
+    @app.route('/ingest', methods=['POST'])
+    def ingest():
+        scale = int(request.args.get('scale', 1))
+        body = decoder.read_body(request.stream, request.content_length)
+        if request.mimetype == FRAME_BATCH_TYPE:
+            frames = [decoder.decode(data, scale) for data in decoder.split(body)]
+            return jsonify({'frames': [{'detections': d} for d in detect(frames)]})
+        assert request.mimetype in RAW_FRAME_TYPES
+        return jsonify({'detections': detect([decoder.decode(body, scale)])[0]})
+
+    return app
+
+
+def run(name, send, requests_count, frames_per_request):
+    send()  # Warm-up
+    start = time.perf_counter()
+    for _ in range(requests_count):
+        response = send()
+        assert response.status_code == 200, response.data
+    elapsed = time.perf_counter() - start
+    print(f"{name:<40}{requests_count / elapsed:>12.1f}{requests_count * frames_per_request / elapsed:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--batch', type=int, default=8)
+    args = parser.parse_args()
+
+    jpeg = synthetic_jpeg(args.width, args.height)
+    batch_body = encode_batch([jpeg] * args.batch)
+    client = create_app().test_client()
+    print(f"{args.width}x{args.height} JPEG, {len(jpeg) / 1024:.0f} KiB\n")
+    print(f"{'Ingest path':<40}{'requests/s':>12}{'frames/s':>12}")
+
+    run("multipart + PIL (former)", lambda: client.post(
+        '/legacy', data={'frame': (io.BytesIO(jpeg), 'frame.jpg')}, content_type='multipart/form-data'),
+        args.requests, 1)
+    run("raw JPEG + cv2.imdecode", lambda: client.post(
+        '/ingest', data=jpeg, content_type='image/jpeg'), args.requests, 1)
+    run("raw JPEG + cv2.imdecode, scale=2", lambda: client.post(
+        '/ingest?scale=2', data=jpeg, content_type='image/jpeg'), args.requests, 1)
+    batch_requests = max(1, args.requests // args.batch)
+    run(f"batch of {args.batch}", lambda: client.post(
+        '/ingest', data=batch_body, content_type=FRAME_BATCH_TYPE), batch_requests, args.batch)
+    run(f"batch of {args.batch}, scale=2", lambda: client.post(
+        '/ingest?scale=2', data=batch_body, content_type=FRAME_BATCH_TYPE), batch_requests, args.batch)
+
+
+if __name__ == "__main__":
+    main()
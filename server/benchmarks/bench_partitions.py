@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+bench_partitions.py - Retention and range queries, plain table vs hourly partitions.
+Builds a database of synthetic detections over the last 24 hours (schema v1, see
+bench_queries.py), copies it, partitions the copy with services/partitions.py, then
+compares on both: the recent-window endpoint queries and the retention cleanup
+(DELETE of the rows older than --retention-hours vs dropping the expired partitions).
+
+Usage: python benchmarks/bench_partitions.py [--detections 1000000] [--retention-hours 12] [--repeat 5]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import Column, DateTime, Float, Index, Integer, String, create_engine, func, select
+from sqlalchemy.orm import Session, declarative_base
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_queries import populate  # noqa: E402
+from services.migrations import MIGRATIONS, apply_migrations  # noqa: E402
+from services.partitions import PartitionManager  # noqa: E402
+
+Base = declarative_base()
+
+
+class Detection(Base):
+    """Same table as app.Detection."""
+    __tablename__ = 'detection'
+    id = Column(Integer, primary_key=True)
+    object_id = Column(Integer, nullable=False)
+    label = Column(String(50), nullable=False)
+    confidence = Column(Float, nullable=False)
+    x = Column(Float, nullable=False)
+    y = Column(Float, nullable=False)
+    speed = Column(Float)
+    distance = Column(Float)
+    timestamp = Column(DateTime)
+    history_id = Column(String(100), unique=True)
+    __table_args__ = (
+        Index('ix_detection_timestamp_label_object_id', 'timestamp', 'label', 'object_id'),
+        Index('ix_detection_object_id_timestamp', 'object_id', 'timestamp'),
+    )
+
+
+def window_queries(now):
+    """(name, since, query builder) of the recent-window endpoint queries."""
+    return [
+        ("GET /api/detections?timeRange=1h&class=weapon", now - timedelta(hours=1),
+         lambda D, since: select(D).where(D.timestamp >= since, D.label == 'weapon')
+         .order_by(D.timestamp.desc()).limit(100)),
+        ("GET /api/performance (object count)", now - timedelta(seconds=2),
+         lambda D, since: select(func.count(D.object_id.distinct())).where(D.timestamp >= since)),
+    ]
+
+
+def timed(function, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--detections', type=int, default=1_000_000)
+    parser.add_argument('--retention-hours', type=int, default=12)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    plain_path = os.path.join(directory, 'plain.db')
+    partitioned_path = os.path.join(directory, 'partitioned.db')
+    now = datetime.utcnow()
+
+    start = time.perf_counter()
+    plain = create_engine(f'sqlite:///{plain_path}')
+    populate(plain, args.detections, now)
+    apply_migrations(plain, [migration for migration in MIGRATIONS if migration[0] == 1])
+    plain.dispose()
+    shutil.copy(plain_path, partitioned_path)
+    print(f"Populated {args.detections} detections in {time.perf_counter() - start:.1f}s")
+
+    partitioned = create_engine(f'sqlite:///{partitioned_path}')
+    manager = PartitionManager(partitioned)
+    manager.register(Detection, retention=timedelta(hours=args.retention_hours))
+    start = time.perf_counter()
+    with partitioned.begin() as connection:
+        manager.migrate_legacy(connection, 'detection')
+    manager.load()
+    print(f"Partitioned in {time.perf_counter() - start:.1f}s: {manager.get_stats()['detection']}\n")
+    plain = create_engine(f'sqlite:///{plain_path}')
+
+    hour_ago = now - timedelta(hours=1)
+    with plain.connect() as connection:
+        table_ms = timed(lambda: connection.execute(
+            select(func.count()).select_from(Detection).where(Detection.timestamp >= hour_ago)).scalar(), args.repeat)
+    count_ms = timed(lambda: manager.count('detection', hour_ago), args.repeat)
+    print(f"Hourly count: table {table_ms:.2f} ms, partitions (summed counts) {count_ms:.2f} ms\n")
+
+    print(f"{'Query':<48}{'table (ms)':>12}{'view (ms)':>12}{'routed (ms)':>13}")
+    for name, since, build in window_queries(now):
+        with Session(plain) as session:
+            table_ms = timed(lambda: session.execute(build(Detection, since)).all(), args.repeat)
+        with Session(partitioned) as session:
+            view_ms = timed(lambda: session.execute(build(Detection, since)).all(), args.repeat)
+            routed_ms = timed(lambda: session.execute(build(manager.source(Detection, since), since)).all(),
+                              args.repeat)
+        print(f"{name:<48}{table_ms:>12.2f}{view_ms:>12.2f}{routed_ms:>13.2f}")
+
+    cutoff = now - timedelta(hours=args.retention_hours)
+    start = time.perf_counter()
+    with plain.begin() as connection:
+        deleted = connection.execute(Detection.__table__.delete().where(Detection.timestamp < cutoff)).rowcount
+    delete_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    dropped = manager.drop_expired(now)['detection']
+    drop_ms = (time.perf_counter() - start) * 1000
+    print(f"\nRetention {args.retention_hours}h: DELETE {deleted} rows in {delete_ms:.0f} ms, "
+          f"dropped partitions ({dropped} rows) in {drop_ms:.0f} ms")
+
+    plain.dispose()
+    partitioned.dispose()
+    shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+bench_queries.py - Query plans and latencies of the hot endpoint queries.
+Builds a throwaway SQLite database with the server schema (as created by
+db.create_all() before indexes were declared), fills it with synthetic
+detections, trajectories and trajectory points, then runs the queries issued
+by each endpoint before and after applying services/migrations.py, printing
+EXPLAIN QUERY PLAN and the median latency of each.
+
+Usage: python benchmarks/bench_queries.py [--detections 1000000] [--repeat 5] [--db path]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.migrations import MIGRATIONS, apply_migrations  # noqa: E402
+
+# Tables as created by db.create_all() from the models in app.py, without the indexes
+SCHEMA = [
+    """CREATE TABLE detection (
+        id INTEGER NOT NULL, object_id INTEGER NOT NULL, label VARCHAR(50) NOT NULL,
+        confidence FLOAT NOT NULL, x FLOAT NOT NULL, y FLOAT NOT NULL, speed FLOAT, distance FLOAT,
+        timestamp DATETIME, history_id VARCHAR(100), PRIMARY KEY (id), UNIQUE (history_id))""",
+    """CREATE TABLE trajectory (
+        id INTEGER NOT NULL, object_id INTEGER NOT NULL, label VARCHAR(50) NOT NULL,
+        start_time DATETIME, last_seen DATETIME, is_active BOOLEAN, PRIMARY KEY (id))""",
+    """CREATE TABLE trajectory_point (
+        id INTEGER NOT NULL, trajectory_id INTEGER NOT NULL, x FLOAT NOT NULL, y FLOAT NOT NULL,
+        speed FLOAT, distance FLOAT, timestamp DATETIME, PRIMARY KEY (id),
+        FOREIGN KEY(trajectory_id) REFERENCES trajectory (id))""",
+]
+
+LABELS = ['person', 'soldier', 'weapon', 'military_vehicles', 'civilian_vehicles',
+          'military_aircraft', 'civilian_aircraft']
+DETECTIONS_PER_OBJECT = 50
+
+
+def _ts(dt):
+    """SQLAlchemy's SQLite DateTime storage format."""
+    return dt.strftime('%Y-%m-%d %H:%M:%S.%f')
+
+
+def populate(engine, n_detections, now):
+    """Detections spread over the last 24h, one trajectory per object and one point per detection."""
+    rng = random.Random(0)
+    n_objects = max(1, n_detections // DETECTIONS_PER_OBJECT)
+    span = 24 * 3600
+    with engine.begin() as connection:
+        for statement in SCHEMA:
+            connection.exec_driver_sql(statement)
+        trajectories = []
+        for object_id in range(1, n_objects + 1):
+            start = now - timedelta(seconds=span * (1 - (object_id - 1) / n_objects))
+            last_seen = start + timedelta(seconds=DETECTIONS_PER_OBJECT * 0.1)
+            trajectories.append((object_id, object_id, LABELS[object_id % len(LABELS)], _ts(start),
+                                 _ts(last_seen), last_seen > now - timedelta(hours=1)))
+        connection.exec_driver_sql("INSERT INTO trajectory VALUES (?, ?, ?, ?, ?, ?)", trajectories)
+
+        batch_size = 100_000
+        for offset in range(0, n_detections, batch_size):
+            detections, points = [], []
+            for i in range(offset, min(offset + batch_size, n_detections)):
+                object_id = i // DETECTIONS_PER_OBJECT + 1
+                trajectory = trajectories[object_id - 1]
+                timestamp = _ts(datetime.strptime(trajectory[3], '%Y-%m-%d %H:%M:%S.%f')
+                                + timedelta(seconds=(i % DETECTIONS_PER_OBJECT) * 0.1))
+                x, y = rng.uniform(0, 1280), rng.uniform(0, 720)
+                detections.append((i + 1, object_id, trajectory[2], rng.uniform(0.1, 1.0), x, y,
+                                   rng.uniform(0, 10), rng.uniform(1, 100), timestamp, f"bench_{i}"))
+                points.append((i + 1, object_id, x, y, None, None, timestamp))
+            connection.exec_driver_sql("INSERT INTO detection VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", detections)
+            connection.exec_driver_sql("INSERT INTO trajectory_point VALUES (?, ?, ?, ?, ?, ?, ?)", points)
+    return n_objects
+
+
+def endpoint_queries(now, n_objects):
+    """(endpoint, SQL, parameters) of the queries issued by the hot endpoints."""
+    hour_ago = _ts(now - timedelta(hours=1))
+    day_ago = _ts(now - timedelta(hours=24))
+    object_id = n_objects // 2
+    return [
+        ("GET /api/detections?class=weapon",
+         "SELECT * FROM detection WHERE timestamp >= ? AND label = ? ORDER BY timestamp DESC LIMIT 100",
+         (day_ago, 'weapon')),
+        ("GET /api/detections/current",
+         "SELECT detection.* FROM detection JOIN (SELECT object_id, max(timestamp) AS max_timestamp "
+         "FROM detection WHERE timestamp >= ? GROUP BY object_id) AS latest "
+         "ON detection.object_id = latest.object_id AND detection.timestamp = latest.max_timestamp "
+         "ORDER BY detection.timestamp DESC LIMIT 30",
+         (_ts(now - timedelta(seconds=10)),)),
+        ("GET /api/statistics (hourly count)",
+         "SELECT count(*) FROM detection WHERE timestamp >= ?",
+         (hour_ago,)),
+        ("GET /api/performance (object count)",
+         "SELECT count(DISTINCT object_id) FROM detection WHERE timestamp >= ?",
+         (_ts(now - timedelta(seconds=2)),)),
+        ("GET /api/statistics/realtime (active trajectories)",
+         "SELECT count(*) FROM trajectory WHERE is_active = 1",
+         ()),
+        ("GET /api/statistics/realtime (recent trajectories)",
+         "SELECT count(*) FROM trajectory WHERE start_time >= ?",
+         (hour_ago,)),
+        ("POST /api/detections (trajectory lookup)",
+         "SELECT * FROM trajectory WHERE object_id = ? LIMIT 1",
+         (object_id,)),
+        ("GET /api/trajectories (points of one trajectory)",
+         "SELECT * FROM trajectory_point WHERE trajectory_id = ? ORDER BY timestamp",
+         (object_id,)),
+        ("POST /api/cleanup/auto (inactive trajectories)",
+         "SELECT count(*) FROM trajectory WHERE last_seen < ? AND is_active = 1",
+         (hour_ago,)),
+        ("POST /api/cleanup/auto (old points)",
+         "SELECT count(*) FROM trajectory_point WHERE timestamp < ?",
+         (_ts(now - timedelta(days=3)),)),
+    ]
+
+
+def run(engine, queries, repeat):
+    results = []
+    with engine.connect() as connection:
+        for name, sql, params in queries:
+            plan = [row[-1] for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params)]
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                connection.exec_driver_sql(sql, params).fetchall()
+                timings.append((time.perf_counter() - start) * 1000)
+            results.append((name, plan, statistics.median(timings)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--detections', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--db', help="Database file (default: temporary file, deleted afterwards)")
+    args = parser.parse_args()
+
+    path = args.db or os.path.join(tempfile.mkdtemp(), 'bench_queries.db')
+    engine = create_engine(f'sqlite:///{path}')
+    now = datetime.utcnow()
+
+    start = time.perf_counter()
+    n_objects = populate(engine, args.detections, now)
+    print(f"Populated {args.detections} detections / {n_objects} trajectories in {time.perf_counter() - start:.1f}s")
+    queries = endpoint_queries(now, n_objects)
+
+    before = run(engine, queries, args.repeat)
+    start = time.perf_counter()
+    # Indexes only: partitioning (v2) is measured by bench_partitions.py
+    version = apply_migrations(engine, [migration for migration in MIGRATIONS if migration[0] == 1])
+    print(f"Migrated to schema v{version} in {time.perf_counter() - start:.1f}s\n")
+    after = run(engine, queries, args.repeat)
+
+    print(f"{'Query':<52}{'before (ms)':>12}{'after (ms)':>12}{'speedup':>10}")
+    for (name, _, before_ms), (_, _, after_ms) in zip(before, after):
+        print(f"{name:<52}{before_ms:>12.2f}{after_ms:>12.2f}{before_ms / max(after_ms, 1e-3):>9.0f}x")
+    print()
+    for (name, before_plan, _), (_, after_plan, _) in zip(before, after):
+        print(name)
+        print("  before: " + " | ".join(before_plan))
+        print("  after:  " + " | ".join(after_plan))
+
+    engine.dispose()
+    if not args.db:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,71 +1,406 @@
-from collections import defaultdict
+from collections import defaultdict, deque
+import time
+
 import numpy as np
 
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:  # scipy is optional, fall back to a greedy matcher
+    linear_sum_assignment = None
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """
+    Pairwise IoU between two sets of boxes.
+    Args:
+        boxes_a: Array (N,4) of [x1,y1,x2,y2]
+        boxes_b: Array (M,4) of [x1,y1,x2,y2]
+    Returns:
+        np.ndarray: (N,M) IoU matrix
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    if len(boxes_a) == 0 or len(boxes_b) == 0:
+        return np.zeros((len(boxes_a), len(boxes_b)), dtype=np.float32)
+    x1 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y1 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x2 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y2 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    intersection = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.where(union > 0, intersection / np.maximum(union, 1e-9), 0.0).astype(np.float32)
+
+
+def linear_assignment(cost, max_cost):
+    """
+    Optimal one-to-one assignment on a cost matrix, rejecting pairs above `max_cost`.
+    Uses scipy's Hungarian solver when available, otherwise a greedy lowest-cost-first matcher.
+    Returns:
+        tuple: (matches (K,2) array of [row, col], unmatched rows, unmatched cols)
+    """
+    n_rows, n_cols = cost.shape
+    if n_rows == 0 or n_cols == 0:
+        return np.empty((0, 2), dtype=np.int64), np.arange(n_rows), np.arange(n_cols)
+
+    if linear_sum_assignment is not None:
+        # Gated pairs get a prohibitive cost so the solver never prefers them
+        gated = np.where(cost > max_cost, max_cost + 1e4, cost)
+        rows, cols = linear_sum_assignment(gated)
+        keep = cost[rows, cols] <= max_cost
+        rows, cols = rows[keep], cols[keep]
+    else:
+        order = np.argsort(cost, axis=None)
+        rows_used = np.zeros(n_rows, dtype=bool)
+        cols_used = np.zeros(n_cols, dtype=bool)
+        rows, cols = [], []
+        for flat in order:
+            r, c = divmod(int(flat), n_cols)
+            if cost[r, c] > max_cost:
+                break
+            if rows_used[r] or cols_used[c]:
+                continue
+            rows_used[r] = cols_used[c] = True
+            rows.append(r)
+            cols.append(c)
+        rows = np.array(rows, dtype=np.int64)
+        cols = np.array(cols, dtype=np.int64)
+
+    matches = np.stack([rows, cols], axis=1) if len(rows) else np.empty((0, 2), dtype=np.int64)
+    unmatched_rows = np.setdiff1d(np.arange(n_rows), rows)
+    unmatched_cols = np.setdiff1d(np.arange(n_cols), cols)
+    return matches, unmatched_rows, unmatched_cols
+
+
+def xyxy_to_xyah(boxes):
+    """[x1,y1,x2,y2] -> [center x, center y, aspect ratio w/h, height]"""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    w = boxes[:, 2] - boxes[:, 0]
+    h = np.maximum(boxes[:, 3] - boxes[:, 1], 1e-6)
+    return np.stack([boxes[:, 0] + w / 2, boxes[:, 1] + h / 2, w / h, h], axis=1)
+
+
+def xyah_to_xyxy(xyah):
+    """[center x, center y, aspect ratio w/h, height] -> [x1,y1,x2,y2]"""
+    h = np.maximum(xyah[:, 3], 1.0)
+    w = xyah[:, 2] * h
+    return np.stack([xyah[:, 0] - w / 2, xyah[:, 1] - h / 2, xyah[:, 0] + w / 2, xyah[:, 1] + h / 2], axis=1)
+
+
+class KalmanBoxFilter:
+    """
+    Constant-velocity Kalman filter on [cx, cy, a, h, vx, vy, va, vh], operating on
+    stacked arrays of N tracks: means (N,8) and covariances (N,8,8).
+    Noise is proportional to the box height, as in the reference ByteTrack/DeepSORT filter.
+    """
+
+    def __init__(self, std_weight_position=1. / 20, std_weight_velocity=1. / 160):
+        self.std_weight_position = std_weight_position
+        self.std_weight_velocity = std_weight_velocity
+        self.motion_mat = np.eye(8)
+        self.motion_mat[:4, 4:] = np.eye(4)
+
+    def initiate(self, measurements):
+        """Create states from (N,4) xyah measurements, with zero velocity."""
+        n = len(measurements)
+        mean = np.zeros((n, 8))
+        mean[:, :4] = measurements
+        h = measurements[:, 3]
+        wp, wv = self.std_weight_position, self.std_weight_velocity
+        std = np.stack([
+            2 * wp * h, 2 * wp * h, np.full(n, 1e-2), 2 * wp * h,
+            10 * wv * h, 10 * wv * h, np.full(n, 1e-5), 10 * wv * h
+        ], axis=1)
+        covariance = np.zeros((n, 8, 8))
+        idx = np.arange(8)
+        covariance[:, idx, idx] = std ** 2
+        return mean, covariance
+
+    def predict(self, mean, covariance):
+        """Propagate all tracks one frame ahead (one batched matrix product)."""
+        if len(mean) == 0:
+            return mean, covariance
+        h = mean[:, 3]
+        wp, wv = self.std_weight_position, self.std_weight_velocity
+        n = len(mean)
+        std = np.stack([
+            wp * h, wp * h, np.full(n, 1e-2), wp * h,
+            wv * h, wv * h, np.full(n, 1e-5), wv * h
+        ], axis=1)
+        F = self.motion_mat
+        mean = mean @ F.T
+        covariance = F @ covariance @ F.T
+        idx = np.arange(8)
+        covariance[:, idx, idx] += std ** 2
+        return mean, covariance
+
+    def update(self, mean, covariance, measurements):
+        """Correct the states of N tracks with their (N,4) xyah measurements."""
+        if len(mean) == 0:
+            return mean, covariance
+        h = mean[:, 3]
+        wp = self.std_weight_position
+        n = len(mean)
+        std = np.stack([wp * h, wp * h, np.full(n, 1e-1), wp * h], axis=1)
+        idx = np.arange(4)
+        projected_cov = covariance[:, :4, :4].copy()
+        projected_cov[:, idx, idx] += std ** 2
+        # Kalman gain K = P H^T S^-1, solved rather than inverted (S is symmetric)
+        gain = np.linalg.solve(projected_cov, covariance[:, :4, :]).transpose(0, 2, 1)
+        innovation = measurements - mean[:, :4]
+        mean = mean + np.einsum('nij,nj->ni', gain, innovation)
+        covariance = covariance - gain @ projected_cov @ gain.transpose(0, 2, 1)
+        return mean, covariance
+
+
+class TrackState:
+    New = 0  # Unconfirmed: started last frame, confirmed by a second match
+    Tracked = 1
+    Lost = 2
+    Removed = 3
+
+
 class ByteTracker:
-    def __init__(self, track_thresh=0.5, track_buffer=30, match_thresh=0.8):
+    """
+    ByteTrack multi-object tracker.
+    Track states live in compact NumPy arrays (one row per track) and are predicted
+    together with a batched Kalman filter. Each frame, high-score detections are
+    associated first against all tracks, then low-score detections are used to
+    extend the tracks left unmatched, which keeps IDs alive through partial occlusion.
+    New tracks start from detections scoring at least `det_thresh` and stay unconfirmed
+    (no id reported for their detections) until matched again the next frame, so that
+    single-frame false positives are dropped before persistence and alerts.
+    Args:
+        track_thresh (float): Score separating high and low confidence detections
+        det_thresh (float): Min score of a detection starting a track (default track_thresh + 0.1)
+        track_buffer (int): Number of frames a lost track is kept before removal
+        match_thresh (float): Maximum IoU cost (1 - IoU) for the first association
+        low_thresh (float): Detections below this score are ignored entirely
+        second_match_thresh (float): Maximum IoU cost for the low-score association
+        unconfirmed_match_thresh (float): Maximum IoU cost for confirming a new track
+        history_size (int): Number of past centers kept per track in track_history
+        id_offset (int): First track id is id_offset + 1 (keeps ids unique across streams)
+        rate_window (int): Number of recent steps over which the step rate is measured
+            (velocities are per step in the Kalman state, see velocities())
+    """
+
+    def __init__(self, track_thresh=0.5, track_buffer=30, match_thresh=0.8,
+                 low_thresh=0.1, second_match_thresh=0.5, history_size=50, id_offset=0, rate_window=30,
+                 det_thresh=None, unconfirmed_match_thresh=0.7):
         self.track_thresh = track_thresh
+        self.det_thresh = track_thresh + 0.1 if det_thresh is None else det_thresh
+        self.unconfirmed_match_thresh = unconfirmed_match_thresh
         self.track_buffer = track_buffer
         self.match_thresh = match_thresh
-        self.track_history = defaultdict(list)
-        self.tracks = []
-        self.next_id = 1
-        self.disappeared = defaultdict(int)
+        self.low_thresh = low_thresh
+        self.second_match_thresh = second_match_thresh
+        self.history_size = history_size
+        self.id_offset = id_offset
+        self.rate_window = rate_window
+        self.kalman = KalmanBoxFilter()
+        self.reset()
+
+    def reset(self):
+        self.track_history = defaultdict(lambda: deque(maxlen=self.history_size))
+        self.next_id = self.id_offset + 1
+        self.frame_id = 0
+        self.removed_count = 0
+        self._step_times = deque(maxlen=self.rate_window)
+        # Per-track state arrays
+        self._mean = np.zeros((0, 8))
+        self._cov = np.zeros((0, 8, 8))
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._state = np.zeros(0, dtype=np.int8)
+        self._score = np.zeros(0, dtype=np.float32)
+        self._cls = np.zeros(0, dtype=np.int64)
+        self._last_frame = np.zeros(0, dtype=np.int64)
+        self._start_frame = np.zeros(0, dtype=np.int64)
+
+    @property
+    def tracks(self):
+        """Currently tracked (not lost) tracks."""
+        return self._as_dicts(np.flatnonzero(self._state == TrackState.Tracked))
+
+    @property
+    def lost_tracks(self):
+        return self._as_dicts(np.flatnonzero(self._state == TrackState.Lost))
 
-    def update(self, detections, frame=None):
+    def _as_dicts(self, indices):
+        boxes = xyah_to_xyxy(self._mean[indices, :4]) if len(indices) else np.zeros((0, 4))
+        return [
+            {
+                'track_id': int(self._ids[i]),
+                'bbox': box,
+                'confidence': float(self._score[i]),
+                'class_id': int(self._cls[i]),
+                'state': int(self._state[i]),
+                'age': int(self.frame_id - self._start_frame[i])
+            }
+            for i, box in zip(indices.tolist(), boxes.tolist())
+        ]
+
+    @property
+    def step_rate(self):
+        """Steps (update or predict calls) per second over the last `rate_window` steps, 0 if unknown."""
+        if len(self._step_times) < 2:
+            return 0.0
+        span = self._step_times[-1] - self._step_times[0]
+        return (len(self._step_times) - 1) / span if span > 0 else 0.0
+
+    def _record_step(self, timestamp):
+        self.frame_id += 1
+        self._step_times.append(time.time() if timestamp is None else timestamp)
+
+    def velocities(self, track_ids):
         """
-        Update tracks using a simple IoU-based tracking (ByteTrack-style placeholder)
+        Smoothed velocity of tracks, read from their Kalman state.
         Args:
-            detections: List of detections [x1,y1,x2,y2,conf,cls]
+            track_ids: (N,) track ids, as returned by update() (-1 if none)
+        Returns:
+            np.ndarray: (N,3) [vx, vy, vh] in pixels per second (center and box height),
+                NaN for untracked detections, tracks started this step and while the
+                step rate is unknown
+        """
+        track_ids = np.asarray(track_ids, dtype=np.int64)
+        velocities = np.full((len(track_ids), 3), np.nan)
+        rate = self.step_rate
+        if not len(self._ids) or not rate:
+            return velocities
+        # Track ids are allocated increasingly and rows never reordered: _ids is sorted
+        rows = np.minimum(np.searchsorted(self._ids, track_ids), len(self._ids) - 1)
+        found = (track_ids >= 0) & (self._ids[rows] == track_ids)
+        found[found] = self._start_frame[rows[found]] < self.frame_id
+        velocities[found] = self._mean[rows[found]][:, [4, 5, 7]] * rate
+        return velocities
+
+    def update(self, detections, frame=None, timestamp=None):
+        """
+        Run one ByteTrack step.
+        Args:
+            detections: Array-like (N,6) of detections [x1,y1,x2,y2,conf,cls]
             frame: Current frame (unused)
+            timestamp: Capture time of the frame (epoch seconds), for the step rate
+                behind velocities(); defaults to now
+        Returns:
+            tuple: (tracks, track_ids) where tracks are the currently tracked tracks (dicts
+                with track_id, bbox, confidence, class_id, state, age) and track_ids is an
+                (N,) array giving the track id assigned to each input detection (-1 if none,
+                or if it only started an unconfirmed track)
+        """
+        self._record_step(timestamp)
+        detections = np.asarray(detections, dtype=np.float32).reshape(-1, 6)
+        track_ids = np.full(len(detections), -1, dtype=np.int64)
+
+        # Predict every track (tracked and lost) in one batched operation
+        self._mean, self._cov = self.kalman.predict(self._mean, self._cov)
+        predicted_boxes = xyah_to_xyxy(self._mean[:, :4])
+
+        scores = detections[:, 4]
+        high = np.flatnonzero(scores >= self.track_thresh)
+        low = np.flatnonzero((scores >= self.low_thresh) & (scores < self.track_thresh))
+        matched_tracks = []
+        matched_dets = []
+
+        # 1) High-score detections against the confirmed tracks (tracked and lost)
+        confirmed = np.flatnonzero(self._state != TrackState.New)
+        unconfirmed = np.flatnonzero(self._state == TrackState.New)
+        ious = iou_matrix(detections[high, :4], predicted_boxes[confirmed])
+        matches, unmatched_high, unmatched_tracks = linear_assignment(1.0 - ious, self.match_thresh)
+        matched_dets.append(high[matches[:, 0]])
+        matched_tracks.append(confirmed[matches[:, 1]])
+
+        # 2) Low-score detections against the remaining tracks that were still tracked
+        remaining = confirmed[unmatched_tracks]
+        remaining = remaining[self._state[remaining] == TrackState.Tracked]
+        ious = iou_matrix(detections[low, :4], predicted_boxes[remaining])
+        matches, _, _ = linear_assignment(1.0 - ious, self.second_match_thresh)
+        matched_dets.append(low[matches[:, 0]])
+        matched_tracks.append(remaining[matches[:, 1]])
+
+        # 3) High-score detections left against the unconfirmed tracks, which a match confirms
+        left = high[unmatched_high]
+        ious = iou_matrix(detections[left, :4], predicted_boxes[unconfirmed])
+        matches, unmatched_left, _ = linear_assignment(1.0 - ious, self.unconfirmed_match_thresh)
+        matched_dets.append(left[matches[:, 0]])
+        matched_tracks.append(unconfirmed[matches[:, 1]])
+        unmatched_high = left[unmatched_left]
+
+        matched_dets = np.concatenate(matched_dets)
+        matched_tracks = np.concatenate(matched_tracks)
+
+        # Correct matched tracks with their detections
+        if len(matched_tracks):
+            measurements = xyxy_to_xyah(detections[matched_dets, :4])
+            mean, cov = self.kalman.update(self._mean[matched_tracks], self._cov[matched_tracks], measurements)
+            self._mean[matched_tracks] = mean
+            self._cov[matched_tracks] = cov
+            self._state[matched_tracks] = TrackState.Tracked
+            self._score[matched_tracks] = scores[matched_dets]
+            self._cls[matched_tracks] = detections[matched_dets, 5].astype(np.int64)
+            self._last_frame[matched_tracks] = self.frame_id
+            track_ids[matched_dets] = self._ids[matched_tracks]
+
+        # Unmatched tracks become lost, and are removed once too old; unconfirmed ones are dropped
+        unmatched = np.ones(len(self._ids), dtype=bool)
+        unmatched[matched_tracks] = False
+        self._state[unmatched & (self._state == TrackState.Tracked)] = TrackState.Lost
+        expired = (self._state == TrackState.Lost) & (self.frame_id - self._last_frame > self.track_buffer)
+        dropped = unmatched & (self._state == TrackState.New)
+        if expired.any() or dropped.any():
+            for track_id in self._ids[expired].tolist():
+                self.track_history.pop(track_id, None)
+            self.removed_count += int(expired.sum())
+            self._keep(~(expired | dropped))
+
+        # Unmatched detections scoring det_thresh start new tracks, unconfirmed but on the first frame
+        new_dets = unmatched_high[scores[unmatched_high] >= self.det_thresh]
+        if len(new_dets):
+            mean, cov = self.kalman.initiate(xyxy_to_xyah(detections[new_dets, :4]))
+            new_ids = np.arange(self.next_id, self.next_id + len(new_dets), dtype=np.int64)
+            self.next_id += len(new_dets)
+            self._mean = np.concatenate([self._mean, mean])
+            self._cov = np.concatenate([self._cov, cov])
+            self._ids = np.concatenate([self._ids, new_ids])
+            state = TrackState.Tracked if self.frame_id == 1 else TrackState.New
+            self._state = np.concatenate([self._state, np.full(len(new_dets), state, dtype=np.int8)])
+            self._score = np.concatenate([self._score, scores[new_dets]])
+            self._cls = np.concatenate([self._cls, detections[new_dets, 5].astype(np.int64)])
+            self._last_frame = np.concatenate([self._last_frame, np.full(len(new_dets), self.frame_id)])
+            self._start_frame = np.concatenate([self._start_frame, np.full(len(new_dets), self.frame_id)])
+            if state == TrackState.Tracked:
+                track_ids[new_dets] = new_ids
+
+        # Record the centers of the tracks updated this frame
+        updated = track_ids >= 0
+        centers = (detections[updated, :2] + detections[updated, 2:4]) / 2
+        for track_id, (cx, cy) in zip(track_ids[updated].tolist(), centers.tolist()):
+            self.track_history[track_id].append((self.frame_id, cx, cy))
+
+        return self.tracks, track_ids
+
+    def predict(self, timestamp=None):
+        """
+        Advance all tracks by one frame with the motion model only, without detections.
+        Used on frames where inference is skipped: track states and lost-track ageing are
+        left to the next update(), which then sees a consistent number of elapsed frames.
         Returns:
-            tracks: Updated tracks (dicts with track_id, bbox, confidence, class_id)
+            list: Currently tracked tracks at their predicted positions
         """
-        if len(detections) == 0:
-            return []
-        detections = [det for det in detections if det[4] >= self.track_thresh]
-        current_tracks = []
-        for detection in detections:
-            bbox = detection[:4]
-            confidence = detection[4]
-            class_id = detection[5]
-            best_iou = 0
-            best_track_idx = -1
-            for i, track in enumerate(self.tracks):
-                track_bbox = track['bbox']
-                iou = self._calculate_iou(bbox, track_bbox)
-                if iou > best_iou and iou > self.match_thresh:
-                    best_iou = iou
-                    best_track_idx = i
-            if best_track_idx >= 0:
-                track_id = self.tracks[best_track_idx]['track_id']
-                self.tracks[best_track_idx].update({
-                    'bbox': bbox,
-                    'confidence': confidence,
-                    'class_id': class_id
-                })
-                self.disappeared[track_id] = 0
-                current_tracks.append(self.tracks[best_track_idx])
-            else:
-                new_track = {
-                    'track_id': self.next_id,
-                    'bbox': bbox,
-                    'confidence': confidence,
-                    'class_id': class_id
-                }
-                self.tracks.append(new_track)
-                self.disappeared[self.next_id] = 0
-                self.track_history[self.next_id] = []
-                current_tracks.append(new_track)
-                self.next_id += 1
-        for track in self.tracks:
-            track_id = track['track_id']
-            if track_id not in [t['track_id'] for t in current_tracks]:
-                self.disappeared[track_id] += 1
-                if self.disappeared[track_id] <= self.track_buffer:
-                    current_tracks.append(track)
-        self.tracks = current_tracks
+        self._record_step(timestamp)
+        self._mean, self._cov = self.kalman.predict(self._mean, self._cov)
         return self.tracks
 
+    def _keep(self, mask):
+        self._mean = self._mean[mask]
+        self._cov = self._cov[mask]
+        self._ids = self._ids[mask]
+        self._state = self._state[mask]
+        self._score = self._score[mask]
+        self._cls = self._cls[mask]
+        self._last_frame = self._last_frame[mask]
+        self._start_frame = self._start_frame[mask]
+
     def _calculate_iou(self, bbox1, bbox2):
         x1 = max(bbox1[0], bbox2[0])
         y1 = max(bbox1[1], bbox2[1])
@@ -76,9 +411,3 @@ class ByteTracker:
         area2 = (bbox2[2] - bbox2[0]) * (bbox2[3] - bbox2[1])
         union = area1 + area2 - intersection
         return intersection / union if union > 0 else 0
-
-    def reset(self):
-        self.track_history = defaultdict(list)
-        self.tracks = []
-        self.next_id = 1
-        self.disappeared = defaultdict(int)
@@ -0,0 +1,164 @@
+"""
+calibration.py - Camera models for distance and speed estimation.
+Each camera has intrinsics (focal lengths in pixels, at the resolution they were
+calibrated for) and per-class size priors (mean real height of the objects, in
+meters). Priors are turned once into a NumPy lookup table indexed by class id, so the
+distance of every box of a frame is one vectorized expression. Cameras are read from
+a JSON file (config/calibration.json), with a default camera for the others:
+
+    {
+        "default": {"fx": 800, "fy": 800, "image_size": [1280, 720]},
+        "sizes": {"person": 1.7, "military_vehicles": 3.0},
+        "default_size": 1.7,
+        "cameras": {
+            "cam1": {"camera_matrix": [[1050, 0, 960], [0, 1050, 540], [0, 0, 1]], "image_size": [1920, 1080]},
+            "rover": {"fy": 620, "sizes": {"person": 1.75}}
+        }
+    }
+
+"camera_matrix" is the 3x3 matrix of OpenCV's calibrateCamera. Cameras inherit the
+fields they leave out from "default", and their "sizes" override the shared ones. Cameras are looked up by stream id (multi-stream manager,
+frame channel HELLO).
+"""
+
+import json
+import logging
+import os
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Tailles réelles moyennes (en mètres) pour chaque classe
+DEFAULT_SIZES = {
+    'person': 1.7,
+    'soldier': 1.7,
+    'weapon': 1.0,
+    'military_vehicles': 3.0,
+    'civilian_vehicles': 4.5,
+    'military_aircraft': 15.0,
+    'civilian_aircraft': 20.0
+}
+DEFAULT_SIZE = 1.7  # Classes sans taille connue
+DEFAULT_FOCAL_LENGTH_PX = 800  # focale en pixels (exemple, à calibrer)
+
+
+class CameraModel:
+    """
+    Pinhole model of one camera: an object of real height H seen h pixels high is at
+    Z = H * fy / h meters, where one pixel spans H / h meters.
+    Args:
+        fx, fy (float): Focal lengths in pixels (fy defaults to fx)
+        image_size (tuple): (width, height) the focal lengths were calibrated at; frames of
+            another height get the focal scaled accordingly. None = any resolution
+        sizes (dict): Class name -> real height (m)
+        default_size (float): Real height of the other classes
+    """
+
+    def __init__(self, name='default', fx=DEFAULT_FOCAL_LENGTH_PX, fy=None, cx=None, cy=None, image_size=None,
+                 sizes=None, default_size=DEFAULT_SIZE):
+        self.name = name
+        self.fx = float(fx)
+        self.fy = float(fy if fy is not None else fx)
+        self.cx = cx
+        self.cy = cy
+        self.image_size = tuple(image_size) if image_size else None
+        self.sizes = dict(DEFAULT_SIZES if sizes is None else sizes)
+        self.default_size = default_size
+        self._lut = (None, np.zeros(0, dtype=np.float32))  # (class names, sizes), replaced as a whole
+
+    @staticmethod
+    def expand(spec):
+        """Camera spec of the file with its camera_matrix, if any, as fx, fy, cx, cy."""
+        spec = dict(spec)
+        matrix = spec.pop('camera_matrix', None)
+        if matrix is not None:
+            spec.update(fx=matrix[0][0], fy=matrix[1][1], cx=matrix[0][2], cy=matrix[1][2])
+        return spec
+
+    @classmethod
+    def from_dict(cls, name, spec, sizes=None, default_size=DEFAULT_SIZE):
+        spec = cls.expand(spec)
+        merged = dict(DEFAULT_SIZES if sizes is None else sizes)
+        merged.update(spec.pop('sizes', {}))
+        return cls(name, sizes=merged, default_size=spec.pop('default_size', default_size), **spec)
+
+    def size_lut(self, names):
+        """Real height (m) indexed by class id, rebuilt only when the model's class names change."""
+        bound_names, lut = self._lut
+        if names is not bound_names and names != bound_names:
+            count = max(names, default=-1) + 1
+            lut = np.array([self.sizes.get(names.get(i), self.default_size) for i in range(count)], dtype=np.float32)
+            self._lut = (names, lut)
+        return lut
+
+    def real_sizes(self, cls, names):
+        """Real height (m) of the class of each box."""
+        lut = self.size_lut(names)
+        if len(cls) and cls.max() >= len(lut):  # Class id unknown to the names
+            lut = np.concatenate([lut, np.full(int(cls.max()) + 1 - len(lut), self.default_size, np.float32)])
+        return lut[cls]
+
+    def focal_y(self, frame_height=None):
+        """fy for frames `frame_height` pixels high (source resolution)."""
+        if frame_height and self.image_size:
+            return self.fy * frame_height / self.image_size[1]
+        return self.fy
+
+    def distances(self, cls, heights, names, frame_height=None):
+        """Camera-object distance (m) of each box, from its height in pixels."""
+        return self.real_sizes(cls, names) * self.focal_y(frame_height) / (heights + 1e-6)
+
+    def meters_per_pixel(self, cls, heights, names):
+        """Size of one pixel (m) at the distance of each box."""
+        return self.real_sizes(cls, names) / (heights + 1e-6)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'fx': self.fx,
+            'fy': self.fy,
+            'cx': self.cx,
+            'cy': self.cy,
+            'imageSize': list(self.image_size) if self.image_size else None,
+            'sizes': self.sizes,
+            'defaultSize': self.default_size
+        }
+
+
+class Calibration:
+    """Camera models by stream id, loaded once; streams without their own use the default camera."""
+
+    def __init__(self, default=None, cameras=None):
+        self.default = default or CameraModel()
+        self.cameras = dict(cameras or {})
+
+    @classmethod
+    def load(cls, path):
+        """Calibration of a JSON file (see the module docstring); defaults if the file does not exist."""
+        if not path or not os.path.exists(path):
+            return cls()
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        sizes = dict(DEFAULT_SIZES)
+        sizes.update(data.get('sizes', {}))
+        default_size = data.get('default_size', DEFAULT_SIZE)
+        base = CameraModel.expand(data.get('default', {}))
+        default = CameraModel.from_dict('default', base, sizes, default_size)
+        # Cameras inherit what they leave out from the default camera
+        cameras = {}
+        for name, spec in data.get('cameras', {}).items():
+            spec = CameraModel.expand(spec)
+            spec['sizes'] = {**base.get('sizes', {}), **spec.get('sizes', {})}
+            cameras[name] = CameraModel.from_dict(name, {**base, **spec}, sizes, default_size)
+        logger.info(f"Calibration loaded from {path}: {len(cameras)} cameras")
+        return cls(default, cameras)
+
+    def camera(self, stream_id=None):
+        return self.cameras.get(stream_id, self.default) if stream_id is not None else self.default
+
+    def to_dict(self):
+        return {
+            'default': self.default.to_dict(),
+            'cameras': {name: camera.to_dict() for name, camera in self.cameras.items()}
+        }
@@ -6,6 +6,8 @@ All dynamic parameters are defined here for easy management.
 import os
 from datetime import timedelta
 
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
 class Config:
     """Base configuration for the server."""
     # Server configuration
@@ -13,29 +15,84 @@ class Config:
     PORT = 5000
     DEBUG = True
 
-    # Database configuration
-    DATABASE_PATH = 'instance/detection_history.db'
+    # Database configuration (absolute path, shared by app.py and maintenance.py)
+    DATABASE_PATH = os.path.join(BASE_DIR, 'instance', 'detection_history.db')
     SQLALCHEMY_DATABASE_URI = f'sqlite:///{DATABASE_PATH}'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Applied to every SQLite connection (see services/sqlite_profile.py)
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',  # Readers no longer block the detection writer
+        'synchronous': 'NORMAL',  # Safe with WAL, fsync only at checkpoints
+        'cache_size': -64000,  # 64 MB page cache (negative = KiB)
+        'mmap_size': 256 * 1024 * 1024,
+        'busy_timeout': 5000,  # ms to wait for a lock instead of failing
+        'temp_store': 'MEMORY',
+        'auto_vacuum': 'INCREMENTAL'  # Takes effect on new databases, or after one VACUUM
+    }
+    # Detections and trajectory points are stored in one table per hour ('hour') or day ('day');
+    # their retention (DETECTION_CLEANUP_HOURS, TRAJECTORY_POINT_CLEANUP_DAYS) drops whole partitions
+    PARTITION_GRANULARITY = 'hour'
 
     # YOLO configuration
     YOLO_MODEL_PATH = 'models/best.onnx'
     YOLO_CONFIDENCE_THRESHOLD = 0.5
     YOLO_VIDEOS_DIR = 'videos'
+    CALIBRATION_PATH = os.path.join(BASE_DIR, 'config', 'calibration.json')  # Camera intrinsics, class sizes
+    # Inference backend: 'ultralytics' (default) or 'onnxruntime' (direct session, .onnx models only)
+    YOLO_BACKEND = os.getenv('YOLO_BACKEND', 'ultralytics')
+    ONNX_INTRA_OP_THREADS = 0  # 0 = onnxruntime default
+    ONNX_INTER_OP_THREADS = 1
+    ONNX_NMS_IOU_THRESHOLD = 0.45
 
     # Detection configuration
-    DETECTION_CLEANUP_HOURS = 24  # Clean up detections after X hours
+    DETECTION_CLEANUP_HOURS = 24  # Clean up detections after X hours (partition retention)
     DETECTION_LOW_CONFIDENCE_THRESHOLD = 0.3  # Threshold for cleaning up low-confidence detections
     DETECTION_EXPORT_LIMIT = 1000  # Limit for detection export
 
     # Trajectory configuration
     TRAJECTORY_INACTIVE_HOURS = 1  # Mark as inactive after X hours
-    TRAJECTORY_POINT_CLEANUP_DAYS = 3  # Clean up trajectory points after X days
+    TRAJECTORY_POINT_CLEANUP_DAYS = 3  # Clean up trajectory points after X days (partition retention)
+    TRAJECTORY_PAGE_SIZE = 200  # Trajectories per /api/trajectories page
+    TRAJECTORY_SIMPLIFY_TOLERANCE = 1.0  # Douglas-Peucker tolerance of the returned points (pixels, 0 = off)
+    TRAJECTORY_MAX_POINTS = 500  # Max points returned per trajectory (0 = all)
 
     # Streaming configuration
     STREAM_FPS = 30
     STREAM_FRAME_DELAY = 0.033  # ~30 FPS
 
+    # Multi-stream configuration (shared batched inference)
+    MULTI_STREAM_MAX_BATCH = 4  # Max frames per model call
+    MULTI_STREAM_BATCH_TIMEOUT_MS = 15  # Max wait to fill a batch after the first frame
+
+    # Frame upload (/api/yolo/detect_frame)
+    DETECT_FRAME_MAX_BATCH = 16  # Max frames per request (application/x-frame-batch)
+
+    # Zone polygons (OSM military areas) for alerts: on-disk cache keyed by map tile
+    ZONE_CACHE_PATH = os.path.join(BASE_DIR, 'instance', 'zone_cache.db')
+    ZONE_TILE_ZOOM = 12  # Slippy map zoom of the cache tiles (~10 km at the equator, ~6.5 km at 48°)
+    ZONE_CACHE_MAX_TILES = 256  # Tiles kept in memory (LRU)
+    ZONE_RADIUS_M = 3000  # Zones loaded around the rover
+    ZONE_CACHE_MAX_AGE_DAYS = 30  # Cached tiles refreshed from OSM after X days (when online, 0 = never)
+    ZONE_FETCH_RETRY_SECONDS = 300  # Wait before fetching again a tile that failed (offline)
+    ZONE_PRELOAD_POSITION = None  # (lat, lon) of the rover at startup: zones loaded before the first /api/alerts
+
+    # Alert rules, evaluated once per written detection (services/alert_engine.py).
+    # The first rule matching a detection raises its alert; see AlertRule for the keys.
+    ALERT_RULES = [
+        {'name': 'weapon_civilian_zone', 'classes': r'weapon|gun|rifle', 'zone': 'military', 'in_zone': False,
+         'type': 'danger', 'color': 'red', 'zone_label': 'civile',
+         'message': "Arme détectée en zone non-militaire (objet {object_id})"},
+        {'name': 'weapon_military_zone', 'classes': r'weapon|gun|rifle', 'zone': 'military', 'in_zone': True,
+         'type': 'secure', 'color': 'green', 'zone_label': 'militaire',
+         'message': "Arme détectée en zone militaire (objet {object_id})"},
+        {'name': 'person_speed', 'classes': r'person', 'min_speed': 5,
+         'type': 'anomaly', 'color': 'orange', 'zone_label': 'inconnue',
+         'message': "Personne (objet {object_id}) avec vitesse anormale : {speed:.1f} m/s"},
+    ]
+    ALERT_COOLDOWN_SECONDS = 30  # Min interval between two alerts of one rule for one object
+    ALERT_HISTORY = 1000  # Alerts kept in memory for /api/alerts
+    ALERT_WINDOW_SECONDS = 60  # Alerts returned by /api/alerts without cursor
+
     # Time windows for statistics
     TIME_WINDOWS = {
         'last_second': timedelta(seconds=1),
@@ -50,6 +107,7 @@ class Config:
     MAINTENANCE_OPTIMIZATION_INTERVAL_HOURS = 2
     MAINTENANCE_HEALTH_CHECK_INTERVAL_MINUTES = 15
     MAINTENANCE_BACKUP_TIME = "02:00"  # Daily backup time
+    MAINTENANCE_INCREMENTAL_VACUUM_PAGES = 10000  # Free pages reclaimed per optimization (0 = all)
 
     # Logging configuration
     LOG_LEVEL = 'INFO'
@@ -66,6 +124,12 @@ class Config:
     DETECTION_CACHE_TTL_SECONDS = 60
     STATISTICS_CACHE_TTL_SECONDS = 30
 
+    # Live events (/api/events, Server-Sent Events)
+    EVENTS_HISTORY = 10000  # Events kept for the clients reconnecting with their last event id
+    EVENTS_MAX_LAG = 2000  # Events a client may lag behind before being reset
+    EVENTS_COALESCE_MS = 100  # Min interval between two messages to a client
+    EVENTS_METRICS_INTERVAL_SECONDS = 1.0
+
     @classmethod
     def get_detection_filters(cls):
         """Return default detection filters."""
@@ -113,7 +177,7 @@ class ProductionConfig(Config):
 class TestingConfig(Config):
     """Configuration for testing environment."""
     DEBUG = True
-    DATABASE_PATH = 'instance/test_detection_history.db'
+    DATABASE_PATH = os.path.join(BASE_DIR, 'instance', 'test_detection_history.db')
     SQLALCHEMY_DATABASE_URI = f'sqlite:///{DATABASE_PATH}'
     LOG_LEVEL = 'DEBUG'
 
@@ -127,4 +191,6 @@ def get_config():
     elif env == 'testing':
         return TestingConfig
     else:
-        return DevelopmentConfig 
\ No newline at end of file
+        return DevelopmentConfig 
+# The config/ directory (stream_config.py) is shadowed by this module: expose it as a sub-package
+__path__ = [os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config')]
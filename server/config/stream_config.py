@@ -3,6 +3,7 @@ STREAM_CONFIG = {
     'tcp_timeout': 30,  # Augmenté à 30 secondes
     'frame_buffer_size': 4,  # Augmenté pour plus de stabilité
     'target_fps': 15,  # Reduced from 30 for better performance
+    'latency_budget_ms': 250,  # Capture-to-display latency above which inference is run less often
     'quality_preset': 'ultrafast',  # FFmpeg preset for faster encoding
     'max_queue_size': 4,
     'jpeg_quality': 60,  # Reduced from 80 for faster transmission
@@ -15,3 +16,14 @@ TCP_CONFIG = {
     'port': 8080,
     'reconnect_delay': 1.0
 }
+
+# Persistent frame channel (services/frame_channel.py): edge cameras push encoded frames
+# and get their detections back on the same TCP connection
+FRAME_CHANNEL_CONFIG = {
+    'enabled': True,
+    'host': '0.0.0.0',
+    'port': 9090,
+    'decode_workers': 2,
+    'max_pending': 4,  # Frames waiting for detection per connection, the next ones are skipped
+    'decode_scale': 1  # 2, 4 or 8: reduced-resolution JPEG decode
+}
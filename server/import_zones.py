@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+import_zones.py - Import zone polygons from a local file into the zone cache.
+Fills the on-disk tile cache used by /api/alerts (Config.ZONE_CACHE_PATH) from a GeoJSON
+file or an OpenStreetMap extract (.osm, .osm.pbf, needs pyosmium), so the rover can run
+without network. Only the polygons whose tags/properties match --tag are kept.
+
+Usage: python import_zones.py FILE [--layer military] [--tag landuse=military] [--bounds W,S,E,N]
+"""
+
+import argparse
+import logging
+
+from config import Config
+from services.zone_cache import ZoneCache, osm_file_bounds, read_geojson, read_osm
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('file', help="GeoJSON (.geojson, .json) or OSM (.osm, .pbf) file")
+    parser.add_argument('--layer', default='military')
+    parser.add_argument('--tag', action='append', default=None,
+                        help="key=value filter, repeatable (default: landuse=military)")
+    parser.add_argument('--bounds', help="west,south,east,north extent of the file: its tiles without "
+                                         "zones are also served offline (default: header of .osm/.pbf files)")
+    parser.add_argument('--db', default=Config.ZONE_CACHE_PATH)
+    args = parser.parse_args()
+
+    tags = dict(tag.split('=', 1) for tag in args.tag) if args.tag else {'landuse': 'military'}
+    bounds = tuple(float(value) for value in args.bounds.split(',')) if args.bounds else None
+    if args.file.endswith(('.osm', '.pbf')):
+        zones = read_osm(args.file, tags)
+        bounds = bounds or osm_file_bounds(args.file)
+    else:
+        zones = list(read_geojson(args.file, tags))
+
+    cache = ZoneCache(args.db, zoom=Config.ZONE_TILE_ZOOM)
+    tiles = cache.import_zones(zones, layer=args.layer, bounds=bounds)
+    cache.close()
+    logging.info(f"✅ {len(zones)} zones imported into {tiles} tiles of {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,8 @@ import logging
 from datetime import datetime, timedelta
 import sqlite3
 import os
+from config import Config
+from services.sqlite_profile import apply_sqlite_pragmas
 
 # --- Logging Configuration ---
 logging.basicConfig(
@@ -24,7 +26,7 @@ logging.basicConfig(
 
 # --- Main Configuration ---
 SERVER_URL = "http://localhost:5000"
-DB_PATH = "instance/detection_history.db"
+DB_PATH = Config.DATABASE_PATH  # Same file as the server
 
 # --- Cleanup Old Data via API ---
 def cleanup_old_data():
@@ -41,15 +43,28 @@ def cleanup_old_data():
 
 # --- Optimize SQLite Database ---
 def optimize_database():
-    """Optimize the SQLite database (VACUUM, ANALYZE, integrity check)."""
+    """Optimize the SQLite database (incremental vacuum, statistics, integrity check)."""
     try:
         if os.path.exists(DB_PATH):
             conn = sqlite3.connect(DB_PATH)
+            apply_sqlite_pragmas(conn, Config.SQLITE_PRAGMAS)
             cursor = conn.cursor()
-            # VACUUM to reorganize the database
-            cursor.execute("VACUUM")
-            # ANALYZE to update statistics
-            cursor.execute("ANALYZE")
+            cursor.execute("PRAGMA auto_vacuum")
+            if cursor.fetchone()[0] != 2:  # 2 = INCREMENTAL
+                # Databases created before the storage profile: one full VACUUM enables incremental mode
+                logging.info("🔧 Converting database to incremental auto-vacuum (one-time VACUUM)")
+                cursor.execute("VACUUM")
+            else:
+                # Release free pages without rewriting the whole file or blocking the server
+                cursor.execute("PRAGMA freelist_count")
+                free_pages = cursor.fetchone()[0]
+                cursor.execute(f"PRAGMA incremental_vacuum({Config.MAINTENANCE_INCREMENTAL_VACUUM_PAGES})")
+                cursor.fetchall()
+                logging.info(f"🧹 Incremental vacuum: {free_pages} free pages before")
+            # Update planner statistics where they are stale
+            cursor.execute("PRAGMA optimize")
+            # Keep the WAL file small
+            cursor.execute("PRAGMA wal_checkpoint(TRUNCATE)")
             # Check integrity
             cursor.execute("PRAGMA integrity_check")
             integrity = cursor.fetchone()
@@ -93,9 +108,13 @@ def backup_database():
             backup_path = f"backups/detection_history_{timestamp}.db"
             # Create backup directory if it doesn't exist
             os.makedirs("backups", exist_ok=True)
-            # Copy the database
-            import shutil
-            shutil.copy2(DB_PATH, backup_path)
+            # Online backup: consistent even while the server writes (WAL content included)
+            source = sqlite3.connect(DB_PATH)
+            destination = sqlite3.connect(backup_path)
+            with destination:
+                source.backup(destination)
+            destination.close()
+            source.close()
             logging.info(f"✅ Backup created: {backup_path}")
             # Clean up old backups (keep only last 7 days)
             cleanup_old_backups()
@@ -0,0 +1,195 @@
+"""
+onnx_backend.py - Direct ONNX Runtime inference for YOLO detection models.
+Bypasses ultralytics' generic source handling and result objects: frames are
+letterboxed in place into a preallocated input tensor, the session runs with
+IO binding, and boxes are decoded with a NumPy NMS.
+"""
+
+import ast
+import threading
+from collections import namedtuple
+
+import cv2
+import numpy as np
+
+try:
+    import onnxruntime as ort
+except ImportError:  # onnxruntime is optional, the ultralytics backend is used instead
+    ort = None
+
+# Detections of one frame, already on the host: xyxy (N,4), conf (N,), cls (N,), names {id: label}
+DetectionArrays = namedtuple('DetectionArrays', ['xyxy', 'conf', 'cls', 'names'])
+
+
+def nms(boxes, scores, iou_threshold):
+    """
+    Greedy non-maximum suppression.
+    Args:
+        boxes: Array (N,4) of [x1,y1,x2,y2]
+        scores: Array (N,)
+        iou_threshold (float): Boxes overlapping a kept box above this IoU are suppressed
+    Returns:
+        np.ndarray: Indices of kept boxes, by decreasing score
+    """
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1) * (y2 - y1)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        w = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        h = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = w * h
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+class OnnxRuntimeBackend:
+    """
+    YOLOv8-style ONNX model driven directly by onnxruntime.
+    Args:
+        model_path (str): Path to the .onnx model
+        use_gpu (bool): Use the CUDA execution provider when available
+        intra_op_threads (int): Threads used inside an operator (0 = onnxruntime default)
+        inter_op_threads (int): Threads used across operators (0 = onnxruntime default)
+        iou_threshold (float): NMS IoU threshold
+        max_det (int): Maximum number of detections kept per frame
+    """
+
+    def __init__(self, model_path, use_gpu=False, intra_op_threads=0, inter_op_threads=0,
+                 iou_threshold=0.45, max_det=300):
+        if ort is None:
+            raise ImportError("onnxruntime is not installed")
+        self.model_path = model_path
+        self.iou_threshold = iou_threshold
+        self.max_det = max_det
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_op_threads
+        options.inter_op_num_threads = inter_op_threads
+        if inter_op_threads > 1:
+            options.execution_mode = ort.ExecutionMode.ORT_PARALLEL
+        providers = ['CPUExecutionProvider']
+        if use_gpu and 'CUDAExecutionProvider' in ort.get_available_providers():
+            providers.insert(0, 'CUDAExecutionProvider')
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=providers)
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.output_name = self.session.get_outputs()[0].name
+        _, _, height, width = model_input.shape
+        # Dynamic spatial dims are exported as strings: fall back to the usual 640x640
+        self.input_height = height if isinstance(height, int) else 640
+        self.input_width = width if isinstance(width, int) else 640
+        self.dynamic_batch = not isinstance(model_input.shape[0], int)
+        self.input_dtype = np.float16 if 'float16' in model_input.type else np.float32
+        self.names = self._read_names()
+
+        # Preallocated buffers, reused for every frame. The detector is shared by request threads,
+        # the stream pipelines and the frame channel: filling them and running the session is
+        # serialized by _lock (outputs are copied out, so decoding runs outside of it)
+        self._lock = threading.Lock()
+        self._inputs = {}
+        self._canvas = np.full((self.input_height, self.input_width, 3), 114, dtype=np.uint8)
+        self._resized = {}
+        self._canvas_geometry = None
+        self._binding = self.session.io_binding()
+
+    def _read_names(self):
+        """Class names stored by ultralytics in the model metadata."""
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        try:
+            names = ast.literal_eval(metadata.get('names', '{}'))
+        except (ValueError, SyntaxError):
+            names = {}
+        return {int(k): v for k, v in names.items()}
+
+    def _input_buffer(self, batch_size):
+        buffer = self._inputs.get(batch_size)
+        if buffer is None:
+            buffer = np.zeros((batch_size, 3, self.input_height, self.input_width), dtype=self.input_dtype)
+            self._inputs[batch_size] = buffer
+        return buffer
+
+    def _letterbox_into(self, frame, target):
+        """
+        Resizes `frame` with preserved aspect ratio, pads it to the model size and writes it
+        as normalized RGB CHW into `target` (a view of the input tensor).
+        Returns:
+            tuple: (scale, pad_x, pad_y) to map boxes back to frame coordinates
+        """
+        h, w = frame.shape[:2]
+        scale = min(self.input_height / h, self.input_width / w)
+        new_w, new_h = int(round(w * scale)), int(round(h * scale))
+        pad_x = (self.input_width - new_w) // 2
+        pad_y = (self.input_height - new_h) // 2
+
+        resized = self._resized.get((new_h, new_w))
+        if resized is None:
+            resized = np.empty((new_h, new_w, 3), dtype=np.uint8)
+            self._resized[(new_h, new_w)] = resized
+        if self._canvas_geometry != (new_h, new_w):
+            # Padding is only reset when the frame geometry changes
+            self._canvas[:] = 114
+            self._canvas_geometry = (new_h, new_w)
+        cv2.resize(frame, (new_w, new_h), dst=resized, interpolation=cv2.INTER_LINEAR)
+        self._canvas[pad_y:pad_y + new_h, pad_x:pad_x + new_w] = resized
+        # BGR HWC uint8 -> RGB CHW [0,1], written straight into the input tensor
+        np.multiply(self._canvas[:, :, ::-1].transpose(2, 0, 1), 1.0 / 255.0, out=target)
+        return scale, pad_x, pad_y
+
+    def _run(self, input_tensor):
+        self._binding.bind_cpu_input(self.input_name, input_tensor)
+        self._binding.bind_output(self.output_name)
+        self.session.run_with_iobinding(self._binding)
+        return self._binding.copy_outputs_to_cpu()[0]
+
+    def _decode(self, output, conf_threshold, scale, pad_x, pad_y, frame_shape):
+        """Raw (4+nc, anchors) output -> DetectionArrays in frame coordinates."""
+        predictions = output.T.astype(np.float32, copy=False)  # (anchors, 4+nc)
+        class_scores = predictions[:, 4:]
+        cls = class_scores.argmax(axis=1)
+        conf = class_scores[np.arange(len(cls)), cls]
+        mask = conf >= conf_threshold
+        predictions, conf, cls = predictions[mask], conf[mask], cls[mask]
+        if len(conf) == 0:
+            return DetectionArrays(np.empty((0, 4), np.float32), np.empty(0, np.float32),
+                                   np.empty(0, np.int64), self.names)
+
+        cx, cy, w, h = predictions[:, 0], predictions[:, 1], predictions[:, 2], predictions[:, 3]
+        xyxy = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+        # Per-class NMS in a single pass by offsetting boxes of different classes
+        offsets = cls[:, None].astype(np.float32) * 4096.0
+        keep = nms(xyxy + offsets, conf, self.iou_threshold)[:self.max_det]
+        xyxy, conf, cls = xyxy[keep], conf[keep], cls[keep]
+
+        xyxy[:, [0, 2]] = (xyxy[:, [0, 2]] - pad_x) / scale
+        xyxy[:, [1, 3]] = (xyxy[:, [1, 3]] - pad_y) / scale
+        xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, frame_shape[1])
+        xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, frame_shape[0])
+        return DetectionArrays(xyxy, conf, cls.astype(np.int64), self.names)
+
+    def predict(self, frame, conf=0.25):
+        """Detects objects on one BGR frame. Returns a DetectionArrays."""
+        with self._lock:
+            input_tensor = self._input_buffer(1)
+            letterbox = self._letterbox_into(frame, input_tensor[0])
+            output = self._run(input_tensor)
+        return self._decode(output[0], conf, *letterbox, frame.shape)
+
+    def predict_batch(self, frames, conf=0.25):
+        """Detects objects on several frames, in one session run if the model has a dynamic batch."""
+        if not self.dynamic_batch:
+            return [self.predict(frame, conf) for frame in frames]
+        with self._lock:
+            input_tensor = self._input_buffer(len(frames))
+            letterboxes = [self._letterbox_into(frame, input_tensor[i]) for i, frame in enumerate(frames)]
+            output = self._run(input_tensor)
+        return [
+            self._decode(output[i], conf, *letterbox, frame.shape)
+            for i, (frame, letterbox) in enumerate(zip(frames, letterboxes))
+        ]
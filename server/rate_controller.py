@@ -0,0 +1,94 @@
+"""
+rate_controller.py - Adaptive inference rate for live streams.
+Decides for every captured frame whether to run the model on it, only
+propagate the existing tracks with the tracker's motion model, or drop it,
+so that output stays at the target frame rate and end-to-end latency stays
+under a budget even when inference is slower than the camera.
+"""
+
+import math
+import time
+
+INFER = 'infer'
+TRACK = 'track'
+DROP = 'drop'
+
+
+class AdaptiveRateController:
+    """
+    Args:
+        target_fps (float): Output frame rate; frames arriving faster are dropped
+        latency_budget_ms (float): Maximum accepted capture-to-encode latency
+        max_infer_interval (int): Upper bound on the number of output frames per inference
+    """
+
+    def __init__(self, target_fps=15, latency_budget_ms=250, max_infer_interval=10):
+        self.target_fps = target_fps
+        self.latency_budget_ms = latency_budget_ms
+        self.max_infer_interval = max_infer_interval
+        self.reset()
+
+    def reset(self):
+        self.infer_interval = 1  # Run the model on one output frame out of `infer_interval`
+        self.inference_ms = 0.0
+        self.latency_ms = 0.0
+        self._latency_penalty = 0
+        self._last_output_at = 0.0
+        self._frames_since_infer = math.inf
+        self._infer_times = []
+        self.counts = {INFER: 0, TRACK: 0, DROP: 0}
+
+    @property
+    def frame_interval(self):
+        return 1.0 / self.target_fps if self.target_fps and self.target_fps > 0 else 0.0
+
+    def decide(self, now=None):
+        """Returns INFER, TRACK or DROP for the frame just captured."""
+        now = time.perf_counter() if now is None else now
+        if now - self._last_output_at < self.frame_interval * 0.95:
+            decision = DROP
+        else:
+            self._last_output_at = now
+            if self._frames_since_infer >= self.infer_interval:
+                decision = INFER
+                self._frames_since_infer = 1
+                self._infer_times = (self._infer_times + [now])[-20:]
+            else:
+                decision = TRACK
+                self._frames_since_infer += 1
+        self.counts[decision] += 1
+        return decision
+
+    def record_inference(self, inference_ms):
+        """Feed the measured model time; the interval is sized so inference keeps up with the output rate."""
+        self.inference_ms = inference_ms if self.inference_ms == 0 else 0.8 * self.inference_ms + 0.2 * inference_ms
+        self._update_interval()
+
+    def record_latency(self, latency_ms):
+        """Feed the capture-to-encode latency of an output frame (additive increase while over budget)."""
+        self.latency_ms = latency_ms if self.latency_ms == 0 else 0.8 * self.latency_ms + 0.2 * latency_ms
+        if self.latency_ms > self.latency_budget_ms:
+            self._latency_penalty = min(self._latency_penalty + 1, self.max_infer_interval)
+        elif self.latency_ms < 0.5 * self.latency_budget_ms and self._latency_penalty > 0:
+            self._latency_penalty -= 1
+        self._update_interval()
+
+    def _update_interval(self):
+        frame_ms = self.frame_interval * 1000
+        needed = math.ceil(self.inference_ms / frame_ms) if frame_ms > 0 else 1
+        self.infer_interval = max(1, min(self.max_infer_interval, needed + self._latency_penalty))
+
+    def get_metrics(self):
+        infer_rate = 0.0
+        if len(self._infer_times) > 1:
+            span = self._infer_times[-1] - self._infer_times[0]
+            infer_rate = (len(self._infer_times) - 1) / span if span > 0 else 0.0
+        return {
+            'targetFps': self.target_fps,
+            'latencyBudgetMs': self.latency_budget_ms,
+            'inferInterval': self.infer_interval,
+            'inferRate': infer_rate,
+            'inferredFrames': self.counts[INFER],
+            'trackedOnlyFrames': self.counts[TRACK],
+            'droppedFrames': self.counts[DROP]
+        }
@@ -1,26 +1,28 @@
-from flask import Blueprint, jsonify, current_app
-from werkzeug.exceptions import RequestTimeout
-import time
+from flask import Blueprint, jsonify, current_app, request, Response
 import logging
+from config import Config
 
 stream_bp = Blueprint('stream', __name__)
 logger = logging.getLogger(__name__)
 
-@stream_bp.route('/api/yolo/stream/status', methods=['GET'])
-def get_stream_status():
-    return jsonify({
-        'active': current_app.stream_monitor.is_stream_active,
-        'last_heartbeat': current_app.stream_monitor.last_heartbeat.isoformat() if current_app.stream_monitor.last_heartbeat else None
-    })
+@stream_bp.route('/api/events', methods=['GET'])
+def event_stream():
+    """
+    Server-Sent Events feed of the dashboard: 'detections' batches, 'tracks' updates,
+    'metrics' and 'reset' (reload the state through the REST API) events.
+    EventSource reconnects with the Last-Event-ID header and resumes where it left off;
+    `last_event_id` does the same for a new EventSource.
+    """
+    event_bus = current_app.event_bus
+    event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    response = Response(
+        event_bus.stream(event_id, coalesce_interval=Config.EVENTS_COALESCE_MS / 1000),
+        mimetype='text/event-stream'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # No proxy buffering
+    return response
 
-@stream_bp.route('/api/yolo/stream/heartbeat', methods=['POST'])
-def update_stream_heartbeat():
-    try:
-        current_app.stream_monitor.update_heartbeat()
-        return jsonify({'status': 'success'})
-    except RequestTimeout:
-        current_app.stream_monitor.handle_disconnect()
-        return jsonify({'status': 'timeout'}), 408
-    except Exception as e:
-        logger.error(f"Error updating stream heartbeat: {str(e)}")
-        return jsonify({'status': 'error', 'message': str(e)}), 500
+@stream_bp.route('/api/events/stats', methods=['GET'])
+def event_stream_stats():
+    return jsonify(current_app.event_bus.get_stats())
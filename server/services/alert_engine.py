@@ -0,0 +1,222 @@
+import logging
+import re
+import threading
+import time
+from collections import deque
+from datetime import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class AlertRule:
+    """
+    One declarative alert rule (a dict of Config.ALERT_RULES), compiled once.
+    Keys:
+        name: Rule id, also the cooldown key with the object id
+        classes: Regular expression searched in the label (case-insensitive)
+        zone: Zone layer ('military') the detection must be inside (in_zone True, default)
+            or outside of (in_zone False)
+        min_speed: Speed the detection must exceed (m/s)
+        type, color, zone_label: Copied into the alert
+        message: Template formatted with the detection fields (object_id, label, speed, ...)
+    """
+
+    KEYS = {'name', 'classes', 'zone', 'in_zone', 'min_speed', 'type', 'color', 'zone_label', 'message'}
+
+    def __init__(self, spec):
+        unknown = set(spec) - self.KEYS
+        if unknown:
+            raise ValueError(f"Alert rule {spec.get('name')}: unknown keys {sorted(unknown)}")
+        self.name = spec['name']
+        self.classes = re.compile(spec['classes'], re.IGNORECASE) if spec.get('classes') else None
+        self.zone = spec.get('zone')
+        self.in_zone = spec.get('in_zone', True)
+        self.min_speed = spec.get('min_speed')
+        self.type = spec.get('type', 'info')
+        self.color = spec.get('color', 'blue')
+        self.zone_label = spec.get('zone_label', 'inconnue')
+        self.message = spec.get('message', self.name)
+
+    def format_message(self, detection):
+        try:
+            return self.message.format(**detection)
+        except (KeyError, IndexError, ValueError, TypeError):
+            logger.warning(f"Alert rule {self.name}: message template does not fit {detection}")
+            return self.message
+
+    def matches_label(self, label):
+        return self.classes is None or self.classes.search(label) is not None
+
+    def matches(self, detection, inside):
+        """Conditions besides the class; `inside` is the zone membership of the detection (rule.zone)."""
+        if self.min_speed is not None and (detection.get('speed') is None or detection['speed'] <= self.min_speed):
+            return False
+        if self.zone is not None and inside != self.in_zone:
+            return False
+        return True
+
+
+class AlertEngine:
+    """
+    Alerts raised once, as detections are written, instead of by rescanning recent
+    detections on every /api/alerts request. Each detection raises the alert of the
+    first rule it matches, unless the same rule fired for the same object less than
+    `cooldown_seconds` earlier. Rules are compiled once and the rules that can match a
+    label are cached per label, so a detection only checks those; zone membership is
+    tested in one vectorized call per batch and zone layer. Alerts are numbered and kept
+    in a ring buffer of `history` alerts, read incrementally with `read(after)`.
+    Args:
+        zones: Called with a zone layer, returns its current ZoneIndex, or None while the
+            layer is not loaded yet. A detection whose first matching rule cannot be known
+            until then is kept pending (the last `history` ones), and evaluated by the first
+            evaluate() call once the layer is loaded, rather than as if it were outside
+            every zone. Rules placed before the zone rules still fire right away
+        on_alert: Called with every new alert (live push)
+    """
+
+    def __init__(self, rules, zones, history=1000, cooldown_seconds=30, on_alert=None):
+        self.rules = [AlertRule(spec) for spec in rules]
+        self.zones = zones
+        self.cooldown_seconds = cooldown_seconds
+        self.on_alert = on_alert
+        self._rules_by_label = {}
+        self._last_fired = {}  # (rule name, object id) -> epoch of its last alert
+        self._alerts = deque(maxlen=history)  # (epoch, alert), ids consecutive
+        self._pending = deque(maxlen=history)  # (detection, rules) waiting for a zone layer
+        self._seq = 0
+        self._lock = threading.Lock()
+
+        # Statistics
+        self.evaluated = 0
+        self.raised = 0
+        self.suppressed = 0
+        self.deferred = 0
+
+    def _rules_for(self, label):
+        rules = self._rules_by_label.get(label)
+        if rules is None:
+            rules = self._rules_by_label[label] = [rule for rule in self.rules if rule.matches_label(label)]
+        return rules
+
+    @staticmethod
+    def _epoch(timestamp):
+        """Datetime -> epoch seconds. Naive datetimes (as read back from SQLite) are UTC."""
+        if timestamp is None:
+            return time.time()
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return timestamp.timestamp()
+
+    def evaluate(self, detections=()):
+        """
+        Raise the alerts of the pending detections, then of a batch of written detection
+        rows (none: only retry the pending ones, once zones are loaded). Returns the new alerts.
+        """
+        with self._lock:
+            candidates = list(self._pending)
+            self._pending.clear()
+        retried = len(candidates)
+        for detection in detections:
+            if detection.get('label') is None or detection.get('x') is None or detection.get('y') is None:
+                continue
+            rules = self._rules_for(detection['label'])
+            if rules:
+                candidates.append((detection, rules))
+        if not candidates:
+            return []
+
+        # Zone membership, one call per layer for the whole batch (x = lon, y = lat)
+        inside = {}
+        unloaded = set()
+        for layer in {rule.zone for _, rules in candidates for rule in rules if rule.zone is not None}:
+            index = self.zones(layer)
+            if index is None:
+                unloaded.add(layer)
+                continue
+            tested = [detection for detection, rules in candidates if any(rule.zone == layer for rule in rules)]
+            results = index.contains([d['x'] for d in tested], [d['y'] for d in tested])
+            inside.update({(id(detection), layer): bool(result) for detection, result in zip(tested, results)})
+
+        new_alerts = []
+        with self._lock:
+            for number, (detection, rules) in enumerate(candidates):
+                rule = None
+                deferred = False
+                for candidate in rules:
+                    if candidate.zone in unloaded:
+                        deferred = True  # The first match depends on a zone layer not loaded yet
+                        break
+                    if candidate.matches(detection, inside.get((id(detection), candidate.zone))):
+                        rule = candidate
+                        break
+                if deferred:
+                    self._pending.append((detection, rules))
+                    if number >= retried:
+                        self.deferred += 1
+                    continue
+                self.evaluated += 1
+                if rule is None:
+                    continue
+                epoch = self._epoch(detection.get('timestamp'))
+                key = (rule.name, detection.get('object_id'))
+                last = self._last_fired.get(key)
+                if last is not None and epoch - last < self.cooldown_seconds:
+                    self.suppressed += 1
+                    continue
+                self._last_fired[key] = epoch
+                self._seq += 1
+                alert = {
+                    'id': self._seq,
+                    'rule': rule.name,
+                    'type': rule.type,
+                    'message': rule.format_message(detection),
+                    'objectId': detection.get('object_id'),
+                    'class': detection['label'],
+                    'lat': detection['y'],
+                    'lon': detection['x'],
+                    'zone': rule.zone_label,
+                    'timestamp': detection['timestamp'].isoformat() if detection.get('timestamp') else None,
+                    'color': rule.color
+                }
+                self._alerts.append((epoch, alert))
+                new_alerts.append(alert)
+                self.raised += 1
+            if len(self._last_fired) > 10 * self._alerts.maxlen:
+                # Forget the objects whose cooldown is over
+                horizon = time.time() - self.cooldown_seconds
+                self._last_fired = {key: last for key, last in self._last_fired.items() if last >= horizon}
+        if self.on_alert is not None:
+            for alert in new_alerts:
+                self.on_alert(alert)
+        return new_alerts
+
+    def read(self, after=None, since=None, limit=None):
+        """
+        Buffered alerts with an id above `after` (or, without cursor, timestamped from
+        `since` epoch on), oldest first.
+        Returns:
+            (list, int): Alerts, and the cursor to pass as `after` next time
+        """
+        with self._lock:
+            cursor = self._seq
+            if after is not None:
+                # Ids are consecutive: the alerts after `after` are the tail of the ring
+                count = min(max(cursor - after, 0), len(self._alerts))
+                alerts = [self._alerts[index][1] for index in range(len(self._alerts) - count, len(self._alerts))]
+            else:
+                alerts = [alert for epoch, alert in self._alerts if since is None or epoch >= since]
+        if limit is not None and len(alerts) > limit:
+            alerts = alerts[-limit:]
+        return alerts, cursor
+
+    def get_stats(self):
+        return {
+            'rules': len(self.rules),
+            'buffered': len(self._alerts),
+            'sequence': self._seq,
+            'evaluated': self.evaluated,
+            'raised': self.raised,
+            'suppressed': self.suppressed,
+            'deferred': self.deferred,
+            'pending': len(self._pending)
+        }
@@ -0,0 +1,62 @@
+import numpy as np
+
+
+def douglas_peucker(xs, ys, tolerance):
+    """
+    Indices of the points kept by the Douglas-Peucker simplification of a polyline.
+    Args:
+        xs, ys: Point coordinates (arrays of the same length)
+        tolerance (float): Max distance between a dropped point and the simplified line
+    Returns:
+        np.ndarray: Sorted indices, always including the first and last point
+    """
+    n = len(xs)
+    if n < 3 or tolerance <= 0:
+        return np.arange(n)
+    xs = np.asarray(xs, dtype=np.float64)
+    ys = np.asarray(ys, dtype=np.float64)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        dx, dy = xs[last] - xs[first], ys[last] - ys[first]
+        px, py = xs[first + 1:last] - xs[first], ys[first + 1:last] - ys[first]
+        length = np.hypot(dx, dy)
+        if length == 0:
+            distances = np.hypot(px, py)
+        else:
+            distances = np.abs(px * dy - py * dx) / length
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            index = first + 1 + farthest
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+    return np.flatnonzero(keep)
+
+
+def decimate(xs, ys, tolerance=0.0, max_points=None):
+    """
+    Points of a track to keep for display: Douglas-Peucker with `tolerance` (pixels),
+    then an even subsample down to `max_points`, first and last points kept.
+    Args:
+        xs, ys: Point coordinates, in time order
+    Returns:
+        np.ndarray: Sorted indices of the kept points
+    """
+    n = len(xs)
+    indices = np.arange(n)
+    if max_points is not None and n > 4 * max_points:
+        # Bound the simplification cost of very long tracks: pre-sample evenly first
+        indices = np.round(np.linspace(0, n - 1, 4 * max_points)).astype(int)
+    xs = np.asarray(xs, dtype=np.float64)[indices]
+    ys = np.asarray(ys, dtype=np.float64)[indices]
+    indices = indices[douglas_peucker(xs, ys, tolerance)]
+    if max_points is not None and len(indices) > max_points:
+        if max_points < 2:
+            return indices[len(indices) - max_points:]
+        indices = indices[np.round(np.linspace(0, len(indices) - 1, max_points)).astype(int)]
+    return indices
@@ -0,0 +1,235 @@
+import logging
+import queue
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+
+class DetectionWriter:
+    """
+    Background writer persisting YOLO detections in batches.
+    Detections are queued by the inference thread and flushed by a worker thread
+    as bulk inserts, either when `batch_size` items are pending or every
+    `flush_interval` seconds, in a single transaction per batch.
+    `on_flush`, if given, is called with the detection rows of every committed batch,
+    after the transaction; its failures are counted apart (hookErrors).
+    With a `partitions` manager (services/partitions.py), detections and trajectory
+    points are written to their time partitions.
+    """
+
+    def __init__(self, app, db, detection_model, trajectory_model, point_model,
+                 batch_size=500, flush_interval=0.5, max_backlog=20000, on_flush=None, partitions=None):
+        self.app = app
+        self.db = db
+        self.Detection = detection_model
+        self.Trajectory = trajectory_model
+        self.TrajectoryPoint = point_model
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.partitions = partitions
+        self._queue = queue.Queue(maxsize=max_backlog)
+        # object_id -> trajectory.id, avoids one lookup query per detection
+        self._trajectory_ids = {}
+        self._stop_event = threading.Event()
+        self._thread = None
+
+        # Statistics
+        self.submitted = 0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.errors = 0
+        self.hook_errors = 0
+        self.last_flush_ms = 0.0
+        self.avg_flush_ms = 0.0
+        self.last_batch_size = 0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="detection-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5.0):
+        """Stop the worker after flushing what is still queued."""
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def submit(self, detection_data):
+        """Queue a detection for persistence. Never blocks the caller."""
+        item = dict(detection_data)
+        item['received_at'] = datetime.now(timezone.utc)
+        try:
+            self._queue.put_nowait(item)
+            self.submitted += 1
+        except queue.Full:
+            self.dropped += 1
+
+    def _collect_batch(self):
+        """Wait for the first item, then gather more until the batch is full or the interval elapses."""
+        try:
+            first = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = self._collect_batch()
+            if batch:
+                self.flush(batch)
+        # Drain what is left on shutdown
+        while True:
+            batch = []
+            try:
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            if not batch:
+                break
+            self.flush(batch)
+
+    def _resolve_trajectories(self, batch):
+        """Fill the object_id -> trajectory id cache, creating missing trajectories. Returns new ids."""
+        Trajectory = self.Trajectory
+        unknown = {}
+        for item in batch:
+            if item['id'] not in self._trajectory_ids and item['id'] not in unknown:
+                unknown[item['id']] = (item['label'], item['received_at'])
+        if not unknown:
+            return []
+
+        existing = (
+            self.db.session.query(Trajectory.object_id, self.db.func.min(Trajectory.id))
+            .filter(Trajectory.object_id.in_(list(unknown)))
+            .group_by(Trajectory.object_id)
+            .all()
+        )
+        for object_id, trajectory_id in existing:
+            self._trajectory_ids[object_id] = trajectory_id
+            unknown.pop(object_id, None)
+
+        created = [
+            Trajectory(object_id=object_id, label=label, start_time=first_seen, last_seen=first_seen)
+            for object_id, (label, first_seen) in unknown.items()
+        ]
+        if created:
+            self.db.session.add_all(created)
+            self.db.session.flush()  # To get trajectory IDs
+            for trajectory in created:
+                self._trajectory_ids[trajectory.object_id] = trajectory.id
+        return [trajectory.object_id for trajectory in created]
+
+    def flush(self, batch):
+        """Persist a batch of detections with bulk inserts in a single transaction."""
+        start = time.perf_counter()
+        created_ids = []
+        detection_rows = None
+        try:
+            if self.partitions is not None:
+                # Before the write transaction: creating a partition takes a transaction of its own
+                timestamps = {item['received_at'] for item in batch}
+                self.partitions.ensure('detection', timestamps)
+                self.partitions.ensure('trajectory_point', timestamps)
+            with self.app.app_context():
+                session = self.db.session
+                created_ids = self._resolve_trajectories(batch)
+
+                detection_rows = []
+                point_rows = []
+                last_seen = {}
+                for item in batch:
+                    trajectory_id = self._trajectory_ids[item['id']]
+                    speed = item.get('speed')
+                    distance = item.get('distance')
+                    timestamp = item['received_at']
+                    detection_rows.append({
+                        'object_id': item['id'],
+                        'label': item['label'],
+                        'confidence': item['confidence'],
+                        'x': item['x'],
+                        'y': item['y'],
+                        'speed': speed,
+                        'distance': distance,
+                        'timestamp': timestamp,
+                        'history_id': f"yolo_{uuid.uuid4()}_{item.get('frame_number', 0)}"
+                    })
+                    point_rows.append({
+                        'trajectory_id': trajectory_id,
+                        'x': item['x'],
+                        'y': item['y'],
+                        'speed': speed,
+                        'distance': distance,
+                        'timestamp': timestamp
+                    })
+                    last_seen[trajectory_id] = timestamp
+
+                if self.partitions is not None:
+                    connection = session.connection()
+                    self.partitions.insert(connection, 'detection', detection_rows)
+                    self.partitions.insert(connection, 'trajectory_point', point_rows)
+                else:
+                    session.bulk_insert_mappings(self.Detection, detection_rows)
+                    session.bulk_insert_mappings(self.TrajectoryPoint, point_rows)
+                session.bulk_update_mappings(self.Trajectory, [
+                    {'id': trajectory_id, 'last_seen': timestamp, 'is_active': True}
+                    for trajectory_id, timestamp in last_seen.items()
+                ])
+                session.commit()
+
+            self.written += len(batch)
+            self.batches += 1
+            self.last_batch_size = len(batch)
+        except Exception as e:
+            detection_rows = None
+            self.errors += 1
+            logger.error(f"Error flushing {len(batch)} detections: {e}")
+            # Trajectories created in the failed transaction no longer exist
+            for object_id in created_ids:
+                self._trajectory_ids.pop(object_id, None)
+            with self.app.app_context():
+                self.db.session.rollback()
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.last_flush_ms = elapsed_ms
+            self.avg_flush_ms = elapsed_ms if self.batches <= 1 else 0.9 * self.avg_flush_ms + 0.1 * elapsed_ms
+
+        # Outside the write transaction: a failing hook must not undo a committed batch
+        if detection_rows is not None and self.on_flush is not None:
+            try:
+                self.on_flush(detection_rows)
+            except Exception as e:
+                self.hook_errors += 1
+                logger.error(f"Error in on_flush hook for {len(detection_rows)} detections: {e}")
+
+    def get_stats(self):
+        """Backlog, throughput and flush latency of the writer."""
+        return {
+            'backlog': self._queue.qsize(),
+            'submitted': self.submitted,
+            'written': self.written,
+            'dropped': self.dropped,
+            'batches': self.batches,
+            'errors': self.errors,
+            'hookErrors': self.hook_errors,
+            'lastBatchSize': self.last_batch_size,
+            'lastFlushMs': self.last_flush_ms,
+            'avgFlushMs': self.avg_flush_ms
+        }
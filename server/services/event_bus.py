@@ -0,0 +1,152 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class EventBus:
+    """
+    In-memory fan-out of live events (detections, metrics) to Server-Sent Events clients.
+    Published events go once into a shared ring buffer, numbered by a sequence; every
+    client only keeps its position in it, so publishing costs the same whatever the
+    number of clients and no client ever causes a database query. A client reads at
+    most `max_lag` events behind the newest one: a slower client (or one reconnecting
+    with an event id no longer buffered) skips ahead and gets a 'reset' event, telling
+    it to reload its state through the REST API. Pending events are coalesced into one
+    message per kind: detections are batched (up to `max_batch`, newest kept), tracks
+    keep the latest position of each track id and metrics only the latest value.
+    """
+
+    COALESCED = ('metrics',)  # Kinds of which only the latest pending event is sent
+
+    def __init__(self, history=10000, max_lag=2000, max_batch=500):
+        self.history = history
+        self.max_lag = min(max_lag, history)
+        self.max_batch = max_batch
+        # Event ids are "<boot>-<seq>": ids of a previous server run are never replayed
+        self.boot = f"{int(time.time()):x}"
+        self._events = deque(maxlen=history)  # (seq, kind, data)
+        self._seq = 0
+        self._condition = threading.Condition()
+        self.clients = 0
+
+        # Statistics
+        self.published = 0
+        self.sent = 0
+        self.resets = 0
+
+    def publish(self, kind, data):
+        """Add an event (JSON-serializable data) and wake the clients."""
+        with self._condition:
+            self._seq += 1
+            self._events.append((self._seq, kind, data))
+            self.published += 1
+            self._condition.notify_all()
+
+    def cursor(self, event_id=None):
+        """
+        Sequence to resume after, from a client's last event id (Last-Event-ID).
+        Returns:
+            (int, bool): Sequence, and whether the events after it are still buffered
+        """
+        with self._condition:
+            if event_id:
+                boot, _, seq = event_id.partition('-')
+                if boot == self.boot and seq.isdigit():
+                    seq = int(seq)
+                    oldest = self._events[0][0] if self._events else self._seq + 1
+                    if oldest - 1 <= seq <= self._seq and self._seq - seq <= self.max_lag:
+                        return seq, True
+            return self._seq, not event_id
+
+    def read(self, after, timeout):
+        """
+        Events published after sequence `after`, waiting up to `timeout` seconds for one.
+        Returns:
+            (int, list, bool): New cursor, (seq, kind, data) events, and whether events
+            were skipped because the client lagged more than `max_lag` behind
+        """
+        with self._condition:
+            if self._seq <= after:
+                self._condition.wait(timeout)
+            if self._seq <= after:
+                return after, [], False
+            lagged = self._seq - after > self.max_lag
+            first = self._seq - self.max_lag if lagged else after
+            # The newest events are at the end of the ring: copy the tail only
+            events = [self._events[index] for index in range(len(self._events) - (self._seq - first), len(self._events))]
+            return self._seq, events, lagged
+
+    def coalesce(self, events):
+        """(kind, data) messages of a list of events, one per kind."""
+        detections = []
+        tracks = {}
+        latest = {}
+        for _, kind, data in events:
+            if kind == 'detection':
+                detections.append(data)
+                track_id = data.get('id')
+                if track_id is not None and track_id >= 0:
+                    tracks[(data.get('stream_id'), track_id)] = {
+                        'id': track_id, 'label': data.get('label'), 'x': data.get('x'), 'y': data.get('y'),
+                        'timestamp': data.get('timestamp'), 'stream_id': data.get('stream_id')
+                    }
+            elif kind in self.COALESCED:
+                latest[kind] = data
+            else:
+                latest.setdefault(kind, []).append(data)
+        messages = []
+        if detections:
+            messages.append(('detections', detections[-self.max_batch:]))
+        if tracks:
+            messages.append(('tracks', list(tracks.values())))
+        messages.extend(latest.items())
+        return messages
+
+    def stream(self, event_id=None, coalesce_interval=0.1, keepalive=15.0):
+        """
+        Server-Sent Events of one client (text chunks), resuming after `event_id`.
+        After each message, events accumulate for `coalesce_interval` seconds before the
+        next one; a comment line is sent every `keepalive` seconds without events, so
+        disconnected clients are noticed.
+        """
+        cursor, replayed = self.cursor(event_id)
+        with self._condition:
+            self.clients += 1
+        try:
+            yield 'retry: 2000\n\n'
+            if not replayed:
+                self.resets += 1
+                yield self._format(cursor, 'reset', {'reason': 'expired'})
+            while True:
+                cursor, events, lagged = self.read(cursor, keepalive)
+                if lagged:
+                    self.resets += 1
+                    yield self._format(cursor, 'reset', {'reason': 'lagged'})
+                elif not events:
+                    yield ': keepalive\n\n'
+                    continue
+                for kind, data in self.coalesce(events):
+                    self.sent += 1
+                    yield self._format(cursor, kind, data)
+                # Let events accumulate: one batch per interval, whatever the event rate
+                time.sleep(coalesce_interval)
+        finally:
+            with self._condition:
+                self.clients -= 1
+
+    def _format(self, seq, kind, data):
+        return f"id: {self.boot}-{seq}\nevent: {kind}\ndata: {json.dumps(data, default=str)}\n\n"
+
+    def get_stats(self):
+        return {
+            'clients': self.clients,
+            'sequence': self._seq,
+            'buffered': len(self._events),
+            'published': self.published,
+            'sent': self.sent,
+            'resets': self.resets
+        }
@@ -0,0 +1,301 @@
+import csv
+import io
+import json
+import logging
+from datetime import datetime, timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional, only needed for the parquet and arrow formats
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+# Format -> mimetype
+EXPORT_FORMATS = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'parquet': 'application/vnd.apache.parquet',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+COLUMNAR_FORMATS = ('parquet', 'arrow')
+
+# Flat datasets: columns and their Arrow types
+DATASETS = {
+    'detections': [
+        ('id', 'int64'), ('object_id', 'int64'), ('label', 'string'), ('confidence', 'float64'),
+        ('x', 'float64'), ('y', 'float64'), ('speed', 'float64'), ('distance', 'float64'),
+        ('timestamp', 'timestamp'), ('history_id', 'string'),
+    ],
+    'points': [
+        ('id', 'int64'), ('trajectory_id', 'int64'), ('object_id', 'int64'), ('label', 'string'),
+        ('x', 'float64'), ('y', 'float64'), ('speed', 'float64'), ('distance', 'float64'),
+        ('timestamp', 'timestamp'),
+    ],
+}
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file collecting what pyarrow writes, drained after each batch."""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks = []
+        self._position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+class DataExporter:
+    """
+    Streaming export of the detection history.
+    Rows are read with server-side iteration (yield_per) and encoded batch by batch,
+    so an export of any size runs in bounded memory: flat datasets ('detections',
+    'points') as NDJSON, CSV, Parquet or Arrow IPC, or the whole history as one JSON
+    document (detectionHistory + trajectoryHistory, as written by POST /api/export).
+    Trajectory points are read joined with their trajectory, never one query per trajectory.
+    """
+
+    TRAJECTORY_CHUNK = 500  # Trajectories whose points are sorted together (JSON document)
+
+    def __init__(self, db, detection_model, trajectory_model, point_model, partitions=None, batch_size=5000):
+        self.db = db
+        self.Detection = detection_model
+        self.Trajectory = trajectory_model
+        self.TrajectoryPoint = point_model
+        self.partitions = partitions
+        self.batch_size = batch_size
+
+    def _source(self, model, since):
+        if self.partitions is None:
+            return model
+        return self.partitions.source(model, since=since)
+
+    def _detection_query(self, since=None, until=None, label=None):
+        D = self._source(self.Detection, since)
+        query = self.db.session.query(D.id, D.object_id, D.label, D.confidence, D.x, D.y,
+                                      D.speed, D.distance, D.timestamp, D.history_id)
+        if since is not None:
+            query = query.filter(D.timestamp >= since)
+        if until is not None:
+            query = query.filter(D.timestamp < until)
+        if label is not None:
+            query = query.filter(D.label == label)
+        return query
+
+    def _point_query(self, since=None, until=None, label=None):
+        P, Trajectory = self._source(self.TrajectoryPoint, since), self.Trajectory
+        query = (
+            self.db.session.query(P.id, P.trajectory_id, Trajectory.object_id, Trajectory.label,
+                                  P.x, P.y, P.speed, P.distance, P.timestamp)
+            .join(Trajectory, Trajectory.id == P.trajectory_id)
+        )
+        if since is not None:
+            query = query.filter(P.timestamp >= since)
+        if until is not None:
+            query = query.filter(P.timestamp < until)
+        if label is not None:
+            query = query.filter(Trajectory.label == label)
+        return query
+
+    def _batches(self, dataset, since=None, until=None, label=None):
+        """Lists of at most `batch_size` row tuples, in DATASETS column order."""
+        if dataset == 'detections':
+            query = self._detection_query(since, until, label)
+        elif dataset == 'points':
+            query = self._point_query(since, until, label)
+        else:
+            raise ValueError(f"Unknown dataset: {dataset}")
+        batch = []
+        for row in query.yield_per(self.batch_size):
+            batch.append(tuple(row))
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def stream(self, dataset, fmt, since=None, until=None, label=None):
+        """
+        Encoded chunks (bytes) of an export. `dataset` is ignored by the 'json' format,
+        which always exports the whole history document.
+        Raises:
+            ValueError: Unknown format or dataset
+            RuntimeError: Columnar format requested without pyarrow
+        """
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown export format: {fmt}")
+        if fmt == 'json':
+            return self.document(since, until, label, export_date=datetime.now(timezone.utc))
+        if dataset not in DATASETS:
+            raise ValueError(f"Unknown dataset: {dataset}")
+        if fmt in COLUMNAR_FORMATS and pa is None:
+            raise RuntimeError(f"The {fmt} export format requires pyarrow")
+        encoder = {'ndjson': self._ndjson, 'csv': self._csv, 'parquet': self._parquet, 'arrow': self._arrow}[fmt]
+        return encoder(dataset, self._batches(dataset, since, until, label))
+
+    # --- Encoders ---
+
+    @staticmethod
+    def _text_rows(dataset, batch):
+        """Rows with their timestamps as ISO 8601 strings."""
+        index = [kind for _, kind in DATASETS[dataset]].index('timestamp')
+        for row in batch:
+            row = list(row)
+            row[index] = _isoformat(row[index])
+            yield row
+
+    def _ndjson(self, dataset, batches):
+        names = [name for name, _ in DATASETS[dataset]]
+        for batch in batches:
+            yield ''.join(json.dumps(dict(zip(names, row))) + '\n' for row in self._text_rows(dataset, batch)).encode()
+
+    def _csv(self, dataset, batches):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow([name for name, _ in DATASETS[dataset]])
+        for batch in batches:
+            writer.writerows(self._text_rows(dataset, batch))
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue().encode()
+
+    @staticmethod
+    def _arrow_schema(dataset):
+        types = {'int64': pa.int64(), 'float64': pa.float64(), 'string': pa.string(), 'timestamp': pa.timestamp('us')}
+        return pa.schema([(name, types[kind]) for name, kind in DATASETS[dataset]])
+
+    def _record_batch(self, schema, batch):
+        columns = list(zip(*batch))
+        return pa.record_batch([pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+                               schema=schema)
+
+    def _parquet(self, dataset, batches):
+        schema = self._arrow_schema(dataset)
+        sink = _ChunkSink()
+        writer = pq.ParquetWriter(sink, schema)
+        try:
+            for batch in batches:
+                # One row group per batch, flushed to the client as soon as it is encoded
+                writer.write_batch(self._record_batch(schema, batch))
+                data = sink.drain()
+                if data:
+                    yield data
+        finally:
+            writer.close()
+        yield sink.drain()
+
+    def _arrow(self, dataset, batches):
+        schema = self._arrow_schema(dataset)
+        sink = _ChunkSink()
+        with pa.ipc.new_stream(sink, schema) as writer:
+            for batch in batches:
+                writer.write_batch(self._record_batch(schema, batch))
+                yield sink.drain()
+        yield sink.drain()
+
+    # --- JSON history document ---
+
+    def _json_document(self, since, until, label, export_date=None, current_detections=None, filters=None,
+                       counts=None):
+        """
+        The history as one JSON document, written piece by piece:
+        {exportDate, detectionHistory: [...], trajectoryHistory: {object_id: {..., points}}, ...}
+        `counts`, if given, receives the number of exported detections and trajectories.
+        """
+        counts = {} if counts is None else counts
+        counts['detections'] = counts['trajectories'] = 0
+        yield ('{"exportDate": %s, "detectionHistory": [' % json.dumps(_isoformat(export_date))).encode()
+        first = True
+        for batch in self._batches('detections', since, until, label):
+            pieces = []
+            for _, object_id, row_label, confidence, x, y, speed, distance, timestamp, history_id in batch:
+                pieces.append(json.dumps({
+                    'id': object_id, 'label': row_label, 'confidence': confidence, 'x': x, 'y': y,
+                    'speed': speed, 'distance': distance, 'timestamp': _isoformat(timestamp),
+                    'historyId': history_id
+                }))
+            yield (('' if first else ', ') + ', '.join(pieces)).encode()
+            counts['detections'] += len(batch)
+            first = False
+
+        yield b'], "trajectoryHistory": {'
+        first = True
+        for trajectory, points in self._trajectories(since, until, label):
+            entry = {
+                'id': trajectory.object_id,
+                'label': trajectory.label,
+                'startTime': _isoformat(trajectory.start_time),
+                'lastSeen': _isoformat(trajectory.last_seen),
+                'points': points
+            }
+            yield (('' if first else ', ') + json.dumps(str(trajectory.object_id)) + ': ' + json.dumps(entry)).encode()
+            counts['trajectories'] += 1
+            first = False
+        yield ('}, "currentDetections": %s, "filters": %s}' % (
+            json.dumps(current_detections or []), json.dumps(filters or {}))).encode()
+
+    def _trajectories(self, since, until, label):
+        """(trajectory, point dicts) pairs; points are read for TRAJECTORY_CHUNK trajectories at a time."""
+        Trajectory = self.Trajectory
+        query = self.db.session.query(Trajectory)
+        if label is not None:
+            query = query.filter(Trajectory.label == label)
+        if since is not None:
+            query = query.filter(Trajectory.last_seen >= since)
+        if until is not None:
+            query = query.filter(Trajectory.start_time < until)
+        chunk = []
+        for trajectory in query.order_by(Trajectory.id).yield_per(self.TRAJECTORY_CHUNK):
+            chunk.append(trajectory)
+            if len(chunk) >= self.TRAJECTORY_CHUNK:
+                yield from self._with_points(chunk, since, until)
+                chunk = []
+        if chunk:
+            yield from self._with_points(chunk, since, until)
+
+    def _with_points(self, trajectories, since, until):
+        P = self._source(self.TrajectoryPoint, since)
+        query = (
+            self.db.session.query(P.trajectory_id, P.x, P.y, P.speed, P.distance, P.timestamp)
+            .filter(P.trajectory_id.in_([trajectory.id for trajectory in trajectories]))
+        )
+        if since is not None:
+            query = query.filter(P.timestamp >= since)
+        if until is not None:
+            query = query.filter(P.timestamp < until)
+        points = {}
+        for trajectory_id, x, y, speed, distance, timestamp in query.order_by(P.trajectory_id, P.timestamp):
+            points.setdefault(trajectory_id, []).append({
+                'x': x, 'y': y, 'speed': speed, 'distance': distance, 'timestamp': _isoformat(timestamp)
+            })
+        for trajectory in trajectories:
+            yield trajectory, points.get(trajectory.id, [])
+
+    def document(self, since=None, until=None, label=None, export_date=None, current_detections=None, filters=None,
+                 counts=None):
+        """Encoded chunks of the JSON history document, with the request metadata of POST /api/export."""
+        return self._json_document(since, until, label, export_date, current_detections, filters, counts)
@@ -0,0 +1,261 @@
+import json
+import logging
+import queue
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from services.frame_ingest import FrameDecoder
+
+logger = logging.getLogger(__name__)
+
+# Message header, both directions: type, sequence number, timestamp (sender epoch seconds), payload length
+HEADER = struct.Struct('>BQdI')
+
+# Edge -> server
+HELLO = 0  # Payload: JSON {"stream_id": "..."}, optional, before the first frame
+FRAME = 1  # Payload: encoded image (JPEG, PNG)
+# Server -> edge, with the sequence number and timestamp of the frame they answer
+RESULT = 2  # Payload: JSON {"detections": [...], "latencyMs": ...}
+SKIPPED = 3  # Payload: JSON {"reason": "rate" | "busy" | "decode"}
+
+
+def _recv_exact(sock, length):
+    """`length` bytes from the socket, or None if the peer closed the connection."""
+    buffer = bytearray(length)
+    view = memoryview(buffer)
+    received = 0
+    while received < length:
+        count = sock.recv_into(view[received:])
+        if not count:
+            return None
+        received += count
+    return buffer
+
+
+def send_message(sock, kind, seq, timestamp, payload=b''):
+    sock.sendall(HEADER.pack(kind, seq, timestamp, len(payload)) + payload)
+
+
+def read_message(sock):
+    """(type, seq, timestamp, payload) of the next message, or None once the connection is closed."""
+    header = _recv_exact(sock, HEADER.size)
+    if header is None:
+        return None
+    kind, seq, timestamp, length = HEADER.unpack(header)
+    payload = _recv_exact(sock, length) if length else bytearray()
+    if payload is None:
+        return None
+    return kind, seq, timestamp, payload
+
+
+class _Connection:
+    """One edge connection: frames are decoded in the shared pool, detected in order."""
+
+    def __init__(self, server, sock, address):
+        self.server = server
+        self.sock = sock
+        self.address = address
+        self.stream_id = f"edge-{address[0]}:{address[1]}"
+        self.detect = None
+        self.last_accepted = 0.0
+        self.pending = queue.Queue()  # (seq, timestamp, received_at, decode future), in arrival order
+        self._send_lock = threading.Lock()
+
+    def send(self, kind, seq, timestamp, data):
+        with self._send_lock:
+            send_message(self.sock, kind, seq, timestamp, json.dumps(data, default=str).encode())
+
+    def read_loop(self):
+        """Reader thread: rate limiting and decode submission, answers skipped frames at once."""
+        worker = threading.Thread(target=self.detect_loop, name=f"channel-{self.stream_id}", daemon=True)
+        try:
+            while True:
+                message = read_message(self.sock)
+                if message is None:
+                    break
+                kind, seq, timestamp, payload = message
+                if kind == HELLO:
+                    self.stream_id = json.loads(payload or b'{}').get('stream_id') or self.stream_id
+                    continue
+                if kind != FRAME:
+                    logger.warning(f"Frame channel {self.stream_id}: unknown message type {kind}")
+                    continue
+                if self.detect is None:
+                    self.detect = self.server.session_factory(self.stream_id)
+                    worker.start()
+                self.server.received += 1
+                now = time.monotonic()
+                # Same rule as StreamService.process_frame: at most target_fps frames per second
+                if now - self.last_accepted < self.server.frame_interval:
+                    self.server.skipped_rate += 1
+                    self.send(SKIPPED, seq, timestamp, {'reason': 'rate'})
+                    continue
+                if self.pending.qsize() >= self.server.max_pending:
+                    self.server.skipped_busy += 1
+                    self.send(SKIPPED, seq, timestamp, {'reason': 'busy'})
+                    continue
+                self.last_accepted = now
+                future = self.server.pool.submit(self.server.decoder.decode, payload, self.server.scale)
+                self.pending.put((seq, timestamp, now, future))
+        except (OSError, ValueError) as e:
+            logger.info(f"Frame channel {self.stream_id} closed: {e}")
+        finally:
+            self.pending.put(None)
+            if not worker.is_alive():
+                self.close()
+
+    def detect_loop(self):
+        """Detection thread: frames in sequence order, results sent on the same connection."""
+        try:
+            while True:
+                item = self.pending.get()
+                if item is None:
+                    break
+                seq, timestamp, received_at, future = item
+                try:
+                    frame = future.result()
+                except ValueError:
+                    self.server.decode_errors += 1
+                    self.send(SKIPPED, seq, timestamp, {'reason': 'decode'})
+                    continue
+                detections = self.detect(frame)
+                latency_ms = (time.monotonic() - received_at) * 1000
+                self.server.processed += 1
+                self.server.latency_ms = latency_ms if self.server.processed == 1 else \
+                    0.9 * self.server.latency_ms + 0.1 * latency_ms
+                self.send(RESULT, seq, timestamp, {'detections': detections, 'latencyMs': latency_ms})
+        except OSError as e:
+            logger.info(f"Frame channel {self.stream_id} closed: {e}")
+        finally:
+            self.close()
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+        self.server._remove(self)
+
+
+class FrameChannelServer:
+    """
+    Persistent binary channel for edge cameras: the edge pushes encoded frames, each
+    with a sequence number and timestamp (HEADER), over one TCP connection and gets the
+    detections of every frame back on it (RESULT), or SKIPPED when the frame is dropped.
+    Frames are decoded in a shared worker pool and detected in sequence order, at most
+    `target_fps` per connection and `max_pending` waiting; the others are skipped at
+    once, so a fast sender never builds up latency.
+    Args:
+        session_factory: Called with the stream id of a new connection, returns the
+            detection function (BGR frame -> detection dicts) of that connection
+        scale (int): Decode scale (see services/frame_ingest.py); the detection function
+            is expected to report full-resolution coordinates
+    """
+
+    def __init__(self, session_factory, host='0.0.0.0', port=9090, workers=2, target_fps=15, max_pending=4,
+                 scale=1):
+        self.session_factory = session_factory
+        self.host = host
+        self.port = port
+        self.frame_interval = 1.0 / target_fps if target_fps else 0.0
+        self.max_pending = max_pending
+        self.scale = scale
+        self.decoder = FrameDecoder()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="frame-decode")
+        self.connections = set()
+        self._lock = threading.Lock()
+        self._socket = None
+        self._thread = None
+
+        # Statistics
+        self.received = 0
+        self.processed = 0
+        self.skipped_rate = 0
+        self.skipped_busy = 0
+        self.decode_errors = 0
+        self.latency_ms = 0.0
+
+    def start(self):
+        """Listen (port 0 picks a free port, see `port` afterwards) and accept connections."""
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self._socket.listen()
+        self.port = self._socket.getsockname()[1]
+        self._thread = threading.Thread(target=self._accept_loop, name="frame-channel", daemon=True)
+        self._thread.start()
+        logger.info(f"Frame channel listening on {self.host}:{self.port}")
+
+    def stop(self):
+        if self._socket is not None:
+            self._socket.close()
+        with self._lock:
+            connections = list(self.connections)
+        for connection in connections:
+            connection.close()
+        self.pool.shutdown(wait=False)
+
+    def _accept_loop(self):
+        while True:
+            try:
+                sock, address = self._socket.accept()
+            except OSError:
+                break  # Listening socket closed
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = _Connection(self, sock, address)
+            with self._lock:
+                self.connections.add(connection)
+            threading.Thread(target=connection.read_loop, name=f"channel-read-{address[1]}", daemon=True).start()
+
+    def _remove(self, connection):
+        with self._lock:
+            self.connections.discard(connection)
+
+    def get_metrics(self):
+        with self._lock:
+            streams = [connection.stream_id for connection in self.connections]
+        return {
+            'port': self.port,
+            'connections': streams,
+            'received': self.received,
+            'processed': self.processed,
+            'skippedRate': self.skipped_rate,
+            'skippedBusy': self.skipped_busy,
+            'decodeErrors': self.decode_errors,
+            'latencyMs': self.latency_ms
+        }
+
+
+class FrameChannelClient:
+    """Edge side of the channel (and loopback sender for tests and benchmarks)."""
+
+    def __init__(self, host, port, stream_id=None, timeout=10):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.seq = 0
+        if stream_id is not None:
+            send_message(self.sock, HELLO, 0, time.time(), json.dumps({'stream_id': stream_id}).encode())
+
+    def send(self, encoded, timestamp=None):
+        """Push an encoded frame. Returns its sequence number."""
+        self.seq += 1
+        send_message(self.sock, FRAME, self.seq, time.time() if timestamp is None else timestamp, encoded)
+        return self.seq
+
+    def receive(self):
+        """
+        Next answer of the server.
+        Returns:
+            (int, int, float, dict): Type (RESULT or SKIPPED), seq, timestamp of the frame, data
+        """
+        message = read_message(self.sock)
+        if message is None:
+            raise ConnectionError("Frame channel closed by the server")
+        kind, seq, timestamp, payload = message
+        return kind, seq, timestamp, json.loads(payload)
+
+    def close(self):
+        self.sock.close()
@@ -0,0 +1,91 @@
+import struct
+import threading
+
+import cv2
+import numpy as np
+
+# Request bodies of /api/yolo/detect_frame besides multipart uploads
+RAW_FRAME_TYPES = ('image/jpeg', 'image/png', 'application/octet-stream')  # One encoded frame
+FRAME_BATCH_TYPE = 'application/x-frame-batch'  # Encoded frames, each prefixed by its length (uint32, big endian)
+
+# Decode scale -> cv2.imdecode flags (JPEG is decoded at 1/2, 1/4 or 1/8 resolution directly)
+DECODE_FLAGS = {
+    1: cv2.IMREAD_COLOR,
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8,
+}
+
+_LENGTH = struct.Struct('>I')
+
+
+class FrameDecoder:
+    """
+    Decoding of uploaded frames to BGR arrays, the colour order of the model pipeline and
+    of the OpenCV drawing. Request bodies are read into a buffer reused by each server
+    thread and decoded with cv2.imdecode straight from it, without intermediate copies.
+    """
+
+    def __init__(self, max_frames=16):
+        self.max_frames = max_frames
+        self._local = threading.local()
+
+    def read_body(self, stream, length):
+        """
+        The `length` bytes of a request body, as a view of the thread's buffer
+        (valid until the next call on the same thread).
+        Raises:
+            ValueError: Body shorter than `length`
+        """
+        buffer = getattr(self._local, 'buffer', None)
+        if buffer is None or len(buffer) < length:
+            # Grown geometrically, so a slowly increasing frame size does not reallocate every time
+            buffer = self._local.buffer = bytearray(max(length, 2 * len(buffer) if buffer is not None else 0))
+        view = memoryview(buffer)[:length]
+        received = 0
+        while received < length:
+            count = stream.readinto(view[received:])
+            if not count:
+                raise ValueError(f"Truncated body: {received} of {length} bytes")
+            received += count
+        return view
+
+    def split(self, body):
+        """
+        Encoded frames of a FRAME_BATCH_TYPE body (views, no copies).
+        Raises:
+            ValueError: Malformed body or more than `max_frames` frames
+        """
+        frames = []
+        offset = 0
+        while offset < len(body):
+            if offset + _LENGTH.size > len(body):
+                raise ValueError("Truncated frame length")
+            (length,) = _LENGTH.unpack_from(body, offset)
+            offset += _LENGTH.size
+            if offset + length > len(body):
+                raise ValueError("Truncated frame")
+            frames.append(body[offset:offset + length])
+            offset += length
+            if len(frames) > self.max_frames:
+                raise ValueError(f"More than {self.max_frames} frames in one request")
+        return frames
+
+    @staticmethod
+    def decode(data, scale=1):
+        """
+        Encoded image (bytes or buffer) -> BGR array, at 1/`scale` resolution.
+        Raises:
+            ValueError: Unsupported scale or undecodable data
+        """
+        if scale not in DECODE_FLAGS:
+            raise ValueError(f"Unsupported decode scale: {scale} (expected one of {sorted(DECODE_FLAGS)})")
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), DECODE_FLAGS[scale])
+        if frame is None:
+            raise ValueError("Invalid image data")
+        return frame
+
+
+def encode_batch(frames):
+    """FRAME_BATCH_TYPE body of encoded frames (bytes), for clients and benchmarks."""
+    return b''.join(_LENGTH.pack(len(frame)) + bytes(frame) for frame in frames)
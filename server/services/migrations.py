@@ -0,0 +1,65 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Ordered schema migrations: (version, description, steps).
+# A step is either an SQL statement or a callable taking the connection and the
+# context given to apply_migrations() (objects the step needs, e.g. 'partitions').
+# The database version is stored in SQLite's PRAGMA user_version, so each
+# migration runs once; steps must also be safe on databases freshly created
+# by db.create_all() (hence IF NOT EXISTS).
+MIGRATIONS = [
+    (1, "Indexes for the hot detection, trajectory and trajectory point queries", [
+        "CREATE INDEX IF NOT EXISTS ix_detection_timestamp_label_object_id ON detection (timestamp, label, object_id)",
+        "CREATE INDEX IF NOT EXISTS ix_detection_object_id_timestamp ON detection (object_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_trajectory_object_id ON trajectory (object_id)",
+        "CREATE INDEX IF NOT EXISTS ix_trajectory_is_active_last_seen ON trajectory (is_active, last_seen)",
+        "CREATE INDEX IF NOT EXISTS ix_trajectory_start_time ON trajectory (start_time)",
+        "CREATE INDEX IF NOT EXISTS ix_trajectory_point_trajectory_id_timestamp ON trajectory_point (trajectory_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_trajectory_point_timestamp ON trajectory_point (timestamp)",
+        # Planner statistics, so SQLite picks between the timestamp indexes sensibly
+        "ANALYZE",
+    ]),
+    (2, "Time-partitioned detection and trajectory point storage", [
+        lambda connection, context: context['partitions'].migrate_legacy(connection, 'detection'),
+        lambda connection, context: context['partitions'].migrate_legacy(connection, 'trajectory_point'),
+    ]),
+    (3, "Index for the /api/trajectories keyset pagination", [
+        "CREATE INDEX IF NOT EXISTS ix_trajectory_last_seen ON trajectory (last_seen)",
+    ]),
+]
+
+
+def get_schema_version(connection):
+    return connection.exec_driver_sql("PRAGMA user_version").scalar()
+
+
+def apply_migrations(engine, migrations=None, context=None):
+    """
+    Bring the database schema up to date.
+    Args:
+        engine: SQLAlchemy engine of the SQLite database
+        migrations: Migration list (defaults to MIGRATIONS)
+        context (dict): Passed to the callable steps
+    Returns:
+        int: Schema version after migration
+    """
+    migrations = MIGRATIONS if migrations is None else migrations
+    context = context or {}
+    with engine.begin() as connection:
+        version = get_schema_version(connection)
+        for target, description, steps in migrations:
+            if target <= version:
+                continue
+            start = time.perf_counter()
+            for step in steps:
+                if callable(step):
+                    step(connection, context)
+                else:
+                    connection.exec_driver_sql(step)
+            # PRAGMA does not accept bound parameters
+            connection.exec_driver_sql(f"PRAGMA user_version = {int(target)}")
+            version = target
+            logger.info(f"Schema migrated to v{target} ({description}) in {(time.perf_counter() - start) * 1000:.0f} ms")
+    return version
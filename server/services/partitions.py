@@ -0,0 +1,371 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Column, Index, MetaData, Table, func, select, text, union_all
+from sqlalchemy.orm import aliased
+
+logger = logging.getLogger(__name__)
+
+# Partition span and the strftime suffix of the partition table names
+GRANULARITIES = {
+    'hour': (timedelta(hours=1), '%Y%m%d%H'),
+    'day': (timedelta(days=1), '%Y%m%d'),
+}
+
+
+class PartitionManager:
+    """
+    Time-partitioned storage for append-only, timestamped tables.
+    Rows of a registered model are written to one table per hour (or day), named
+    after the model table plus the partition start (detection_p2024010112), and the
+    model table itself becomes a UNION ALL view over its partitions, so existing ORM
+    reads keep working unchanged. Ids are allocated here, globally, from a sequence table
+    updated in the writer's transaction: they stay unique across partitions and rows are
+    committed in id order, so the last allocated id (watermark()) is a sync cursor. Range
+    queries can be routed to the partitions they overlap only (source()), and retention
+    drops whole partitions instead of deleting rows.
+    Partitions must exist before rows are inserted: call ensure() outside of any write
+    transaction, then insert() inside it.
+    """
+
+    SEQUENCE_TABLE = 'partition_sequence'  # base table name -> next id
+    # SQLite refuses compound SELECTs of more than 500 terms (SQLITE_MAX_COMPOUND_SELECT):
+    # past that, the view is a UNION ALL of sub-views ({base}_v0, {base}_v1...) of at most
+    # as many partitions each
+    VIEW_MAX_ARMS = 500
+
+    def __init__(self, engine, granularity='hour'):
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"Unknown partition granularity: {granularity}")
+        self.engine = engine
+        self.granularity = granularity
+        self.span, self._suffix_format = GRANULARITIES[granularity]
+        self.metadata = MetaData()
+        self._models = {}  # base table name -> model
+        self._retention = {}  # base table name -> timedelta (None = kept forever)
+        self._partitions = {}  # base table name -> {partition start: Table}
+        self._sources = {}  # (base, partition starts) -> aliased model, reused so compiled statements are cached
+        self._lock = threading.RLock()
+
+    def register(self, model, retention=None):
+        """Partition the table of `model`, dropping partitions older than `retention`."""
+        base = model.__table__.name
+        self._models[base] = model
+        self._retention[base] = retention
+        self._partitions[base] = {}
+
+    # --- Naming and DDL ---
+
+    def _floor(self, timestamp):
+        """Start of the partition holding `timestamp` (naive UTC, as stored by SQLite)."""
+        if timestamp is None:
+            timestamp = datetime.now(timezone.utc)
+        if timestamp.tzinfo is not None:
+            timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+        if self.granularity == 'day':
+            return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+
+    def _partition_name(self, base, start):
+        return f"{base}_p{start.strftime(self._suffix_format)}"
+
+    def _parse_name(self, base, name):
+        """Partition start encoded in a table name, or None if it is not a partition of `base`."""
+        prefix = f"{base}_p"
+        if not name.startswith(prefix):
+            return None
+        try:
+            return datetime.strptime(name[len(prefix):], self._suffix_format)
+        except ValueError:
+            return None
+
+    def _table(self, base, start):
+        """Table object of a partition: the model columns and indexes, without foreign keys."""
+        name = self._partition_name(base, start)
+        table = self.metadata.tables.get(name)
+        if table is not None:
+            return table
+        model_table = self._models[base].__table__
+        table = Table(name, self.metadata, *[
+            Column(column.name, column.type, primary_key=column.primary_key,
+                   nullable=column.nullable, unique=column.unique)
+            for column in model_table.columns
+        ])
+        for index in model_table.indexes:
+            Index(index.name.replace(base, name, 1), *[table.c[column.name] for column in index.columns])
+        return table
+
+    def _base_type(self, connection, base):
+        return connection.exec_driver_sql(
+            "SELECT type FROM sqlite_master WHERE name = ?", (base,)
+        ).scalar()
+
+    def _refresh_view(self, connection, base, starts):
+        """(Re)create the view named after the model table over the given partitions."""
+        columns = ", ".join(f'"{column.name}"' for column in self._models[base].__table__.columns)
+        sources = [self._partition_name(base, start) for start in sorted(starts)]
+        connection.exec_driver_sql(f'DROP VIEW IF EXISTS "{base}"')
+        sub_views = connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'view' AND name LIKE ?", (f"{base}_v%",)
+        ).scalars().all()
+        for name in sub_views:
+            if name[len(base) + 2:].isdigit():
+                connection.exec_driver_sql(f'DROP VIEW "{name}"')
+        if len(sources) > self.VIEW_MAX_ARMS:
+            chunks = [sources[i:i + self.VIEW_MAX_ARMS] for i in range(0, len(sources), self.VIEW_MAX_ARMS)]
+            if len(chunks) > self.VIEW_MAX_ARMS:
+                raise ValueError(f"{len(sources)} {base} partitions: too many for one view, "
+                                 f"lower the retention or use a coarser granularity")
+            sources = []
+            for number, chunk in enumerate(chunks):
+                name = f"{base}_v{number}"
+                connection.exec_driver_sql(f'CREATE VIEW "{name}" AS ' + " UNION ALL ".join(
+                    f'SELECT {columns} FROM "{source}"' for source in chunk))
+                sources.append(name)
+        connection.exec_driver_sql(f'CREATE VIEW "{base}" AS ' + " UNION ALL ".join(
+            f'SELECT {columns} FROM "{source}"' for source in sources))
+
+    def _existing_starts(self, connection, base):
+        # '_' is a LIKE wildcard: the prefix is only a pre-filter, names are checked when parsed
+        names = connection.exec_driver_sql(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE ?", (f"{base}_p%",)
+        ).scalars()
+        return [start for start in (self._parse_name(base, name) for name in names) if start is not None]
+
+    # --- Lifecycle ---
+
+    def migrate_legacy(self, connection, base):
+        """
+        Move the rows of a plain (pre-partitioning) table into partitions and replace
+        the table by the view. Ids are kept. Does nothing if `base` is already a view.
+        """
+        if self._base_type(connection, base) != 'table':
+            return 0
+        model_table = self._models[base].__table__
+        hours = connection.execute(
+            select(func.strftime(self._suffix_format, model_table.c.timestamp)).distinct()
+        ).scalars().all()
+        starts = {datetime.strptime(hour, self._suffix_format) for hour in hours if hour is not None}
+        moved = 0
+        for start in sorted(starts):
+            table = self._table(base, start)
+            table.create(connection, checkfirst=True)
+            moved += connection.execute(table.insert().from_select(
+                [column.name for column in model_table.columns],
+                select(model_table).where(model_table.c.timestamp >= start,
+                                          model_table.c.timestamp < start + self.span)
+            )).rowcount
+        # Rows without timestamp go to the current partition
+        current = self._floor(None)
+        table = self._table(base, current)
+        table.create(connection, checkfirst=True)
+        moved += connection.execute(table.insert().from_select(
+            [column.name for column in model_table.columns],
+            select(model_table).where(model_table.c.timestamp.is_(None))
+        )).rowcount
+        starts.add(current)
+
+        connection.exec_driver_sql(f'DROP TABLE "{base}"')
+        self._refresh_view(connection, base, starts)
+        logger.info(f"Moved {moved} {base} rows into {len(starts)} partitions")
+        return moved
+
+    def load(self):
+        """Discover the existing partitions (call once the schema is migrated)."""
+        with self._lock, self.engine.begin() as connection:
+            connection.exec_driver_sql(
+                f'CREATE TABLE IF NOT EXISTS {self.SEQUENCE_TABLE} '
+                '(name VARCHAR(64) PRIMARY KEY, next_id INTEGER NOT NULL)'
+            )
+            for base in self._models:
+                starts = self._existing_starts(connection, base)
+                if not starts:
+                    starts = [self._floor(None)]
+                    self._table(base, starts[0]).create(connection, checkfirst=True)
+                    self._refresh_view(connection, base, starts)
+                self._partitions[base] = {start: self._table(base, start) for start in starts}
+                # Max of the per-partition maxima: each one is read from the primary key
+                max_id = connection.execute(select(func.max(*[
+                    func.coalesce(select(func.max(table.c.id)).scalar_subquery(), 0)
+                    for table in self._partitions[base].values()
+                ], 0))).scalar()
+                next_id = connection.execute(text(
+                    f'INSERT INTO {self.SEQUENCE_TABLE} (name, next_id) VALUES (:name, :next_id) '
+                    'ON CONFLICT(name) DO UPDATE SET next_id = max(next_id, excluded.next_id) RETURNING next_id'
+                ), {'name': base, 'next_id': max_id + 1}).scalar()
+                logger.info(f"{base}: {len(starts)} partitions, next id {next_id}")
+
+    def ensure(self, base, timestamps):
+        """
+        Create the partitions holding `timestamps` (in a transaction of their own). The
+        expired partitions are dropped first, so retention bounds the partition count
+        even if drop_expired() is never called otherwise.
+        """
+        missing = {self._floor(timestamp) for timestamp in timestamps} - set(self._partitions[base])
+        if not missing:
+            return
+        with self._lock:
+            missing -= set(self._partitions[base])
+            if not missing:
+                return
+            try:
+                self.drop_expired()
+            except Exception as e:
+                logger.warning(f"Dropping expired partitions failed: {e}")
+            with self.engine.begin() as connection:
+                for start in missing:
+                    self._table(base, start).create(connection, checkfirst=True)
+                self._refresh_view(connection, base, set(self._partitions[base]) | missing)
+            for start in missing:
+                self._partitions[base][start] = self._table(base, start)
+            self._sources.clear()
+            logger.info(f"Created {base} partitions: {sorted(self._partition_name(base, s) for s in missing)}")
+
+    def drop_expired(self, now=None):
+        """
+        Drop the partitions entirely older than the retention of their table.
+        Returns:
+            dict: Number of rows dropped per base table
+        """
+        now = datetime.now(timezone.utc) if now is None else now
+        dropped = {}
+        with self._lock:
+            for base, retention in self._retention.items():
+                dropped[base] = 0
+                if retention is None:
+                    continue
+                cutoff = self._floor(now - retention)
+                # The partition holding `now` always stays, the view needs at least one
+                expired = [start for start in self._partitions[base]
+                           if start + self.span <= cutoff and start != self._floor(now)]
+                if not expired:
+                    continue
+                with self.engine.begin() as connection:
+                    for start in expired:
+                        table = self._partitions[base][start]
+                        dropped[base] += connection.execute(select(func.count()).select_from(table)).scalar()
+                        table.drop(connection)
+                    self._refresh_view(connection, base, set(self._partitions[base]) - set(expired))
+                for start in expired:
+                    self.metadata.remove(self._partitions[base].pop(start))
+                self._sources.clear()
+                logger.info(f"Dropped {len(expired)} {base} partitions ({dropped[base]} rows)")
+        return dropped
+
+    # --- Reads and writes ---
+
+    def insert(self, connection, base, rows):
+        """
+        Insert rows (dicts of column values) into their partitions, on the caller's
+        connection and transaction. Rows without an id get one allocated: the sequence
+        update takes the database write lock, so ids are committed in increasing order.
+        """
+        given = [row['id'] for row in rows if row.get('id') is not None]
+        new = [row for row in rows if row.get('id') is None]
+        if new:
+            last = connection.execute(text(
+                f'UPDATE {self.SEQUENCE_TABLE} SET next_id = next_id + :count WHERE name = :name RETURNING next_id'
+            ), {'name': base, 'count': len(new)}).scalar()
+            for offset, row in enumerate(new):
+                row['id'] = last - len(new) + offset
+        if given:
+            connection.execute(text(
+                f'UPDATE {self.SEQUENCE_TABLE} SET next_id = max(next_id, :next_id) WHERE name = :name'
+            ), {'name': base, 'next_id': max(given) + 1})
+        groups = {}
+        with self._lock:
+            for row in rows:
+                start = self._floor(row.get('timestamp'))
+                table = self._partitions[base].get(start)
+                if table is None:
+                    raise LookupError(f"No {base} partition for {start}, call ensure() first")
+                groups.setdefault(table, []).append(row)
+        for table, group in groups.items():
+            connection.execute(table.insert(), group)
+
+    def delete(self, connection, base, before, where=None):
+        """
+        Delete the rows older than `before` matching `where` (a function of the partition
+        table returning a condition), visiting only the partitions starting before `before`.
+        Returns:
+            int: Number of deleted rows
+        """
+        deleted = 0
+        with self._lock:
+            tables = [(start, table) for start, table in self._partitions[base].items()
+                      if start <= self._floor(before)]
+        for start, table in tables:
+            statement = table.delete()
+            if start + self.span > self._floor(before):
+                statement = statement.where(table.c.timestamp < before)
+            if where is not None:
+                statement = statement.where(where(table))
+            deleted += connection.execute(statement).rowcount
+        return deleted
+
+    def source(self, model, since=None):
+        """
+        Entity to query `model` rows with a timestamp >= `since`: the model itself (the
+        view over every partition) or an alias over the overlapping partitions only.
+        The caller still filters on the timestamp.
+        """
+        base = model.__table__.name
+        if since is None:
+            return model
+        with self._lock:
+            starts = sorted(self._partitions[base])
+            relevant = self._overlapping(base, since)
+            if len(relevant) == len(starts) or len(relevant) > self.VIEW_MAX_ARMS:
+                return model  # Too many partitions for one compound SELECT: the view splits them
+            key = (base, tuple(relevant))
+            entity = self._sources.get(key)
+            if entity is None:
+                columns = [column.name for column in model.__table__.columns]
+                subquery = union_all(*[
+                    select(*[self._partitions[base][start].c[name] for name in columns]) for start in relevant
+                ]).subquery()
+                entity = self._sources[key] = aliased(model, subquery, adapt_on_names=True)
+            return entity
+
+    def count(self, base, since):
+        """
+        Number of rows with a timestamp >= `since`, as a sum of per-partition counts:
+        each one is answered from the timestamp index, which SQLite cannot do through
+        a UNION ALL subquery (every row would be produced, then counted).
+        """
+        with self._lock:
+            tables = [self._partitions[base][start] for start in self._overlapping(base, since)]
+        counts = [select(func.count()).select_from(table).where(table.c.timestamp >= since).scalar_subquery()
+                  for table in tables]
+        with self.engine.connect() as connection:
+            return connection.execute(select(sum(counts[1:], counts[0]))).scalar()
+
+    def watermark(self, base, connection=None):
+        """
+        Last committed id of `base`: the rows created since a watermark `w` are the
+        rows with id > w (ids are committed in order, see insert()).
+        """
+        statement = text(f'SELECT next_id - 1 FROM {self.SEQUENCE_TABLE} WHERE name = :name')
+        if connection is None:
+            with self.engine.connect() as connection:
+                return connection.execute(statement, {'name': base}).scalar() or 0
+        return connection.execute(statement, {'name': base}).scalar() or 0
+
+    def _overlapping(self, base, since):
+        """Starts of the partitions holding rows >= `since` (at least the newest one), in order."""
+        first = self._floor(since)
+        starts = sorted(self._partitions[base])
+        return [start for start in starts if start >= first] or starts[-1:]
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                base: {
+                    'partitions': len(partitions),
+                    'oldest': min(partitions).isoformat() if partitions else None,
+                    'newest': max(partitions).isoformat() if partitions else None,
+                    'watermark': self.watermark(base)
+                }
+                for base, partitions in self._partitions.items()
+            }
@@ -0,0 +1,27 @@
+import logging
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    """
+    Set the given PRAGMAs on a raw sqlite3 connection.
+    auto_vacuum goes first: on an empty database it must precede table creation.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for name in sorted(pragmas, key=lambda name: name != 'auto_vacuum'):
+            cursor.execute(f"PRAGMA {name} = {pragmas[name]}")
+    finally:
+        cursor.close()
+
+
+def register_sqlite_profile(engine, pragmas):
+    """Apply `pragmas` to every new connection of a SQLAlchemy engine."""
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
+
+    logger.info(f"SQLite profile registered: {pragmas}")
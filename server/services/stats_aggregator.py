@@ -0,0 +1,162 @@
+import logging
+import threading
+import time
+from datetime import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class _Bucket:
+    """Aggregated detections of one time slot."""
+    __slots__ = ('count', 'confidence_sum', 'speed_sum', 'speed_count', 'classes', 'objects')
+
+    def __init__(self):
+        self.count = 0
+        self.confidence_sum = 0.0
+        self.speed_sum = 0.0
+        self.speed_count = 0
+        self.classes = {}
+        self.objects = set()
+
+    def add(self, object_id, label, confidence, speed):
+        self.count += 1
+        self.confidence_sum += confidence
+        if speed is not None:
+            self.speed_sum += speed
+            self.speed_count += 1
+        self.classes[label] = self.classes.get(label, 0) + 1
+        self.objects.add(object_id)
+
+
+class StatisticsAggregator:
+    """
+    Rolling, pre-aggregated detection statistics.
+    Detections are folded into per-second buckets (kept `fine_seconds`) and
+    per-minute buckets (kept `retention_seconds`) as they are written, so a
+    time window is answered by merging at most a few hundred buckets instead
+    of loading every matching row from the database.
+    """
+
+    def __init__(self, fine_seconds=300, retention_seconds=24 * 3600):
+        self.fine_seconds = fine_seconds
+        self.retention_seconds = retention_seconds
+        self._seconds = {}  # epoch second -> _Bucket
+        self._minutes = {}  # epoch minute -> _Bucket
+        self._lock = threading.Lock()
+        self.total_detections = 0
+
+    @staticmethod
+    def _epoch(timestamp):
+        """Datetime -> epoch seconds. Naive datetimes (as read back from SQLite) are UTC."""
+        if timestamp is None:
+            return time.time()
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return timestamp.timestamp()
+
+    def _add(self, object_id, label, confidence, speed, timestamp):
+        epoch = self._epoch(timestamp)
+        second = int(epoch)
+        bucket = self._seconds.get(second)
+        if bucket is None:
+            bucket = self._seconds[second] = _Bucket()
+        bucket.add(object_id, label, confidence, speed)
+        minute = second // 60
+        bucket = self._minutes.get(minute)
+        if bucket is None:
+            bucket = self._minutes[minute] = _Bucket()
+        bucket.add(object_id, label, confidence, speed)
+        self.total_detections += 1
+
+    def _prune(self, now):
+        """Drop expired buckets (keys are inserted in mostly chronological order)."""
+        second_cutoff = int(now) - self.fine_seconds
+        while self._seconds:
+            oldest = next(iter(self._seconds))
+            if oldest >= second_cutoff:
+                break
+            del self._seconds[oldest]
+        minute_cutoff = (int(now) - self.retention_seconds) // 60
+        while self._minutes:
+            oldest = next(iter(self._minutes))
+            if oldest >= minute_cutoff:
+                break
+            del self._minutes[oldest]
+
+    def add_many(self, rows):
+        """
+        Fold written detections into the buckets.
+        Args:
+            rows: Iterable of dicts with object_id, label, confidence, speed and timestamp
+        """
+        with self._lock:
+            for row in rows:
+                self._add(row['object_id'], row['label'], row['confidence'], row.get('speed'), row.get('timestamp'))
+            self._prune(time.time())
+
+    def rebuild(self, rows, total_detections=0):
+        """
+        Reset the buckets from persisted detections.
+        Args:
+            rows: Iterable of (object_id, label, confidence, speed, timestamp) tuples in time order
+            total_detections (int): Number of detections stored in the database
+        """
+        with self._lock:
+            self._seconds.clear()
+            self._minutes.clear()
+            count = 0
+            for object_id, label, confidence, speed, timestamp in rows:
+                self._add(object_id, label, confidence, speed, timestamp)
+                count += 1
+            self._prune(time.time())
+            self.total_detections = max(total_detections, count)
+        logger.info(f"Statistics rebuilt from {count} detections")
+
+    def discard(self, count):
+        """Account for detections deleted by a cleanup (only older than the retention window)."""
+        with self._lock:
+            self.total_detections = max(0, self.total_detections - count)
+
+    def window(self, seconds, now=None):
+        """Statistics of the detections of the last `seconds` seconds."""
+        now = time.time() if now is None else now
+        start = now - seconds
+        with self._lock:
+            if seconds <= self.fine_seconds:
+                first = int(start)
+                buckets = [bucket for second, bucket in self._seconds.items() if second >= first]
+            else:
+                first = int(start) // 60
+                buckets = [bucket for minute, bucket in self._minutes.items() if minute >= first]
+
+            count = 0
+            confidence_sum = 0.0
+            speed_sum = 0.0
+            speed_count = 0
+            classes = {}
+            objects = set()
+            for bucket in buckets:
+                count += bucket.count
+                confidence_sum += bucket.confidence_sum
+                speed_sum += bucket.speed_sum
+                speed_count += bucket.speed_count
+                for label, label_count in bucket.classes.items():
+                    classes[label] = classes.get(label, 0) + label_count
+                objects |= bucket.objects
+
+        return {
+            'detection_count': count,
+            'unique_objects': len(objects),
+            'avg_confidence': confidence_sum / count if count else 0,
+            'avg_speed': speed_sum / speed_count if speed_count else 0,
+            'classes': classes,
+            'most_common_class': max(classes.items(), key=lambda x: x[1])[0] if classes else None
+        }
+
+    def get_stats(self):
+        with self._lock:
+            return {
+                'secondBuckets': len(self._seconds),
+                'minuteBuckets': len(self._minutes),
+                'totalDetections': self.total_detections
+            }
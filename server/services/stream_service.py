@@ -1,7 +1,10 @@
 import cv2
-from config.stream_config import STREAM_CONFIG, TCP_CONFIG
+from config.stream_config import FRAME_CHANNEL_CONFIG, STREAM_CONFIG, TCP_CONFIG
+import threading
 import time
 
+from services.frame_channel import RESULT, FrameChannelClient
+
 class StreamService:
     def __init__(self):
         self.last_frame_time = 0
@@ -20,13 +23,43 @@ class StreamService:
         self.last_frame_time = current_time
         return encoded_frame
 
-    def start_stream(self):
+    def start_stream(self, source, host, port=FRAME_CHANNEL_CONFIG['port'], stream_id=None, on_result=None):
+        """
+        Edge side of the frame channel (services/frame_channel.py): pushes the frames of
+        `source` (cv2.VideoCapture source) to the server at `host`:`port`, reconnecting
+        on connection errors. `on_result(seq, data)` receives the detections of each frame.
+        """
         retry_count = 0
         while retry_count < STREAM_CONFIG['tcp_retry_attempts']:
+            cap = cv2.VideoCapture(source)
+            client = None
             try:
-                # Stream implementation
-                # ...existing code...
-                pass
-            except ConnectionError:
+                client = FrameChannelClient(host, port, stream_id=stream_id, timeout=STREAM_CONFIG['tcp_timeout'])
+                retry_count = 0
+                # Answers are read on their own thread, frames are sent without waiting for them
+                threading.Thread(target=self._receive_results, args=(client, on_result), daemon=True).start()
+                while cap.isOpened():
+                    ret, frame = cap.read()
+                    if not ret:
+                        return
+                    encoded_frame = self.process_frame(frame)
+                    if encoded_frame is not None:
+                        client.send(encoded_frame.tobytes())
+                return
+            except (ConnectionError, OSError):
                 retry_count += 1
-                time.sleep(TCP_CONFIG['reconnect_delay'])
\ No newline at end of file
+                time.sleep(TCP_CONFIG['reconnect_delay'])
+            finally:
+                cap.release()
+                if client is not None:
+                    client.close()
+
+    @staticmethod
+    def _receive_results(client, on_result):
+        try:
+            while True:
+                kind, seq, _, data = client.receive()
+                if kind == RESULT and on_result is not None:
+                    on_result(seq, data)
+        except (ConnectionError, OSError):
+            pass
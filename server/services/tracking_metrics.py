@@ -0,0 +1,216 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Offsets (dt, dx, dy) of a cell and of half of its 26 neighbors: the other half is
+# covered by symmetry, when the neighbor cell is the one being scanned
+_NEIGHBOR_OFFSETS = [(dt, dx, dy) for dt in (-1, 0, 1) for dx in (-1, 0, 1) for dy in (-1, 0, 1)][13:]
+
+
+class TrackingMetricsCalculator:
+    """
+    Tracking quality metrics computed from the stored trajectories.
+    Lifetimes come from one grouped count, point geometry from a single ordered
+    scan of trajectory_point, and the ID-switch heuristic (two trajectories of the
+    same label passing within `switch_distance` pixels and `switch_time` seconds of
+    each other) is a grid join on (time, x, y) cells of those sizes followed by an
+    exact check of the candidate pairs. Results are cached for `ttl_seconds`.
+    """
+
+    MAX_PAIRS_PER_CHUNK = 2_000_000  # Bounds the memory of the exact pair check
+
+    def __init__(self, db, trajectory_model, point_model, ttl_seconds=30,
+                 switch_distance=50, switch_time=1.0):
+        self.db = db
+        self.Trajectory = trajectory_model
+        self.TrajectoryPoint = point_model
+        self.ttl_seconds = ttl_seconds
+        self.switch_distance = switch_distance
+        self.switch_time = switch_time
+        self._lock = threading.Lock()
+        self._cached = None
+        self._cached_at = 0.0
+        self.last_compute_ms = 0.0
+        # Points already read from the database, kept between refreshes
+        self._point_arrays = None
+        self._label_ids = {}
+
+    def get(self):
+        """Cached metrics, recomputed at most once every `ttl_seconds` (needs an app context)."""
+        with self._lock:
+            if self._cached is None or time.monotonic() - self._cached_at >= self.ttl_seconds:
+                start = time.perf_counter()
+                self._cached = self.compute()
+                self._cached_at = time.monotonic()
+                self.last_compute_ms = (time.perf_counter() - start) * 1000
+                logger.debug(f"Tracking metrics computed in {self.last_compute_ms:.1f} ms")
+            return dict(self._cached)
+
+    def invalidate(self):
+        with self._lock:
+            self._cached = None
+
+    def _fetch_points(self, after_id=0):
+        """
+        Points with an id above `after_id`, as arrays (id, trajectory_id, label, x, y, t).
+        Timestamps are converted to seconds in SQL to avoid parsing datetimes in Python.
+        """
+        Trajectory, TrajectoryPoint = self.Trajectory, self.TrajectoryPoint
+        rows = (
+            self.db.session.query(
+                TrajectoryPoint.id,
+                TrajectoryPoint.trajectory_id,
+                Trajectory.label,
+                TrajectoryPoint.x,
+                TrajectoryPoint.y,
+                self.db.func.julianday(TrajectoryPoint.timestamp) * 86400.0
+            )
+            .join(Trajectory, Trajectory.id == TrajectoryPoint.trajectory_id)
+            .filter(TrajectoryPoint.id > after_id)
+            .order_by(TrajectoryPoint.id)
+            .all()
+        )
+        if not rows:
+            return None
+        point_ids, trajectory_ids, labels, xs, ys, ts = zip(*rows)
+        label_ids = np.array([self._label_ids.setdefault(label, len(self._label_ids)) for label in labels],
+                             dtype=np.int64)
+        return (np.array(point_ids, dtype=np.int64), np.array(trajectory_ids, dtype=np.int64), label_ids,
+                np.array(xs, dtype=np.float64), np.array(ys, dtype=np.float64), np.array(ts, dtype=np.float64))
+
+    def _points(self):
+        """
+        All points ordered by trajectory then time. Only points added since the previous
+        call are read; everything is reloaded when rows were deleted (cleanup).
+        """
+        TrajectoryPoint = self.TrajectoryPoint
+        count, max_id = self.db.session.query(
+            self.db.func.count(TrajectoryPoint.id), self.db.func.max(TrajectoryPoint.id)
+        ).one()
+        cached = self._point_arrays
+        new = self._fetch_points(int(cached[0][-1])) if cached is not None and max_id else None
+        if cached is not None and len(cached[0]) + (len(new[0]) if new else 0) == count:
+            if new:
+                # Arrays stay in id order, so the last id is where the next refresh resumes
+                cached = [np.concatenate([old, added]) for old, added in zip(cached, new)]
+        else:
+            cached = self._fetch_points() if count else None
+        self._point_arrays = cached
+        if cached is None:
+            return None
+        order = np.lexsort((cached[5], cached[1]))
+        return tuple(column[order] for column in cached[1:])
+
+    @staticmethod
+    def _step_distances(trajectory_ids, xs, ys):
+        """Distances between consecutive points of the same trajectory."""
+        same = trajectory_ids[1:] == trajectory_ids[:-1]
+        return np.hypot(np.diff(xs), np.diff(ys))[same]
+
+    def _id_switches(self, trajectory_ids, label_ids, xs, ys, ts):
+        """Number of same-label trajectory pairs having two points close in space and time."""
+        cx = np.floor(xs / self.switch_distance).astype(np.int64)
+        cy = np.floor(ys / self.switch_distance).astype(np.int64)
+        ct = np.floor((ts - ts.min()) / self.switch_time).astype(np.int64)
+        cx -= cx.min() - 1
+        cy -= cy.min() - 1
+        # Encode (label, t, x, y) cells as one integer; the margin of 1 keeps neighbors in range
+        kx, ky, kt = int(cx.max()) + 2, int(cy.max()) + 2, int(ct.max()) + 3
+        if float(label_ids.max() + 1) * kt * kx * ky >= 2 ** 62:
+            raise OverflowError("Trajectory point extent too large for the switch grid")
+        cells = ((label_ids * kt + ct + 1) * kx + cx) * ky + cy
+
+        # One entry per (trajectory, cell): candidate pairs are searched between these
+        order = np.lexsort((cells, trajectory_ids))
+        traj_sorted, cells_sorted = trajectory_ids[order], cells[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (traj_sorted[1:] != traj_sorted[:-1]) | (cells_sorted[1:] != cells_sorted[:-1])
+        starts = np.flatnonzero(first)
+        ends = np.append(starts[1:], len(order))
+        entry_traj, entry_cell = traj_sorted[starts], cells_sorted[starts]
+
+        by_cell = np.argsort(entry_cell, kind='stable')
+        sorted_cells = entry_cell[by_cell]
+        candidates = []
+        for dt, dx, dy in _NEIGHBOR_OFFSETS:
+            # Queries are sorted too, which keeps the binary searches cache friendly
+            shifted = sorted_cells + (dt * kx + dx) * ky + dy
+            lo = np.searchsorted(sorted_cells, shifted, side='left')
+            hi = np.searchsorted(sorted_cells, shifted, side='right')
+            counts = hi - lo
+            if not counts.any():
+                continue
+            a = by_cell[np.repeat(np.arange(len(sorted_cells)), counts)]
+            # Position of each match inside its [lo, hi) range of sorted cells
+            within = np.arange(len(a)) - np.repeat(np.cumsum(counts) - counts, counts)
+            b = by_cell[np.repeat(lo, counts) + within]
+            if (dt, dx, dy) == (0, 0, 0):
+                keep = entry_traj[a] < entry_traj[b]
+            else:
+                keep = entry_traj[a] != entry_traj[b]
+            a, b = a[keep], b[keep]
+            # Lower trajectory id first, so each pair is counted once
+            swap = entry_traj[a] > entry_traj[b]
+            a[swap], b[swap] = b[swap], a[swap].copy()
+            candidates.append(np.column_stack((a, b)))
+        if not candidates:
+            return 0
+
+        candidates = np.concatenate(candidates)
+
+        # Exact check: expand candidate entry pairs into point pairs, in bounded chunks
+        sizes = (ends - starts)[candidates[:, 0]] * (ends - starts)[candidates[:, 1]]
+        chunk_ids = (np.cumsum(sizes) - 1) // self.MAX_PAIRS_PER_CHUNK
+        bounds = [0] + (np.flatnonzero(np.diff(chunk_ids)) + 1).tolist() + [len(candidates)]
+        id_span = int(trajectory_ids.max()) + 1
+        switches = set()
+        for chunk_start, chunk_end in zip(bounds[:-1], bounds[1:]):
+            a, b = candidates[chunk_start:chunk_end, 0], candidates[chunk_start:chunk_end, 1]
+            na, nb = ends[a] - starts[a], ends[b] - starts[b]
+            counts = na * nb
+            pair = np.repeat(np.arange(len(a)), counts)
+            k = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+            pa = order[starts[a][pair] + k // nb[pair]]
+            pb = order[starts[b][pair] + k % nb[pair]]
+            close = ((np.abs(ts[pa] - ts[pb]) < self.switch_time)
+                     & (np.hypot(xs[pa] - xs[pb], ys[pa] - ys[pb]) < self.switch_distance))
+            switches.update(np.unique(trajectory_ids[pa[close]] * id_span + trajectory_ids[pb[close]]).tolist())
+        return len(switches)
+
+    def compute(self):
+        points = self._points()
+        trajectories = self.db.session.query(self.Trajectory.id, self.Trajectory.is_active).all()
+        trajectory_ids = np.array([trajectory_id for trajectory_id, _ in trajectories], dtype=np.int64)
+        active_trajectories = sum(1 for _, is_active in trajectories if is_active)
+
+        # Lifetime = number of points of each trajectory (0 for trajectories without points)
+        lifetimes = np.zeros(len(trajectory_ids), dtype=np.int64)
+        if points is not None and len(trajectory_ids):
+            ids, counts = np.unique(points[0], return_counts=True)
+            sorter = np.argsort(trajectory_ids)
+            positions = sorter[np.searchsorted(trajectory_ids, ids, sorter=sorter).clip(max=len(sorter) - 1)]
+            found = trajectory_ids[positions] == ids
+            lifetimes[positions[found]] = counts[found]
+
+        total_tracks = len(lifetimes)
+        metrics = {
+            'fragmentationRate': float((lifetimes < 10).sum() / total_tracks) if total_tracks else 0,
+            'persistenceScore': float((lifetimes > 60).sum() / total_tracks) if total_tracks else 0,
+            'avgTrackLifetime': float(lifetimes.mean()) if total_tracks else 0,
+            'medianTrackLifetime': float(np.median(lifetimes)) if total_tracks else 0,
+            'totalTracks': total_tracks,
+            'active_trajectories': active_trajectories,
+            'idSwitches': 0,
+            'MOTP': 0.0
+        }
+        if points is not None:
+            point_trajectories, label_ids, xs, ys, ts = points
+            steps = self._step_distances(point_trajectories, xs, ys)
+            # MOTP: mean "dispersion" between consecutive points of a trajectory
+            metrics['MOTP'] = float(steps.mean()) if len(steps) else 0.0
+            metrics['idSwitches'] = self._id_switches(point_trajectories, label_ids, xs, ys, ts)
+        return metrics
@@ -0,0 +1,297 @@
+import hashlib
+import json
+import logging
+import math
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import shapely
+import shapely.geometry
+
+from services.zone_index import ZoneIndex
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_M = 6378137.0
+MAX_LATITUDE = 85.0511287798  # Limit of the web mercator tiles
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS zone_tile (
+    layer TEXT NOT NULL, zoom INTEGER NOT NULL, x INTEGER NOT NULL, y INTEGER NOT NULL,
+    fetched_at REAL NOT NULL, source TEXT NOT NULL,
+    PRIMARY KEY (layer, zoom, x, y)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS zone_geometry (
+    layer TEXT NOT NULL, zoom INTEGER NOT NULL, x INTEGER NOT NULL, y INTEGER NOT NULL,
+    zone_id TEXT NOT NULL, wkb BLOB NOT NULL,
+    PRIMARY KEY (layer, zoom, x, y, zone_id)
+) WITHOUT ROWID;
+"""
+
+
+# --- Slippy map tiles (z/x/y, as the OSM tile servers) ---
+def tile_of(lat, lon, zoom):
+    """(x, y) of the tile holding a point."""
+    n = 2 ** zoom
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    x = int((lon + 180.0) / 360.0 * n)
+    y = int((1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def tile_bounds(x, y, zoom):
+    """(west, south, east, north) of a tile, in degrees."""
+    n = 2 ** zoom
+
+    def latitude(row):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, latitude(y + 1), (x + 1) / n * 360.0 - 180.0, latitude(y)
+
+
+def tiles_in_bounds(west, south, east, north, zoom):
+    """Tiles intersecting a lon/lat box."""
+    x_min, y_min = tile_of(north, west, zoom)
+    x_max, y_max = tile_of(south, east, zoom)
+    return [(x, y) for x in range(x_min, x_max + 1) for y in range(y_min, y_max + 1)]
+
+
+def tiles_around(lat, lon, radius_m, zoom):
+    """Tiles intersecting the box of `radius_m` meters around a point."""
+    dlat = math.degrees(radius_m / EARTH_RADIUS_M)
+    dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    return tiles_in_bounds(lon - dlon, lat - dlat, lon + dlon, lat + dlat, zoom)
+
+
+def zone_id_of(geometry):
+    """Stable id of a geometry without source id (same shape -> same id)."""
+    return 'wkb/' + hashlib.sha1(shapely.to_wkb(geometry)).hexdigest()
+
+
+class ZoneCache:
+    """
+    On-disk cache of zone polygons (OSM military areas...) keyed by map tile, so alerts
+    keep working offline and follow the rover. Polygons are stored as WKB in a SQLite
+    file, once per tile they intersect, and tiles are loaded lazily around the rover:
+    memory (LRU of `max_tiles` tiles) -> SQLite file -> `fetch` (network), the fetched
+    tiles being written back to the file. A tile that fails to fetch is served from
+    the file if present (even older than `max_age_days`), else as empty, and retried
+    after `retry_seconds`.
+    Args:
+        fetch: Called with (layer, (west, south, east, north)), returns the
+            (zone_id, geometry) of the zones of the box; None = offline only
+    """
+
+    def __init__(self, path, zoom=12, max_tiles=256, fetch=None, max_age_days=30, retry_seconds=300):
+        self.path = path
+        self.zoom = zoom
+        self.max_tiles = max_tiles
+        self.fetch = fetch
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self.retry_seconds = retry_seconds
+        self._tiles = OrderedDict()  # (layer, x, y) -> [(zone_id, geometry)], least recently used first
+        self._failed = {}  # (layer, x, y) -> time of the last failed fetch
+        self._index_key = None
+        self._index = ZoneIndex()
+        self._lock = threading.RLock()
+        self._connection = None
+
+        # Statistics
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.fetches = 0
+        self.fetch_errors = 0
+
+    def _db(self):
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)  # Used under self._lock
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    def index(self, lat, lon, radius_m, layer='military'):
+        """
+        ZoneIndex of the zones of the tiles within `radius_m` meters of a point. Rebuilt
+        only when that set of tiles changes, i.e. when the rover moves to another tile.
+        """
+        tiles = tiles_around(lat, lon, radius_m, self.zoom)
+        key = (layer, tuple(tiles))
+        with self._lock:
+            if key == self._index_key:
+                return self._index
+            zones = {}
+            for x, y in tiles:
+                for zone_id, geometry in self._tile(layer, x, y):
+                    zones[zone_id] = geometry  # Zones spanning several tiles are indexed once
+            self._index = ZoneIndex(zones.values())
+            # Kept for the next calls only once every tile is loaded, else failed tiles are retried
+            self._index_key = key if not any((layer, x, y) in self._failed for x, y in tiles) else None
+            return self._index
+
+    def _tile(self, layer, x, y):
+        key = (layer, x, y)
+        zones = self._tiles.get(key)
+        if zones is not None:
+            self._tiles.move_to_end(key)
+            self.memory_hits += 1
+            return zones
+        zones, fetched_at = self._read(layer, x, y)
+        if fetched_at is not None:
+            self.disk_hits += 1
+        now = time.time()
+        stale = fetched_at is None or (self.max_age is not None and now - fetched_at > self.max_age)
+        if stale and self.fetch is not None and now - self._failed.get(key, 0) >= self.retry_seconds:
+            try:
+                self.fetches += 1
+                zones = list(self.fetch(layer, tile_bounds(x, y, self.zoom)))
+                self._write(layer, [(x, y)], zones, 'fetch')
+                self._failed.pop(key, None)
+            except Exception as e:
+                self.fetch_errors += 1
+                self._failed[key] = now
+                logger.warning(f"Zone cache: fetching tile {self.zoom}/{x}/{y} failed, "
+                               f"{'cached' if fetched_at is not None else 'no'} zones used: {e}")
+        if key in self._failed:
+            return zones  # Not kept in memory, so it is fetched again after retry_seconds
+        self._tiles[key] = zones
+        while len(self._tiles) > self.max_tiles:
+            self._tiles.popitem(last=False)
+        return zones
+
+    def _read(self, layer, x, y):
+        """(zones, fetched_at) of a tile in the file; fetched_at is None for an unknown tile."""
+        db = self._db()
+        row = db.execute("SELECT fetched_at FROM zone_tile WHERE layer = ? AND zoom = ? AND x = ? AND y = ?",
+                         (layer, self.zoom, x, y)).fetchone()
+        if row is None:
+            return [], None
+        rows = db.execute("SELECT zone_id, wkb FROM zone_geometry WHERE layer = ? AND zoom = ? AND x = ? AND y = ?",
+                          (layer, self.zoom, x, y)).fetchall()
+        geometries = shapely.from_wkb([wkb for _, wkb in rows])
+        return [(zone_id, geometry) for (zone_id, _), geometry in zip(rows, geometries)], row[0]
+
+    def _write(self, layer, tiles, zones, source):
+        """Replace the zones of `tiles` by those of `zones` intersecting each tile."""
+        if zones:
+            bounds = shapely.bounds([geometry for _, geometry in zones])
+            wkbs = shapely.to_wkb([geometry for _, geometry in zones])
+        now = time.time()
+        with self._lock:
+            db = self._db()
+            with db:
+                for x, y in tiles:
+                    db.execute("DELETE FROM zone_geometry WHERE layer = ? AND zoom = ? AND x = ? AND y = ?",
+                               (layer, self.zoom, x, y))
+                    db.execute("INSERT OR REPLACE INTO zone_tile VALUES (?, ?, ?, ?, ?, ?)",
+                               (layer, self.zoom, x, y, now, source))
+                    self._tiles.pop((layer, x, y), None)
+                if zones:
+                    db.executemany(
+                        "INSERT OR REPLACE INTO zone_geometry VALUES (?, ?, ?, ?, ?, ?)",
+                        ((layer, self.zoom, x, y, zone_id, wkb)
+                         for (zone_id, _), wkb, box in zip(zones, wkbs, bounds)
+                         for x, y in tiles_in_bounds(*box, self.zoom) if (x, y) in tiles))
+            self._index_key = None
+
+    def import_zones(self, zones, layer='military', bounds=None):
+        """
+        Store zones loaded from a local file. The tiles of `bounds` (west, south, east,
+        north: extent of the file) are marked as known, including those without zones,
+        so they are served offline; without bounds, only the tiles of the zones are.
+        Returns:
+            int: Number of tiles written
+        """
+        zones = [(zone_id, geometry) for zone_id, geometry in zones if geometry is not None]
+        tiles = set(tiles_in_bounds(*bounds, self.zoom)) if bounds is not None else set()
+        for box in shapely.bounds([geometry for _, geometry in zones]) if zones else ():
+            tiles.update(tiles_in_bounds(*box, self.zoom))
+        with self._lock:
+            # Zones already stored in these tiles (another file, a fetch) are kept, the imported ones win
+            stored = []
+            for x, y in tiles:
+                stored.extend(self._read(layer, x, y)[0])
+            self._write(layer, tiles, list(dict(stored + zones).items()), 'import')
+        return len(tiles)
+
+    def get_stats(self):
+        with self._lock:
+            tiles = self._db().execute("SELECT count(*) FROM zone_tile").fetchone()[0]
+            return {
+                'tilesOnDisk': tiles,
+                'tilesInMemory': len(self._tiles),
+                'zonesIndexed': len(self._index),
+                'memoryHits': self.memory_hits,
+                'diskHits': self.disk_hits,
+                'fetches': self.fetches,
+                'fetchErrors': self.fetch_errors
+            }
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+# --- Local files ---
+def _matches(tags, wanted):
+    return all(tags.get(key) == value for key, value in (wanted or {}).items())
+
+
+def read_geojson(path, tags=None):
+    """(zone_id, geometry) of the polygon features of a GeoJSON file whose properties match `tags`."""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    features = data['features'] if data.get('type') == 'FeatureCollection' else [data]
+    for feature in features:
+        properties = feature.get('properties') or {}
+        if not feature.get('geometry') or not _matches(properties, tags):
+            continue
+        geometry = shapely.geometry.shape(feature['geometry'])
+        if geometry.geom_type not in ('Polygon', 'MultiPolygon'):
+            continue
+        source_id = feature.get('id') or properties.get('@id') or properties.get('osm_id')
+        yield (str(source_id) if source_id is not None else zone_id_of(geometry)), geometry
+
+
+def read_osm(path, tags=None):
+    """
+    (zone_id, geometry) of the areas (closed ways, multipolygons) of an .osm/.osm.pbf
+    file whose tags match `tags`. Requires pyosmium (pip install osmium).
+    """
+    try:
+        import osmium
+    except ImportError:
+        raise ImportError("Reading .osm/.pbf files requires pyosmium: pip install osmium")
+
+    wkb_factory = osmium.geom.WKBFactory()
+    zones = []
+
+    class AreaHandler(osmium.SimpleHandler):
+        def area(self, area):
+            if not _matches(area.tags, tags):
+                return
+            try:
+                geometry = shapely.from_wkb(wkb_factory.create_multipolygon(area))  # Hex WKB
+            except RuntimeError:
+                return  # Broken ring in the extract
+            # Areas from ways have even ids, from relations odd ones
+            zones.append((f"{'way' if area.from_way() else 'relation'}/{area.orig_id()}", geometry))
+
+    AreaHandler().apply_file(path, locations=True)
+    return zones
+
+
+def osm_file_bounds(path):
+    """(west, south, east, north) of the bounding box in the header of an .osm/.pbf file, or None."""
+    import osmium
+    reader = osmium.io.Reader(path, osmium.osm.osm_entity_bits.NOTHING)
+    try:
+        box = reader.header().box()
+    finally:
+        reader.close()
+    if not box.valid():
+        return None
+    return box.bottom_left.lon, box.bottom_left.lat, box.top_right.lon, box.top_right.lat
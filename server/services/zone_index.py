@@ -0,0 +1,48 @@
+import logging
+
+import numpy as np
+import shapely
+
+logger = logging.getLogger(__name__)
+
+
+class ZoneIndex:
+    """
+    Zone polygons in an STRtree, for point-in-zone tests over many points at once.
+    Geometries are checked once at load (missing, empty or invalid ones are left out,
+    as the former per-point scan did) and prepared, so each containment test only runs
+    against the polygons whose bounding box holds the point.
+    """
+
+    def __init__(self, geometries=()):
+        geometries = np.asarray([g for g in geometries if g is not None], dtype=object)
+        valid = shapely.is_valid(geometries) & ~shapely.is_empty(geometries) if len(geometries) else \
+            np.zeros(0, dtype=bool)
+        if not valid.all():
+            logger.warning(f"Zone index: {int((~valid).sum())} invalid geometries ignored")
+        self.geometries = geometries[valid]
+        shapely.prepare(self.geometries)
+        self.tree = shapely.STRtree(self.geometries)
+
+    def __len__(self):
+        return len(self.geometries)
+
+    def contains(self, lons, lats):
+        """
+        Args:
+            lons, lats: Point coordinates (arrays of the same length)
+        Returns:
+            np.ndarray: For each point, whether a zone contains it (bool)
+        """
+        points = shapely.points(np.asarray(lons, dtype=np.float64), np.asarray(lats, dtype=np.float64))
+        inside = np.zeros(len(points), dtype=bool)
+        if not len(self.geometries) or not len(points):
+            return inside
+        # Bounding-box candidates from the tree, then the exact test on the prepared zones
+        point_index, zone_index = self.tree.query(points)
+        hits = shapely.contains(self.geometries[zone_index], points[point_index])
+        inside[point_index[hits]] = True
+        return inside
+
+    def contains_point(self, lat, lon):
+        return bool(self.contains([lon], [lat])[0])
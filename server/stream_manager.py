@@ -0,0 +1,269 @@
+"""
+stream_manager.py - Concurrent processing of several camera streams.
+Each source has its own capture thread, tracker and post-processing/encode
+pipeline, while a single inference worker gathers the latest frame of every
+stream into a batch and runs one model call for all of them.
+"""
+
+import threading
+import time
+
+from bytetrack_tracker import ByteTracker
+from stream_pipeline import FrameBroadcaster, FramePacer, StreamPipeline
+
+# Track ids of stream n start at n * STREAM_ID_SPACING + 1 so that object_ids stay unique in the database
+STREAM_ID_SPACING = 1_000_000
+
+
+class CameraStream:
+    """State of one camera source managed by MultiStreamManager."""
+
+    def __init__(self, stream_id, source, index, manager):
+        self.stream_id = stream_id
+        self.source = source
+        self.manager = manager
+        self.detector = manager.detector
+        self.tracker = ByteTracker(track_thresh=0.5, track_buffer=30, match_thresh=0.8,
+                                   id_offset=index * STREAM_ID_SPACING)
+        self.broadcaster = FrameBroadcaster()  # Latest encoded JPEG, shared by all viewers
+        self.pending = None  # Latest captured frame waiting for the inference worker
+        self.pending_dropped = 0
+        self.is_running = False
+        self.fps = 0
+        self.frames_read = 0
+        self.end_to_end_latency_ms = 0
+        self._frame_times = []
+        self._thread = None
+        self.pipeline = StreamPipeline(
+            [
+                ('tracking', self._tracking_stage),
+                ('encode', self._encode_stage),
+            ],
+            output_queue=self.broadcaster,
+            queue_size=2
+        )
+
+    def start(self):
+        self.is_running = True
+        self.pipeline.start()
+        self._thread = threading.Thread(target=self._capture_loop, name=f"capture-{self.stream_id}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.is_running = False
+        self.pipeline.stop()
+        self.broadcaster.close()
+
+    def _capture_loop(self):
+        cap = None
+        try:
+            cap = self.detector._open_capture(self.source)
+            pacer = FramePacer.for_capture(cap, self.source)
+            frame_number = 0
+            while self.is_running:
+                pacer.wait()
+                ret, frame = cap.read()
+                if not ret:
+                    cap = self.detector._recover_capture(cap, self.source)
+                    continue
+                frame_number += 1
+                self.frames_read += 1
+                self.manager._submit(self, {
+                    'frame': frame,
+                    'frame_number': frame_number,
+                    'captured_at': time.time()
+                })
+        except Exception as e:
+            self.manager._log(f"❌ Stream {self.stream_id} error: {e}")
+        finally:
+            if cap is not None and cap.isOpened():
+                cap.release()
+            self.is_running = False
+
+    def _tracking_stage(self, packet):
+        detections = self.detector._postprocess(packet['frame'], packet['results'], tracker=self.tracker,
+                                                stream_id=self.stream_id, captured_at=packet['captured_at'])
+        packet['results'] = None
+        self.detector._annotate(packet['frame'], detections)
+        packet['detections'] = self.detector._strip_internal_fields(detections)
+        return packet
+
+    def _encode_stage(self, packet):
+        jpeg = self.detector._encode(packet['frame'])
+        if jpeg is None:
+            return None
+        now = time.time()
+        self._frame_times = (self._frame_times + [now])[-20:]
+        if len(self._frame_times) > 1:
+            time_diff = self._frame_times[-1] - self._frame_times[0]
+            self.fps = (len(self._frame_times) - 1) / time_diff if time_diff > 0 else 0
+        self.end_to_end_latency_ms = (now - packet['captured_at']) * 1000
+        return jpeg
+
+    def generate_frames(self):
+        """Yields multipart JPEG chunks for an MJPEG response."""
+        for jpeg in self.broadcaster.frames(lambda: self.is_running):
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+
+    def get_info(self):
+        return {
+            'stream_id': self.stream_id,
+            'source': self.source,
+            'is_running': self.is_running,
+            'fps': self.fps,
+            'framesRead': self.frames_read,
+            'pendingDropped': self.pending_dropped,
+            'endToEndLatencyMs': self.end_to_end_latency_ms,
+            'activeTracks': len(self.tracker.tracks),
+            'pipeline': self.pipeline.get_metrics(),
+            'output': self.broadcaster.get_metrics()
+        }
+
+
+class MultiStreamManager:
+    """
+    Runs several camera streams against one YOLODetector model.
+    Args:
+        detector: YOLODetector providing the model, post-processing and encoding
+        max_batch (int): Maximum number of frames per model call
+        max_wait_ms (float): How long the worker waits to fill a batch after the first frame
+        enable_logs (bool): Print diagnostic messages
+    """
+
+    def __init__(self, detector, max_batch=4, max_wait_ms=15, enable_logs=False):
+        self.detector = detector
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self.enable_logs = enable_logs
+        self.streams = {}
+        self._stream_count = 0
+        self._cond = threading.Condition()
+        self._worker = None
+        self._running = False
+
+        # Batch statistics
+        self.batches = 0
+        self.frames_inferred = 0
+        self.avg_batch_size = 0.0
+        self.batch_latency_ms = 0.0
+
+    def _log(self, message):
+        if self.enable_logs:
+            print(message)
+
+    def start_stream(self, source, stream_id=None):
+        """Starts capturing `source`. Returns the stream id."""
+        with self._cond:
+            self._stream_count += 1
+            stream_id = stream_id or f"cam{self._stream_count}"
+            if stream_id in self.streams:
+                raise ValueError(f"Stream '{stream_id}' already exists")
+            stream = CameraStream(stream_id, source, self._stream_count, self)
+            self.streams[stream_id] = stream
+        self._ensure_worker()
+        stream.start()
+        self._log(f"▶️ Stream {stream_id} started: {source}")
+        return stream_id
+
+    def create_tracker(self):
+        """Tracker of an external source (frame channel), its track ids distinct from every stream's."""
+        with self._cond:
+            self._stream_count += 1
+            index = self._stream_count
+        return ByteTracker(track_thresh=0.5, track_buffer=30, match_thresh=0.8, id_offset=index * STREAM_ID_SPACING)
+
+    def stop_stream(self, stream_id):
+        with self._cond:
+            stream = self.streams.pop(stream_id, None)
+        if stream is None:
+            return False
+        stream.stop()
+        self._log(f"🛑 Stream {stream_id} stopped")
+        return True
+
+    def stop_all(self):
+        for stream_id in list(self.streams):
+            self.stop_stream(stream_id)
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+
+    def get_stream(self, stream_id):
+        return self.streams.get(stream_id)
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        self._running = True
+        self._worker = threading.Thread(target=self._inference_loop, name="multi-stream-inference", daemon=True)
+        self._worker.start()
+
+    def _submit(self, stream, packet):
+        """Called by capture threads: keep only the latest frame of each stream."""
+        with self._cond:
+            if stream.pending is not None:
+                stream.pending_dropped += 1
+            stream.pending = packet
+            self._cond.notify()
+
+    def _pending_streams(self):
+        return [stream for stream in self.streams.values() if stream.pending is not None]
+
+    def _collect_batch(self):
+        """Wait for a first frame, then up to max_wait_ms for others, up to max_batch frames."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._pending_streams() or not self._running, timeout=0.5):
+                return []
+            deadline = time.monotonic() + self.max_wait_ms / 1000
+            while len(self._pending_streams()) < min(self.max_batch, len(self.streams)):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._running:
+                    break
+                self._cond.wait(remaining)
+            # Oldest frames first so no stream starves when there are more streams than batch slots
+            ready = sorted(self._pending_streams(), key=lambda s: s.pending['captured_at'])[:self.max_batch]
+            batch = []
+            for stream in ready:
+                batch.append((stream, stream.pending))
+                stream.pending = None
+            return batch
+
+    def _inference_loop(self):
+        while self._running:
+            batch = self._collect_batch()
+            if not batch:
+                continue
+            frames = [packet['frame'] for _, packet in batch]
+            start = time.perf_counter()
+            try:
+                if self.detector.model is not None:
+                    results = self.detector._run_inference_batch(frames)
+                else:
+                    results = [[] for _ in frames]
+            except Exception as e:
+                self._log(f"❌ Batched inference error: {e}")
+                continue
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            self.batches += 1
+            self.frames_inferred += len(frames)
+            self.avg_batch_size = len(frames) if self.batches == 1 else 0.9 * self.avg_batch_size + 0.1 * len(frames)
+            self.batch_latency_ms = elapsed_ms if self.batches == 1 else 0.9 * self.batch_latency_ms + 0.1 * elapsed_ms
+
+            for (stream, packet), frame_results in zip(batch, results):
+                packet['results'] = frame_results
+                stream.pipeline.submit(packet)
+
+    def get_metrics(self):
+        return {
+            'streams': [stream.get_info() for stream in self.streams.values()],
+            'batching': {
+                'maxBatch': self.max_batch,
+                'maxWaitMs': self.max_wait_ms,
+                'batches': self.batches,
+                'framesInferred': self.frames_inferred,
+                'avgBatchSize': self.avg_batch_size,
+                'batchLatencyMs': self.batch_latency_ms
+            }
+        }
@@ -0,0 +1,267 @@
+"""
+stream_pipeline.py - Staged processing pipeline for live streams.
+Each stage runs on its own thread and stages are connected by bounded
+queues that drop the oldest item when full, so a slow stage never blocks
+the ones upstream and throughput tends towards the slowest stage.
+"""
+
+import threading
+import queue
+import time
+from collections import deque
+
+import cv2
+
+
+class DropOldestQueue:
+    """
+    Bounded FIFO queue whose put() never blocks: when full, the oldest item is discarded.
+    If `droppable` is given, the oldest item for which it returns True is discarded first.
+    """
+
+    def __init__(self, maxsize=2, droppable=None):
+        self.maxsize = maxsize
+        self.droppable = droppable
+        self._items = deque()
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        """Append an item, evicting the oldest one if the queue is full."""
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                self._evict()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def _evict(self):
+        if self.droppable is not None:
+            for i, pending in enumerate(self._items):
+                if self.droppable(pending):
+                    del self._items[i]
+                    return
+        self._items.popleft()
+
+    def get(self, timeout=None):
+        """Pop the oldest item. Raises queue.Empty after `timeout` seconds."""
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._items, timeout=timeout):
+                raise queue.Empty
+            return self._items.popleft()
+
+    def qsize(self):
+        return len(self._items)
+
+    def empty(self):
+        return not self._items
+
+    def full(self):
+        return len(self._items) >= self.maxsize
+
+    def clear(self):
+        with self._cond:
+            self._items.clear()
+
+
+class PipelineStage:
+    """
+    Worker thread applying `func` to every item of `input_queue`.
+    The result is pushed to `output_queue` unless it is None (item consumed).
+    """
+
+    def __init__(self, name, func, input_queue, output_queue=None):
+        self.name = name
+        self.func = func
+        self.input_queue = input_queue
+        self.output_queue = output_queue
+        self.processed = 0
+        self.errors = 0
+        self.latency_ms = 0.0
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=f"pipeline-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                item = self.input_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            start = time.perf_counter()
+            try:
+                result = self.func(item)
+            except Exception:
+                self.errors += 1
+                continue
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            # Moyenne glissante exponentielle pour lisser la latence
+            self.latency_ms = elapsed_ms if self.processed == 0 else 0.9 * self.latency_ms + 0.1 * elapsed_ms
+            self.processed += 1
+            if result is not None and self.output_queue is not None:
+                self.output_queue.put(result)
+
+    def get_metrics(self):
+        return {
+            'queueDepth': self.input_queue.qsize(),
+            'latencyMs': self.latency_ms,
+            'processed': self.processed,
+            'dropped': self.input_queue.dropped,
+            'errors': self.errors
+        }
+
+
+class StreamPipeline:
+    """
+    Chain of PipelineStage objects. Items are fed with submit() (typically by a
+    capture thread) and the output of the last stage lands in `output_queue`.
+    Args:
+        stages: List of (name, func) tuples, in processing order
+        output_queue: Queue receiving the results of the last stage
+        queue_size (int): Capacity of each inter-stage queue
+        droppable: Optional predicate selecting the items evicted first from saturated queues
+    """
+
+    def __init__(self, stages, output_queue, queue_size=2, droppable=None):
+        self.output_queue = output_queue
+        self.stages = []
+        input_queue = DropOldestQueue(queue_size, droppable)
+        self.input_queue = input_queue
+        for i, (name, func) in enumerate(stages):
+            is_last = i == len(stages) - 1
+            next_queue = output_queue if is_last else DropOldestQueue(queue_size, droppable)
+            self.stages.append(PipelineStage(name, func, input_queue, next_queue))
+            input_queue = next_queue
+
+    def submit(self, item):
+        """Feed an item to the first stage (drops the oldest pending item if saturated)."""
+        self.input_queue.put(item)
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+
+    def stop(self, timeout=2.0):
+        for stage in self.stages:
+            stage.stop()
+        for stage in self.stages:
+            stage.join(timeout)
+        for stage in self.stages:
+            stage.input_queue.clear()
+
+    def get_metrics(self):
+        """Per-stage queue depth, latency and drop counters."""
+        return {stage.name: stage.get_metrics() for stage in self.stages}
+
+
+class FramePacer:
+    """Sleeps between reads so a video file is consumed at its native frame rate."""
+
+    def __init__(self, fps):
+        self.frame_interval = 1.0 / fps if fps and fps > 0 else 0
+        self._next_frame_at = time.perf_counter()
+
+    @classmethod
+    def for_capture(cls, cap, stream_source):
+        """Pacer for a cv2.VideoCapture: files are paced, live sources are read as fast as they arrive."""
+        is_file = '://' not in str(stream_source)
+        return cls(cap.get(cv2.CAP_PROP_FPS) if is_file else 0)
+
+    def wait(self):
+        if not self.frame_interval:
+            return
+        delay = self._next_frame_at - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        self._next_frame_at = max(self._next_frame_at + self.frame_interval, time.perf_counter() - self.frame_interval)
+
+
+class FrameBroadcaster:
+    """
+    Latest-frame slot shared by every viewer of a feed.
+    The encode stage publishes each JPEG once; viewers wait for a sequence number
+    newer than the last one they sent, so a slow client skips frames instead of
+    holding back the producer, and the cost of encoding does not grow with viewers.
+    Also accepts put() so it can be the output queue of a StreamPipeline.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._frame = None
+        self.sequence = 0
+        self.viewers = 0
+        self.skipped = 0  # Frames published but never sent to some viewer
+        self._closed = False
+
+    def publish(self, frame):
+        with self._cond:
+            self._frame = frame
+            self.sequence += 1
+            self._cond.notify_all()
+
+    put = publish
+
+    def wait_next(self, last_sequence=0, timeout=1.0):
+        """
+        Blocks until a frame newer than `last_sequence` is published.
+        Returns:
+            tuple: (sequence, frame), or None on timeout or once closed
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._closed or self.sequence > last_sequence, timeout=timeout):
+                return None
+            if self._closed:
+                return None
+            if last_sequence:
+                self.skipped += self.sequence - last_sequence - 1
+            return self.sequence, self._frame
+
+    def reset(self):
+        """Reopens the broadcaster for a new stream."""
+        with self._cond:
+            self._frame = None
+            self._closed = False
+            self.skipped = 0
+
+    def close(self):
+        """Wakes up waiting viewers and drops the last frame (the stream has ended)."""
+        with self._cond:
+            self._frame = None
+            self._closed = True
+            self._cond.notify_all()
+
+    def frames(self, is_running):
+        """Yields every new frame while `is_running()` holds, skipping those missed by a slow consumer."""
+        with self._cond:
+            self.viewers += 1
+        try:
+            last_sequence = 0
+            while is_running():
+                item = self.wait_next(last_sequence)
+                if item is None:
+                    if self._closed:
+                        break
+                    continue
+                last_sequence, frame = item
+                yield frame
+        finally:
+            with self._cond:
+                self.viewers -= 1
+
+    def get_metrics(self):
+        return {
+            'sequence': self.sequence,
+            'viewers': self.viewers,
+            'skipped': self.skipped
+        }
@@ -10,7 +10,13 @@ import numpy as np
 import sys
 import importlib.util
 from bytetrack_tracker import ByteTracker
+from calibration import Calibration
+from stream_pipeline import FrameBroadcaster, FramePacer, StreamPipeline
 from gpu_config import gpu_config
+from config import Config
+from config.stream_config import STREAM_CONFIG
+from onnx_backend import DetectionArrays, OnnxRuntimeBackend
+from rate_controller import AdaptiveRateController, DROP, TRACK
 
 # Importer la configuration des logs depuis app.py
 try:
@@ -31,7 +37,7 @@ except ImportError:
 # Handles model loading, video processing, streaming, and detection callbacks
 
 class YOLODetector:
-    def __init__(self, model_path="models/best.onnx", confidence_threshold=0.5):
+    def __init__(self, model_path="models/best.onnx", confidence_threshold=0.5, backend='ultralytics'):
         # Configure device based on GPU config
         self.device = gpu_config.get_device()
         if ENABLE_LOGS:
@@ -53,25 +59,41 @@ class YOLODetector:
         Args:
             model_path (str): Path to YOLO model (.pt or .onnx)
             confidence_threshold (float): Confidence threshold for detections
+            backend (str): 'ultralytics' or 'onnxruntime' (direct ONNX Runtime session)
         """
         self.model_path = model_path
+        self.backend = backend
         self.confidence_threshold = confidence_threshold
         self.model = None
+        self._batch_supported = True
         self.is_running = False
         self.current_video = None
         self.detection_callback = None
-        self.frame_queue = queue.Queue(maxsize=10) # For streaming frames to the web
+        self.broadcaster = FrameBroadcaster() # Latest encoded JPEG, shared by all viewers of the web feed
+        self.pipeline = None
         
         # Performance metrics
         self.inference_time_ms = 0
         self.fps = 0
         self._frame_times = []
         self.objects_by_class = {}
+        self.end_to_end_latency_ms = 0
+        self._capture_metrics = {'framesRead': 0, 'latencyMs': 0.0}
+        self._class_names = {}
+
+        # Decides per captured frame between inference, track-only propagation and dropping
+        self.rate_controller = AdaptiveRateController(
+            target_fps=STREAM_CONFIG['target_fps'],
+            latency_budget_ms=STREAM_CONFIG['latency_budget_ms']
+        )
         
 
         # --- ByteTrack tracker instance ---
         self.tracker = ByteTracker(track_thresh=0.5, track_buffer=30, match_thresh=0.8)
 
+        # --- Camera models (intrinsics, class sizes) for distances and speeds, by stream id ---
+        self.calibration = Calibration.load(Config.CALIBRATION_PATH)
+
         # Initialize with GPU settings
         if torch.cuda.is_available():
             torch.backends.cudnn.benchmark = True
@@ -87,8 +109,25 @@ class YOLODetector:
                 print(f"❌ Model not found: {self.model_path}")
             self.model = None
             return
+        if self.backend == 'onnxruntime' and self.model_path.endswith('.onnx'):
+            try:
+                self.model = OnnxRuntimeBackend(
+                    self.model_path,
+                    use_gpu=gpu_config.gpu_available,
+                    intra_op_threads=Config.ONNX_INTRA_OP_THREADS,
+                    inter_op_threads=Config.ONNX_INTER_OP_THREADS,
+                    iou_threshold=Config.ONNX_NMS_IOU_THRESHOLD
+                )
+                self._batch_supported = True
+                if ENABLE_LOGS:
+                    print(f"✅ Model loaded with ONNX Runtime: {self.model_path}")
+                return
+            except Exception as e:
+                if ENABLE_LOGS:
+                    print(f"⚠️ ONNX Runtime backend unavailable, using ultralytics: {e}")
         try:
             self.model = YOLO(self.model_path, task="detect")
+            self._batch_supported = True
             # Don't call .to(device) for ONNX models
             if not self.model_path.endswith('.onnx') and torch.cuda.is_available():
                 self.model.to(self.device)
@@ -103,239 +142,482 @@ class YOLODetector:
         """Set the callback function for detections."""
         self.detection_callback = callback
 
-    def _execute_detection(self, frame):
+    def _inference_conf(self):
         """
-        Executes YOLO detection on a single frame and returns drawn frame and detections.
-        Ajoute le calcul de la distance réelle caméra-objet.
+        Model confidence threshold. Low-score boxes (down to the tracker's low_thresh) are
+        requested so ByteTrack can use them to keep existing tracks alive; only those that
+        extend a track are reported below confidence_threshold.
         """
-        if self.model is None:
-            return frame, []
-
-        try:
-            # For ONNX models, use predict() method with explicit device
-            if self.model_path.endswith('.onnx'):
-                results = self.model.predict(
-                    source=frame,
-                    conf=self.confidence_threshold,
-                    device=0 if gpu_config.gpu_available else 'cpu',
-                    verbose=False
-                )
-            else:
-                # For PyTorch models, use direct inference
+        return min(self.confidence_threshold, self.tracker.low_thresh)
+
+    def _run_inference(self, frame):
+        """Runs the model on a single frame and returns the raw ultralytics results."""
+        start_time = time.time()
+        results = self._predict(frame)
+        if gpu_config.gpu_available:
+            torch.cuda.synchronize()
+        self.inference_time_ms = (time.time() - start_time) * 1000
+        return results
+
+    def _run_inference_batch(self, frames):
+        """
+        Runs the model once on a list of frames.
+        Returns:
+            list: One results list per input frame (usable by _postprocess)
+        """
+        if len(frames) > 1 and self._batch_supported:
+            try:
+                start_time = time.time()
+                batch_results = self._predict(frames)
                 if gpu_config.gpu_available:
-                    frame_tensor = torch.from_numpy(frame).to(self.device)
-                    results = self.model(frame_tensor, conf=self.confidence_threshold, verbose=False)
-                else:
-                    results = self.model(frame, conf=self.confidence_threshold, verbose=False)
+                    torch.cuda.synchronize()
+                self.inference_time_ms = (time.time() - start_time) * 1000
+                return [[result] for result in batch_results]
+            except Exception as e:
+                # Static-batch ONNX exports only accept one image: fall back to serial calls
+                if ENABLE_LOGS:
+                    print(f"⚠️ Batched inference unavailable, running frames one by one: {e}")
+                self._batch_supported = False
+        return [self._run_inference(frame) for frame in frames]
+
+    def _predict(self, source):
+        """Calls the model on a frame or a list of frames."""
+        if isinstance(self.model, OnnxRuntimeBackend):
+            if isinstance(source, list):
+                return self.model.predict_batch(source, conf=self._inference_conf())
+            return [self.model.predict(source, conf=self._inference_conf())]
+        # For ONNX models, use predict() method with explicit device
+        if self.model_path.endswith('.onnx'):
+            return self.model.predict(
+                source=source,
+                conf=self._inference_conf(),
+                device=0 if gpu_config.gpu_available else 'cpu',
+                verbose=False
+            )
+        # For PyTorch models, use direct inference
+        if gpu_config.gpu_available and isinstance(source, np.ndarray):
+            frame_tensor = torch.from_numpy(source).to(self.device)
+            return self.model(frame_tensor, conf=self._inference_conf(), verbose=False)
+        return self.model(source, conf=self._inference_conf(), verbose=False)
+
+    @staticmethod
+    def _extract_arrays(results):
+        """
+        Pulls boxes, confidences and class ids of all results to NumPy in one transfer per tensor.
+        Returns:
+            tuple: (xyxy float32 (N,4), conf float32 (N,), cls int64 (N,), names dict)
+        """
+        xyxy_parts, conf_parts, cls_parts = [], [], []
+        names = {}
+        for result in results:
+            if isinstance(result, DetectionArrays):
+                # ONNX Runtime backend: already host arrays
+                names = result.names
+                if len(result.conf):
+                    xyxy_parts.append(result.xyxy)
+                    conf_parts.append(result.conf)
+                    cls_parts.append(result.cls)
+                continue
+            names = result.names
+            boxes = result.boxes
+            if boxes is None or len(boxes) == 0:
+                continue
+            xyxy_parts.append(boxes.xyxy.cpu().numpy())
+            conf_parts.append(boxes.conf.cpu().numpy())
+            cls_parts.append(boxes.cls.cpu().numpy())
+        if not xyxy_parts:
+            return np.empty((0, 4), dtype=np.float32), np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64), names
+        xyxy = np.concatenate(xyxy_parts).astype(np.float32, copy=False)
+        conf = np.concatenate(conf_parts).astype(np.float32, copy=False)
+        cls = np.concatenate(cls_parts).astype(np.int64)
+        return xyxy, conf, cls, names
+
+    def _postprocess(self, frame, results, tracker=None, stream_id=None, scale=1, captured_at=None):
+        """
+        Converts raw model results into detection dicts, assigns track IDs and
+        triggers the detection callback.
+        Ajoute le calcul de la distance réelle caméra-objet, et la vitesse / le cap des objets suivis.
+        Args:
+            tracker: Tracker to use (defaults to the detector's own, streams pass theirs)
+            stream_id: Optional source identifier added to each detection
+            scale: Factor from frame to source pixel coordinates (frames decoded at reduced resolution)
+            captured_at: Capture time of the frame (epoch seconds), for the tracker's velocities
+        """
+        tracker = tracker or self.tracker
+        xyxy, conf, cls, names = self._extract_arrays(results)
+        if scale != 1:
+            xyxy = xyxy * np.float32(scale)
+        if names:
+            self._class_names = names
+        if len(xyxy) == 0:
+            # Keep the tracker ageing its tracks even on empty frames
+            tracker.update(np.empty((0, 6), dtype=np.float32), frame, timestamp=captured_at)
+            return []
 
-            # Timing code
-            start_time = time.time()
-            if gpu_config.gpu_available:
-                torch.cuda.synchronize()
-            end_time = time.time()
-            self.inference_time_ms = (end_time - start_time) * 1000
-
-            # Move frame to GPU if available
-            if torch.cuda.is_available():
-                if isinstance(frame, np.ndarray):
-                    frame_tensor = torch.from_numpy(frame).to(self.device)
-                else:
-                    frame_tensor = frame.to(self.device)
-            
-            # Paramètres caméra (à ajuster selon ton setup)
-            FOCAL_LENGTH_PX = 800  # focale en pixels (exemple)
-            # Tailles réelles moyennes (en mètres) pour chaque classe
-            REAL_SIZES = {
-                'person': 1.7,
-                'soldier': 1.7,
-                'weapon': 1.0,
-                'military_vehicles': 3.0,
-                'civilian_vehicles': 4.5,
-                'military_aircraft': 15.0,
-                'civilian_aircraft': 20.0
+        # --- Tracking: assign IDs using ByteTracker ---
+        # The tracker returns the track id of every detection (-1 if untracked)
+        _, track_ids = tracker.update(np.column_stack((xyxy, conf, cls)), frame, timestamp=captured_at)
+        # Only boxes of confirmed tracks are reported: low-score boxes extending a track, and
+        # a box starting a track once the next frame confirms it (single-frame false positives never are)
+        keep = track_ids >= 0
+        if not keep.all():
+            xyxy, conf, cls, track_ids = xyxy[keep], conf[keep], cls[keep], track_ids[keep]
+            if len(xyxy) == 0:
+                return []
+
+        # Géométrie et distance calculées sur tout le tableau de boîtes en une fois
+        x1, y1, x2, y2 = xyxy[:, 0], xyxy[:, 1], xyxy[:, 2], xyxy[:, 3]
+        widths = x2 - x1
+        heights = y2 - y1
+        centers_x = (x1 + x2) / 2
+        centers_y = (y1 + y2) / 2
+        camera = self.calibration.camera(stream_id)
+        frame_height = frame.shape[0] * scale if frame is not None else None
+        distances = camera.distances(cls, heights, names, frame_height)
+        speeds, speeds_px, headings = self._estimate_motion(tracker.velocities(track_ids),
+                                                            camera.meters_per_pixel(cls, heights, names))
+
+        timestamp = datetime.now().isoformat()  # One timestamp per frame
+        detections = [
+            {
+                'label': names[class_id],
+                'confidence': confidence,
+                'x': cx,
+                'y': cy,
+                'width': w,
+                'height': h,
+                'distance': dist,
+                'speed': speed,
+                'speed_px': speed_px,
+                'heading': heading,
+                'timestamp': timestamp,
+                'bbox': bbox,
+                'class_id': class_id,
+                'id': track_id
             }
-
-            detections = []
-            dets_for_tracking = []
-            for result in results:
-                boxes = result.boxes
-                if boxes is not None:
-                    for box in boxes:
-                        x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                        cls = int(box.cls[0].cpu().numpy())
-                        conf = float(box.conf[0].cpu().numpy())
-                        class_name = result.names[cls]
-
-                        # Calcul de la distance réelle (si taille connue)
-                        pixel_height = y2 - y1
-                        real_height = REAL_SIZES.get(class_name, 1.7)  # défaut: 1.7m
-                        distance = (real_height * FOCAL_LENGTH_PX) / (pixel_height + 1e-6)
-
-                        detection_data = {
-                            'label': class_name,
-                            'confidence': conf,
-                            'x': (x1 + x2) / 2,
-                            'y': (y1 + y2) / 2,
-                            'width': x2 - x1,
-                            'height': pixel_height,
-                            'distance': float(distance),
-                            'timestamp': datetime.now().isoformat(),
-                            'bbox': [x1, y1, x2, y2],
-                            'class_id': cls
-                        }
-                        detections.append(detection_data)
-                        dets_for_tracking.append([x1, y1, x2, y2, conf, cls])
-
-                        # Update objects by class count
-                        self.objects_by_class[class_name] = self.objects_by_class.get(class_name, 0) + 1
-
-            # --- Tracking: assign IDs using ByteTracker ---
-            tracks = self.tracker.update(dets_for_tracking, frame)
-            # Map track_id to detection by IoU (simple association)
+            for bbox, confidence, class_id, track_id, cx, cy, w, h, dist, speed, speed_px, heading in zip(
+                xyxy.tolist(), conf.tolist(), cls.tolist(), track_ids.tolist(), centers_x.tolist(),
+                centers_y.tolist(), widths.tolist(), heights.tolist(), distances.tolist(),
+                speeds, speeds_px, headings
+            )
+        ]
+
+        if stream_id is not None:
             for det in detections:
-                det_bbox = det['bbox']
-                best_iou = 0
-                best_track_id = None
-                for track in tracks:
-                    iou = self.tracker._calculate_iou(det_bbox, track['bbox'])
-                    if iou > best_iou and iou > self.tracker.match_thresh:
-                        best_iou = iou
-                        best_track_id = track['track_id']
-                det['id'] = best_track_id if best_track_id is not None else -1
-
-            # Draw on the frame
+                det['stream_id'] = stream_id
+
+        # Update objects by class count
+        class_ids, counts = np.unique(cls, return_counts=True)
+        for class_id, count in zip(class_ids.tolist(), counts.tolist()):
+            class_name = names[class_id]
+            self.objects_by_class[class_name] = self.objects_by_class.get(class_name, 0) + count
+
+        # Trigger callback for database saving etc.
+        if self.detection_callback and detections:
             for det in detections:
-                x1, y1, x2, y2 = det['bbox']
-                class_name = det['label']
-                conf = det['confidence']
-                track_id = det['id']
-                cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
-                cv2.putText(frame, f'{class_name} {conf:.2f} ID:{track_id}',
-                            (int(x1), int(y1) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
-
-            # Trigger callback for database saving etc.
-            if self.detection_callback and detections:
-                for det in detections:
-                    self.detection_callback(det)
-
-            # Remove bbox/class_id from output for compatibility
+                self.detection_callback(det)
+
+        return detections
+
+    @staticmethod
+    def _estimate_motion(velocities, meters_per_pixel):
+        """
+        Vitesse et cap par boîte, à partir de la vitesse lissée de sa piste (filtre de Kalman).
+        A la distance de l'objet, un pixel vaut taille réelle / hauteur de la boîte en mètres.
+        Seul le déplacement dans le plan image est compté: la vitesse radiale déduite de la
+        variation de hauteur des boîtes est trop bruitée (plusieurs m/s à 30 m).
+        Args:
+            velocities: (N,3) [vx, vy, vh] en pixels/s (ByteTracker.velocities), NaN si inconnue
+            meters_per_pixel: (N,) taille d'un pixel à la distance de chaque boîte (CameraModel)
+        Returns:
+            tuple: Listes de vitesse (m/s), vitesse (pixels/s) et cap (degrés, dans le sens horaire
+                depuis le haut de l'image: 90 = vers la droite), None si la piste est inconnue
+        """
+        vx, vy = velocities[:, 0], velocities[:, 1]
+        speeds_px = np.hypot(vx, vy)
+        speeds = speeds_px * meters_per_pixel
+        headings = np.degrees(np.arctan2(vx, -vy)) % 360
+        known = ~np.isnan(speeds_px)
+        return tuple(
+            [round(value, 3) if ok else None for value, ok in zip(values.tolist(), known.tolist())]
+            for values in (speeds, speeds_px, headings)
+        )
+
+    def _propagate_tracks(self, tracker=None, stream_id=None, captured_at=None, frame_height=None):
+        """
+        Track-only step for frames on which inference is skipped: tracks are moved by the
+        tracker's motion model and reported as predicted detections. They are not passed to
+        the detection callback, so only real model outputs reach the database.
+        """
+        tracker = tracker or self.tracker
+        tracks = tracker.predict(timestamp=captured_at)
+        if not tracks:
+            return []
+        boxes = np.array([track['bbox'] for track in tracks], dtype=np.float32)
+        cls = np.array([track['class_id'] for track in tracks], dtype=np.int64)
+        widths = boxes[:, 2] - boxes[:, 0]
+        heights = boxes[:, 3] - boxes[:, 1]
+        camera = self.calibration.camera(stream_id)
+        distances = camera.distances(cls, heights, self._class_names, frame_height)
+        velocities = tracker.velocities([track['track_id'] for track in tracks])
+        speeds, speeds_px, headings = self._estimate_motion(velocities,
+                                                            camera.meters_per_pixel(cls, heights, self._class_names))
+        timestamp = datetime.now().isoformat()
+        detections = [
+            {
+                'label': self._class_names.get(track['class_id'], str(track['class_id'])),
+                'confidence': track['confidence'],
+                'x': (bbox[0] + bbox[2]) / 2,
+                'y': (bbox[1] + bbox[3]) / 2,
+                'width': w,
+                'height': h,
+                'distance': dist,
+                'speed': speed,
+                'speed_px': speed_px,
+                'heading': heading,
+                'timestamp': timestamp,
+                'bbox': bbox,
+                'class_id': track['class_id'],
+                'id': track['track_id'],
+                'predicted': True
+            }
+            for track, bbox, w, h, dist, speed, speed_px, heading in zip(
+                tracks, boxes.tolist(), widths.tolist(), heights.tolist(), distances.tolist(),
+                speeds, speeds_px, headings
+            )
+        ]
+        if stream_id is not None:
             for det in detections:
-                det.pop('bbox', None)
-                det.pop('class_id', None)
+                det['stream_id'] = stream_id
+        return detections
 
-            return frame, detections
-        except Exception as e:
-            if ENABLE_LOGS:
-                print(f"❌ Error during detection: {e}")
-            return frame, []
+    def _annotate(self, frame, detections):
+        """Draws boxes, labels and track IDs on the frame (in place)."""
+        for det in detections:
+            x1, y1, x2, y2 = det['bbox']
+            class_name = det['label']
+            conf = det['confidence']
+            track_id = det['id']
+            cv2.rectangle(frame, (int(x1), int(y1)), (int(x2), int(y2)), (0, 255, 0), 2)
+            cv2.putText(frame, f'{class_name} {conf:.2f} ID:{track_id}',
+                        (int(x1), int(y1) - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
+        return frame
+
+    def _encode(self, frame):
+        """Resizes and JPEG-encodes an annotated frame for the web feed."""
+        # Réduire la taille de l'image pour améliorer les performances
+        scale_percent = 70  # pourcentage de la taille originale
+        width = int(frame.shape[1] * scale_percent / 100)
+        height = int(frame.shape[0] * scale_percent / 100)
+        resized_frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+
+        # Réduire la qualité de l'image pour améliorer les performances
+        encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), STREAM_CONFIG['jpeg_quality']]
+        ret, jpeg = cv2.imencode('.jpg', resized_frame, encode_param)
+        return jpeg.tobytes() if ret else None
+
+    @staticmethod
+    def _strip_internal_fields(detections):
+        # Remove bbox/class_id from output for compatibility
+        for det in detections:
+            det.pop('bbox', None)
+            det.pop('class_id', None)
+        return detections
+
+    # --- Pipeline stages (one thread each, see stream_pipeline.py) ---
+    def _inference_stage(self, packet):
+        if packet.get('mode') == TRACK:
+            packet['results'] = None  # Track-only frame: the model is skipped
+        elif self.model is not None:
+            packet['results'] = self._run_inference(packet['frame'])
+            self.rate_controller.record_inference(self.inference_time_ms)
+        else:
+            packet['results'] = []
+        return packet
+
+    def _tracking_stage(self, packet):
+        if packet.get('mode') == TRACK:
+            detections = self._propagate_tracks(captured_at=packet['captured_at'],
+                                                frame_height=packet['frame'].shape[0])
+        else:
+            detections = self._postprocess(packet['frame'], packet['results'], captured_at=packet['captured_at'])
+        packet['results'] = None  # Release model outputs as soon as possible
+        self._annotate(packet['frame'], detections)
+
+        # Debug log pour les détections
+        if ENABLE_LOGS:
+            if detections:
+                print(f"✅ Détections trouvées: {len(detections)} objets")
+            else:
+                print("⚠️ Aucune détection trouvée dans cette frame")
+
+        packet['detections'] = self._strip_internal_fields(detections)
+        return packet
+
+    def _encode_stage(self, packet):
+        jpeg = self._encode(packet['frame'])
+        if jpeg is None:
+            return None
+
+        # Update FPS calculation
+        now = time.time()
+        self._frame_times.append(now)
+        # Keep the last 20 frame times
+        self._frame_times = self._frame_times[-20:]
+        if len(self._frame_times) > 1:
+            time_diff = self._frame_times[-1] - self._frame_times[0]
+            self.fps = (len(self._frame_times) - 1) / time_diff if time_diff > 0 else 0
+        self.end_to_end_latency_ms = (now - packet['captured_at']) * 1000
+        self.rate_controller.record_latency(self.end_to_end_latency_ms)
+        return jpeg
+
+    def _create_pipeline(self):
+        return StreamPipeline(
+            [
+                ('inference', self._inference_stage),
+                ('tracking', self._tracking_stage),
+                ('encode', self._encode_stage),
+            ],
+            output_queue=self.broadcaster,
+            queue_size=2,
+            # Saturated queues shed track-only frames before frames carrying model detections
+            droppable=lambda packet: packet.get('mode') == TRACK
+        )
 
     def process_frame(self, frame_np):
         """
         Process a single frame received from an external source (e.g., frontend).
         Args:
-            frame_np (np.array): The image as a numpy array.
+            frame_np (np.array): The image as a numpy array (BGR).
         Returns:
             list: A list of detection dictionaries.
         """
+        return self.process_frames([frame_np])[0]
+
+    def process_frames(self, frames, scale=1, tracker=None, stream_id=None):
+        """
+        Process consecutive frames received from an external source, in one model call
+        when the model accepts batches. Frames are tracked in order, and not drawn on.
+        Args:
+            frames (list): Images as numpy arrays (BGR)
+            scale: Factor from frame to source pixel coordinates (frames decoded at reduced resolution)
+            tracker, stream_id: Tracker and identifier of the source (see _postprocess)
+        Returns:
+            list: One list of detection dictionaries per frame
+        """
         if self.model is None:
             if ENABLE_LOGS:
                 print("❌ Model not loaded")
-            return []
-        
-        # We don't need the drawn frame here, just the detections.
-        _, detections = self._execute_detection(frame_np)
+            return [[] for _ in frames]
 
-        return detections
+        try:
+            results = self._run_inference_batch(frames)
+            return [self._strip_internal_fields(self._postprocess(frame, frame_results, tracker=tracker,
+                                                                  stream_id=stream_id, scale=scale))
+                    for frame, frame_results in zip(frames, results)]
+        except Exception as e:
+            if ENABLE_LOGS:
+                print(f"❌ Error during detection: {e}")
+            return [[] for _ in frames]
+
+    def _open_capture(self, stream_source, max_retries=3, retry_delay=2):
+        """Opens a cv2.VideoCapture on a file or network URL, retrying on failure."""
+        for attempt in range(max_retries):
+            try:
+                # For network streams, validate connection first
+                if '://' in stream_source:
+                    import socket
+                    from urllib.parse import urlparse
+                    parsed = urlparse(stream_source)
+                    host = parsed.hostname
+                    port = parsed.port or 8080
+                    
+                    # Test TCP connection
+                    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                    sock.settimeout(5)
+                    result = sock.connect_ex((host, port))
+                    sock.close()
+                    
+                    if result != 0:
+                        raise ConnectionError(f"Cannot connect to {host}:{port}")
+
+                cap = cv2.VideoCapture(stream_source)
+                if not cap.isOpened():
+                    raise ConnectionError("Failed to open video stream")
+
+                if ENABLE_LOGS:
+                    print(f"✅ Stream connected: {stream_source}")
+                return cap
+                
+            except Exception as e:
+                if attempt < max_retries - 1:
+                    if ENABLE_LOGS:
+                        print(f"⚠️ Attempt {attempt + 1}/{max_retries} failed: {str(e)}")
+                        print(f"   Retrying in {retry_delay} seconds...")
+                    time.sleep(retry_delay)
+                else:
+                    raise  # Re-raise the last exception
+
+    def _recover_capture(self, cap, stream_source):
+        """Called when cap.read() fails: reconnects network streams, rewinds video files."""
+        if '://' in stream_source:
+            if ENABLE_LOGS:
+                print("⚠️ Network stream interrupted - attempting reconnect")
+            cap.release()
+            return cv2.VideoCapture(stream_source)
+        if ENABLE_LOGS:
+            print("Looping video file...")
+        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+        return cap
 
     def _process_stream(self, stream_source, started_event):
         """Private method to process a video stream from a file or network URL."""
         if ENABLE_LOGS:
             print(f"[YOLO] Attempting to open stream: {stream_source}")
         
-        max_retries = 3
-        retry_delay = 2
         cap = None
         
         try:
-            for attempt in range(max_retries):
-                try:
-                    # For network streams, validate connection first
-                    if '://' in stream_source:
-                        import socket
-                        from urllib.parse import urlparse
-                        parsed = urlparse(stream_source)
-                        host = parsed.hostname
-                        port = parsed.port or 8080
-                        
-                        # Test TCP connection
-                        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                        sock.settimeout(5)
-                        result = sock.connect_ex((host, port))
-                        sock.close()
-                        
-                        if result != 0:
-                            raise ConnectionError(f"Cannot connect to {host}:{port}")
-
-                    cap = cv2.VideoCapture(stream_source)
-                    if not cap.isOpened():
-                        raise ConnectionError("Failed to open video stream")
-
-                    # Stream opened successfully
-                    self.is_running = True
-                    self.current_video = stream_source
-                    started_event.set()
-                    
-                    if ENABLE_LOGS:
-                        print(f"✅ Stream connected: {stream_source}")
-                    break  # Success - exit retry loop
-                    
-                except Exception as e:
-                    if attempt < max_retries - 1:
-                        if ENABLE_LOGS:
-                            print(f"⚠️ Attempt {attempt + 1}/{max_retries} failed: {str(e)}")
-                            print(f"   Retrying in {retry_delay} seconds...")
-                        time.sleep(retry_delay)
-                    else:
-                        raise  # Re-raise the last exception
-
-            # Stream processing loop
+            cap = self._open_capture(stream_source)
+
+            # Stream opened successfully
+            self.is_running = True
+            self.current_video = stream_source
+            self.broadcaster.reset()
+            started_event.set()
+
+            # Capture loop: decode frames and hand them to the pipeline stages
+            self.pipeline = self._create_pipeline()
+            self.pipeline.start()
+            frame_number = 0
+            pacer = FramePacer.for_capture(cap, stream_source)
             while self.is_running:
+                pacer.wait()
+                read_start = time.perf_counter()
                 ret, frame = cap.read()
                 if not ret:
-                    if '://' in stream_source:
-                        if ENABLE_LOGS:
-                            print("⚠️ Network stream interrupted - attempting reconnect")
-                        cap.release()
-                        cap = cv2.VideoCapture(stream_source)
-                        continue
-                    else:
-                        if ENABLE_LOGS:
-                            print("Looping video file...")
-                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                        continue
-
-                # Execute detection and process frame
-                drawn_frame, detections = self._execute_detection(frame)
-                
-                # Debug log pour les détections
-                if ENABLE_LOGS:
-                    if detections:
-                        print(f"✅ Détections trouvées: {len(detections)} objets")
-                    else:
-                        print("⚠️ Aucune détection trouvée dans cette frame")
-
-                # Put the processed frame into the queue for the web feed
-                if not self.frame_queue.full():
-                    self.frame_queue.put(drawn_frame)
-                
-                # Update FPS calculation
-                now = time.time()
-                self._frame_times.append(now)
-                # Keep the last 20 frame times
-                self._frame_times = self._frame_times[-20:]
-                if len(self._frame_times) > 1:
-                    time_diff = self._frame_times[-1] - self._frame_times[0]
-                    self.fps = (len(self._frame_times) - 1) / time_diff if time_diff > 0 else 0
+                    cap = self._recover_capture(cap, stream_source)
+                    continue
+
+                read_ms = (time.perf_counter() - read_start) * 1000
+                capture = self._capture_metrics
+                capture['latencyMs'] = read_ms if capture['framesRead'] == 0 else 0.9 * capture['latencyMs'] + 0.1 * read_ms
+                capture['framesRead'] += 1
+                frame_number += 1
+
+                # Frames are always read so the capture buffer never lags behind the source,
+                # but only those kept by the rate controller enter the pipeline
+                mode = self.rate_controller.decide()
+                if mode == DROP:
+                    continue
+
+                # Hand the frame to the inference stage (oldest pending frame is dropped if it lags)
+                self.pipeline.submit({
+                    'frame': frame,
+                    'frame_number': frame_number,
+                    'captured_at': time.time(),
+                    'mode': mode
+                })
             
         except Exception as e:
             if ENABLE_LOGS:
@@ -343,12 +625,13 @@ class YOLODetector:
             started_event.set()  # Signal failure
             
         finally:
+            if self.pipeline is not None:
+                self.pipeline.stop()
             if cap is not None and cap.isOpened():
                 cap.release()
             self.is_running = False
             self.current_video = None
-            while not self.frame_queue.empty():
-                self.frame_queue.get()
+            self.broadcaster.close()
             if ENABLE_LOGS:
                 print("🛑 Streaming finished")
     
@@ -362,8 +645,12 @@ class YOLODetector:
         
         # Reset metrics for new stream
         self.objects_by_class.clear()
+        self.tracker.reset()
+        self.rate_controller.reset()
         self._frame_times = []
         self.fps = 0
+        self.end_to_end_latency_ms = 0
+        self._capture_metrics = {'framesRead': 0, 'latencyMs': 0.0}
         # --- Tracking metrics update (simple, per frame) ---
         # This is a placeholder. In a real tracker, you would compare predicted IDs to ground truth.
         # Here, we simulate tracking metrics for demonstration.
@@ -402,35 +689,15 @@ class YOLODetector:
         self.is_running = False
         
     def generate_stream_frames(self):
-        """Yields frames from the queue for the web feed."""
-        while self.is_running:
-            try:
-                frame = self.frame_queue.get(timeout=1)
-                
-                # Réduire la taille de l'image pour améliorer les performances
-                scale_percent = 70  # pourcentage de la taille originale
-                width = int(frame.shape[1] * scale_percent / 100)
-                height = int(frame.shape[0] * scale_percent / 100)
-                dim = (width, height)
-                resized_frame = cv2.resize(frame, dim, interpolation=cv2.INTER_AREA)
-                
-                # Réduire la qualité de l'image pour améliorer les performances
-                encode_param = [int(cv2.IMWRITE_JPEG_QUALITY), 80]
-                ret, jpeg = cv2.imencode('.jpg', resized_frame, encode_param)
-                
-                if not ret:
-                    continue
-                
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n')
-
-            except queue.Empty:
-                # If the queue is empty, it might mean processing has stopped
-                # or is just slow. We check `is_running` to decide whether to continue.
-                if not self.is_running:
-                    if ENABLE_LOGS:
-                        print("Stream generation stopped as processing is no longer running.")
-                    break
+        """
+        Yields the JPEG frames produced by the encode stage for the web feed.
+        Every viewer reads the same encoded frame; a slow viewer skips to the latest one.
+        """
+        for jpeg in self.broadcaster.frames(lambda: self.is_running):
+            yield (b'--frame\r\n'
+                   b'Content-Type: image/jpeg\r\n\r\n' + jpeg + b'\r\n')
+        if ENABLE_LOGS:
+            print("Stream generation stopped as processing is no longer running.")
     
     def get_available_videos(self):
         """Returns the list of available videos."""
@@ -455,9 +722,11 @@ class YOLODetector:
         return {
             "status": "loaded",
             "model_path": self.model_path,
+            "backend": "onnxruntime" if isinstance(self.model, OnnxRuntimeBackend) else "ultralytics",
             "confidence_threshold": self.confidence_threshold,
             "is_running": self.is_running,
-            "current_video": self.current_video
+            "current_video": self.current_video,
+            "calibration": self.calibration.to_dict()
         }
 
     def get_performance_metrics(self):
@@ -475,12 +744,27 @@ class YOLODetector:
             "inferenceTime": self.inference_time_ms,
             "mota": mota,
             "motp": motp,
-            "idSwitchCount": self._tracking_id_switches
+            "idSwitchCount": self._tracking_id_switches,
+            "endToEndLatencyMs": self.end_to_end_latency_ms,
+            "rateControl": self.rate_controller.get_metrics(),
+            "pipeline": self.get_pipeline_metrics()
         }
 
+    def get_pipeline_metrics(self):
+        """Per-stage queue depths, latencies and drop counts of the streaming pipeline."""
+        stages = {'capture': dict(self._capture_metrics)}
+        if self.pipeline is not None:
+            stages.update(self.pipeline.get_metrics())
+        stages['output'] = self.broadcaster.get_metrics()
+        return stages
+
     def get_objects_by_class(self):
         """Returns a dictionary with the count of detected objects per class."""
         return self.objects_by_class
 
 # Global detector instance
-detector = YOLODetector()
\ No newline at end of file
+detector = YOLODetector(
+    model_path=Config.YOLO_MODEL_PATH,
+    confidence_threshold=Config.YOLO_CONFIDENCE_THRESHOLD,
+    backend=Config.YOLO_BACKEND
+)
\ No newline at end of file